@@ -1,7 +1,9 @@
+import hashlib
 import streamlit as st
 import json
 from backend.vcf_parser import parse_vcf
-from backend.llm_engine import generate_risk_json
+from backend.pgx_engine import DRUG_GENE_MAP, call_gene_profiles
+from backend.llm_engine import create_llm_model, generate_risk_json
 
 # Configure the page
 st.set_page_config(
@@ -21,6 +23,32 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+# ── Cached engine calls ──
+# Streamlit reruns this script on every widget interaction. The VCF is keyed by
+# its SHA-256 so the parse, per-gene diplotypes and per-drug reports are reused
+# when only the drug selection changes; underscore-prefixed args are not hashed.
+@st.cache_resource
+def get_llm_model():
+    return create_llm_model()
+
+
+@st.cache_data(show_spinner=False)
+def parse_patient_vcf(vcf_digest, _vcf_content):
+    return parse_vcf(_vcf_content)
+
+
+@st.cache_data(show_spinner=False)
+def gene_profiles(vcf_digest, _patient_data):
+    return call_gene_profiles(_patient_data["gene_variants"], _patient_data.get("coverage"))
+
+
+@st.cache_data(show_spinner=False)
+def drug_report(vcf_digest, drug, _patient_data, _profiles):
+    # Reuses the cached per-gene calls; only the risk lookup and LLM text are per drug
+    return generate_risk_json(_patient_data, drug, llm_model=get_llm_model(), profiles=_profiles)
+
+
 st.title("PharmaGuard 🧬")
 st.markdown("### Pharmacogenomics AI Tool")
 
@@ -32,29 +60,43 @@ with st.sidebar:
     # Multiselect for drugs
     drugs = st.multiselect(
         "Select Drugs for Analysis",
-        ["Warfarin", "Clopidogrel", "Simvastatin", "Tamoxifen", "Fluorouracil", "Capecitabine"],
+        [d.title() for d in DRUG_GENE_MAP],
         help="Select one or more drugs to screen against the patient's genetic data."
     )
     
     analyze_btn = st.button("Analyze Risk", type="primary")
 
+# Keep showing results after the first click so changing the drug selection
+# re-renders from cache instead of needing another button press.
+if analyze_btn:
+    st.session_state["analyze"] = True
+
 # Main content area
-if uploaded_file and drugs and analyze_btn:
+if uploaded_file and drugs and st.session_state.get("analyze"):
     st.divider()
     with st.spinner("Parsing VCF and generating risk assessment..."):
         # Read file content
-        vcf_content = uploaded_file.getvalue().decode("utf-8")
-        
-        # 1. Parse VCF
-        patient_data = parse_vcf(vcf_content)
-        
+        vcf_content = uploaded_file.getvalue()
+        vcf_digest = hashlib.sha256(vcf_content).hexdigest()
+
+        # 1. Parse VCF (cached by content hash)
+        patient_data = parse_patient_vcf(vcf_digest, vcf_content)
+        profiles = gene_profiles(vcf_digest, patient_data)
+
         # 2. Generate Report for each drug
         results = []
         for drug in drugs:
-            risk_info = generate_risk_json(patient_data, drug)
+            risk_info = drug_report(vcf_digest, drug, patient_data, profiles)
             results.append(risk_info)
-            
+
         # Display results
+        st.subheader("Pharmacogene Profile")
+        st.table([
+            {"Gene": gene, "Diplotype": p["diplotype"], "Phenotype": p["phenotype"],
+             "Activity Score": p["activity_score"]}
+            for gene, p in profiles.items()
+        ])
+
         st.subheader("Risk Assessment Results")
         
         for res in results:
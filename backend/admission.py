@@ -0,0 +1,208 @@
+"""Admission control for upload endpoints.
+
+Each worker process keeps two budgets — one for small panel VCFs (parsed
+inline) and one for large files (parsed in the process pool) — over both the
+number of requests in flight and the memory they hold. A request is
+admitted on its Content-Length before its body is read, and the reservation is
+held until the response has been sent (the upload stays in memory through the
+parse and the LLM wait). Bodies without a length, or longer than declared,
+grow the reservation as they stream in.
+
+Small uploads are parsed in this process, and the parsed records take several
+times the upload size, so each small upload byte is charged
+PGX_ADMIT_SMALL_EXPANSION bytes of the small budget. Large uploads are spooled
+to disk and parsed in the pool processes (whose concurrency is PARSE_WORKERS,
+not this budget), so they are charged their upload bytes only; size the
+worker's memory for PARSE_WORKERS parses on top of the large budget.
+
+Over budget: 503 + Retry-After (capacity, retry later). A single upload larger
+than the whole large-file budget can never be admitted: 413. Rejections read
+at most DISCARD_MAX_BYTES of the body (so a client still sending usually sees
+the answer) and then close the connection rather than pay for the transfer.
+
+All bookkeeping happens on the event loop, so no locking is needed.
+
+Config (environment):
+    PGX_ADMIT_SMALL_MAX_INFLIGHT / PGX_ADMIT_SMALL_MAX_BYTES   (default: 64 / 128 MiB)
+    PGX_ADMIT_SMALL_EXPANSION    parsed bytes per upload byte, inline parses (default: 8)
+    PGX_ADMIT_LARGE_MAX_INFLIGHT / PGX_ADMIT_LARGE_MAX_BYTES   (default: 2 x parse workers / 512 MiB)
+    PGX_ADMIT_SMALL_RETRY_AFTER / PGX_ADMIT_LARGE_RETRY_AFTER  seconds (default: 1 / 10)
+Small means Content-Length <= PGX_INLINE_PARSE_MAX_BYTES.
+"""
+
+import os
+from typing import Dict, Iterable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from backend.parse_pool import INLINE_PARSE_MAX_BYTES, PARSE_WORKERS
+
+MiB = 1024 * 1024
+DISCARD_MAX_BYTES = 64 * 1024
+
+
+class Budget:
+    """In-flight requests and bytes for one size class. Callers pass upload
+    bytes; each is charged `expansion` bytes of `max_bytes`."""
+
+    def __init__(self, name: str, max_inflight: int, max_bytes: int, retry_after: int, expansion: int = 1):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.max_bytes = max_bytes
+        self.retry_after = retry_after
+        self.expansion = expansion
+        self.inflight = 0
+        self.bytes_in_flight = 0
+        self.peak_inflight = 0
+        self.peak_bytes = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.rejected_midstream = 0
+
+    def try_acquire(self, nbytes: int) -> bool:
+        nbytes *= self.expansion
+        if self.inflight >= self.max_inflight or self.bytes_in_flight + nbytes > self.max_bytes:
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        self.admitted += 1
+        self._track(nbytes)
+        return True
+
+    def try_grow(self, nbytes: int) -> bool:
+        nbytes *= self.expansion
+        if self.bytes_in_flight + nbytes > self.max_bytes:
+            self.rejected_midstream += 1
+            return False
+        self._track(nbytes)
+        return True
+
+    def _track(self, nbytes: int):
+        self.bytes_in_flight += nbytes
+        self.peak_inflight = max(self.peak_inflight, self.inflight)
+        self.peak_bytes = max(self.peak_bytes, self.bytes_in_flight)
+
+    def release(self, nbytes: int):
+        self.inflight -= 1
+        self.bytes_in_flight -= nbytes * self.expansion
+
+    def snapshot(self) -> Dict:
+        return {
+            "max_inflight": self.max_inflight,
+            "max_bytes": self.max_bytes,
+            "expansion": self.expansion,
+            "inflight": self.inflight,
+            "bytes_in_flight": self.bytes_in_flight,
+            "peak_inflight": self.peak_inflight,
+            "peak_bytes": self.peak_bytes,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "rejected_midstream": self.rejected_midstream,
+        }
+
+
+SMALL = Budget(
+    "small",
+    int(os.getenv("PGX_ADMIT_SMALL_MAX_INFLIGHT", 64)),
+    int(os.getenv("PGX_ADMIT_SMALL_MAX_BYTES", 128 * MiB)),
+    int(os.getenv("PGX_ADMIT_SMALL_RETRY_AFTER", 1)),
+    int(os.getenv("PGX_ADMIT_SMALL_EXPANSION", 8)),
+)
+LARGE = Budget(
+    "large",
+    int(os.getenv("PGX_ADMIT_LARGE_MAX_INFLIGHT", 2 * max(1, PARSE_WORKERS))),
+    int(os.getenv("PGX_ADMIT_LARGE_MAX_BYTES", 512 * MiB)),
+    int(os.getenv("PGX_ADMIT_LARGE_RETRY_AFTER", 10)),
+)
+
+
+def admission_metrics() -> Dict:
+    return {"small_threshold_bytes": INLINE_PARSE_MAX_BYTES,
+            "small": SMALL.snapshot(), "large": LARGE.snapshot()}
+
+
+def _overloaded_detail(budget: Budget) -> str:
+    return f"Server is at capacity for {budget.name} uploads; retry later."
+
+
+def _overloaded(budget: Budget) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": _overloaded_detail(budget)},
+                        headers={"Retry-After": str(budget.retry_after)})
+
+
+async def _reject(response: JSONResponse, scope, receive, send):
+    """Answer before the body is read. Drain a little of it so a client that is
+    still sending gets the response, not a reset; anything longer is cut off."""
+    if AdmissionMiddleware._expects_continue(scope) or not await _discard_body(receive):
+        response.headers["Connection"] = "close"
+    await response(scope, receive, send)
+
+
+async def _discard_body(receive) -> bool:
+    """Read and drop up to DISCARD_MAX_BYTES of the body; True if that was all of it."""
+    drained = 0
+    while drained <= DISCARD_MAX_BYTES:
+        message = await receive()
+        if message["type"] != "http.request" or not message.get("more_body", False):
+            return True
+        drained += len(message.get("body", b""))
+    return False
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware that gates `paths` on the upload budgets."""
+
+    def __init__(self, app, paths: Iterable[str] = ()):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+
+        declared = self._content_length(scope)
+        if declared is not None and declared > LARGE.max_bytes:
+            response = JSONResponse(status_code=413, content={
+                "detail": f"Upload exceeds the {LARGE.max_bytes // MiB} MiB limit."})
+            return await _reject(response, scope, receive, send)
+
+        budget = SMALL if declared is not None and declared <= INLINE_PARSE_MAX_BYTES else LARGE
+        reserved = declared or 0
+        if not budget.try_acquire(reserved):
+            return await _reject(_overloaded(budget), scope, receive, send)
+
+        received = 0
+
+        async def counted_receive():
+            nonlocal received, reserved
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > reserved:
+                    if not budget.try_grow(received - reserved):
+                        # Raised inside the body parse; FastAPI renders it as the response
+                        raise HTTPException(status_code=503, detail=_overloaded_detail(budget),
+                                            headers={"Retry-After": str(budget.retry_after)})
+                    reserved = received
+            return message
+
+        try:
+            await self.app(scope, counted_receive, send)
+        finally:
+            budget.release(reserved)
+
+    @staticmethod
+    def _expects_continue(scope) -> bool:
+        # 100-continue clients have not sent the body yet and will not if we answer now
+        return (b"expect", b"100-continue") in scope["headers"]
+
+    @staticmethod
+    def _content_length(scope) -> Optional[int]:
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
@@ -0,0 +1,332 @@
+"""Cross-worker cache for parsed profiles and LLM explanations.
+
+Every uvicorn/gunicorn worker talks to the same backend, so a profile parsed or
+an explanation generated on one worker is a hit on all the others:
+
+    sqlite:///path/to/cache.sqlite3   one host, many workers (WAL, on disk)
+    redis://[:password@]host:6379/0   many hosts; any RESP server (Redis, Valkey,
+                                      KeyDB, or scripts/resp_standin.py locally)
+
+Common to both:
+    keys     pgx:v1:<kind>:<sha256 of the inputs>; bump KEY_PREFIX when a
+             cached value's shape changes
+    values   one format byte + JSON ('J'), or zlib-compressed JSON ('Z')
+    expiry   PGX_CACHE_TTL seconds; SQLite additionally evicts least recently
+             used entries above PGX_CACHE_MAX_BYTES (for Redis, configure
+             maxmemory + allkeys-lru on the server)
+
+A failing backend never fails a request: the lookup counts as an error and a
+miss, and the backend is skipped for a few seconds before being retried.
+
+Config (environment):
+    PGX_CACHE_URL         backend URL as above; unset disables caching
+    PGX_CACHE_TTL         seconds (default: 7 days)
+    PGX_CACHE_MAX_BYTES   SQLite size cap (default: 256 MiB)
+    PGX_CACHE_TIMEOUT     Redis socket timeout, seconds (default: 0.5)
+"""
+
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import unquote, urlparse
+
+from backend.result_encoding import dumps_json, loads_json
+
+KEY_PREFIX = "pgx:v1:"
+
+CACHE_URL = os.getenv("PGX_CACHE_URL")
+CACHE_TTL = int(os.getenv("PGX_CACHE_TTL", 7 * 24 * 3600))
+CACHE_MAX_BYTES = int(os.getenv("PGX_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+CACHE_TIMEOUT = float(os.getenv("PGX_CACHE_TIMEOUT", 0.5))
+
+COMPRESS_MIN_BYTES = 1024
+ERROR_BACKOFF_SECONDS = 5.0
+
+
+def cache_key(kind: str, *parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f"{KEY_PREFIX}{kind}:{digest.hexdigest()}"
+
+
+def encode_value(obj) -> bytes:
+    data = dumps_json(obj)
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return b"Z" + zlib.compress(data, 1)
+    return b"J" + data
+
+
+def decode_value(raw: bytes):
+    tag, data = raw[:1], raw[1:]
+    if tag == b"Z":
+        return loads_json(zlib.decompress(data))
+    if tag == b"J":
+        return loads_json(data)
+    raise ValueError(f"unknown cache value format {tag!r}")
+
+
+# ==========================================
+# Backends: bytes in, bytes out
+# ==========================================
+
+class SqliteBackend:
+    """On-disk cache shared by the workers of one host."""
+
+    name = "sqlite"
+    PRUNE_EVERY = 32          # sets between size checks (per process)
+    TOUCH_AFTER = 60.0        # refresh LRU time at most once a minute per key
+
+    def __init__(self, path: str, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._sets = 0
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key       TEXT PRIMARY KEY,
+                value     BLOB NOT NULL,
+                expires   REAL NOT NULL,
+                accessed  REAL NOT NULL,
+                size      INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, kept open: lookups sit on the request path
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        now = time.time()
+        if expires <= now:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now))
+            return None
+        if now - accessed > self.TOUCH_AFTER:
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        now = time.time()
+        self._conn().execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                             (key, value, now + ttl, now, len(value)))
+        self._sets += 1
+        if self._sets % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def prune(self):
+        """Drop expired entries, then least recently used ones down to 90% of the cap."""
+        conn = self._conn()
+        now = time.time()
+        self.evictions += conn.execute("DELETE FROM cache WHERE expires <= ?", (now,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess, victims = total - int(self.max_bytes * 0.9), []
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict:
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+class RespError(Exception):
+    """Error reply from the RESP server."""
+
+
+class RespBackend:
+    """Minimal Redis-protocol (RESP2) client: GET / SET EX / DEL, one socket per thread."""
+
+    name = "redis"
+
+    def __init__(self, host: str, port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 timeout: float = CACHE_TIMEOUT):
+        self.host, self.port, self.db, self.password, self.timeout = host, port, db, password, timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader = sock, sock.makefile("rb")
+        if self.password:
+            self._command("AUTH", self.password)
+        if self.db:
+            self._command("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = self._local.reader = None
+
+    def _command(self, *args):
+        if getattr(self._local, "sock", None) is None:
+            self._connect()
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            self._local.sock.sendall(b"".join(parts))
+            return self._read_reply()
+        except (OSError, ValueError):
+            # Timeouts, resets, protocol desync: start over on a fresh socket next time
+            self._close()
+            raise
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by RESP server")
+        tag, body = line[:1], line[1:-2]
+        if tag == b"+":
+            return body
+        if tag == b"-":
+            raise RespError(body.decode("utf-8", errors="replace"))
+        if tag == b":":
+            return int(body)
+        if tag == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("short read from RESP server")
+            return data[:-2]
+        if tag == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ValueError(f"unexpected RESP reply {line[:20]!r}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self._command("SET", key, value, "EX", ttl)
+
+    def delete(self, key: str):
+        self._command("DEL", key)
+
+    def stats(self) -> Dict:
+        return {"host": f"{self.host}:{self.port}", "db": self.db}
+
+
+def backend_from_url(url: str):
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SqliteBackend(unquote(parsed.path) if parsed.netloc == "" else parsed.netloc + parsed.path)
+    if parsed.scheme == "redis":
+        db = parsed.path.strip("/")
+        return RespBackend(parsed.hostname or "localhost", parsed.port or 6379, int(db) if db else 0,
+                           unquote(parsed.password) if parsed.password else None)
+    raise ValueError(f"unsupported PGX_CACHE_URL scheme {parsed.scheme!r} (use sqlite:// or redis://)")
+
+
+# ==========================================
+# Front end: serialization, metrics, failure isolation
+# ==========================================
+
+class Cache:
+    def __init__(self, backend, ttl: int = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._counts: Counter = Counter()         # (kind, event) -> n
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    def _count(self, kind: str, event: str):
+        with self._lock:
+            self._counts[(kind, event)] += 1
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, kind: str):
+        self._count(kind, "errors")
+        self._down_until = time.monotonic() + ERROR_BACKOFF_SECONDS
+
+    def get(self, key: str):
+        kind = key[len(KEY_PREFIX):].split(":", 1)[0]
+        if not self._available():
+            self._count(kind, "misses")
+            return None
+        try:
+            raw = self.backend.get(key)
+            value = None if raw is None else decode_value(raw)
+        except Exception:
+            self._failed(kind)
+            value = None
+        self._count(kind, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value):
+        kind = key[len(KEY_PREFIX):].split(":", 1)[0]
+        if not self._available():
+            return
+        try:
+            self.backend.set(key, encode_value(value), self.ttl)
+            self._count(kind, "sets")
+        except Exception:
+            self._failed(kind)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        kinds: Dict[str, Dict] = {}
+        for (kind, event), n in counts.items():
+            kinds.setdefault(kind, {"hits": 0, "misses": 0, "sets": 0, "errors": 0})[event] = n
+        for k in kinds.values():
+            lookups = k["hits"] + k["misses"]
+            k["hit_rate"] = round(k["hits"] / lookups, 4) if lookups else None
+        try:
+            backend = self.backend.stats() if self._available() else {}
+        except Exception:
+            backend = {}
+        return {"backend": self.backend.name, "ttl": self.ttl, **backend, "kinds": kinds}
+
+
+_cache: Optional[Cache] = None
+
+
+def get_cache() -> Optional[Cache]:
+    """Process-wide cache from PGX_CACHE_URL, or None when caching is off."""
+    global _cache
+    if _cache is None and CACHE_URL:
+        _cache = Cache(backend_from_url(CACHE_URL))
+    return _cache
+
+
+def cache_metrics() -> Dict:
+    cache = get_cache()
+    return cache.metrics() if cache is not None else {"backend": None}
@@ -0,0 +1,232 @@
+"""Drug-name normalization and autocomplete.
+
+Maps generics, brand names, salt forms and common abbreviations onto the
+canonical DRUG_GENE_MAP keys, so "Plavix", "5-FU" or "clopidogrel bisulfate"
+reach the right CPIC rule instead of the 0.50-confidence default.
+
+Resolution for analysis is strict: an exact generic / synonym, optionally
+followed by strength and formulation words ("Warfarin 5 mg tablets") or
+with a salt word added ("Omeprazole Sodium"). Anything else resolves to
+nothing, and callers offer `did_you_mean` instead of guessing: a near miss
+like "Esomeprazole" or "Carace" is a different drug, not a typo.
+
+Autocomplete goes through a prefix trie whose nodes carry their best
+completions precomputed, so it is one walk down the query's characters.
+Inputs the trie cannot place fall back to a bounded edit-distance scan over
+the (small) lexicon to catch typos; that fuzzy match only ever suggests.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from backend.pgx_engine import DRUG_GENE_MAP
+
+# canonical (DRUG_GENE_MAP key) -> brand names, salts, abbreviations
+DRUG_SYNONYMS = {
+    "WARFARIN":     ["Coumadin", "Jantoven", "Marevan", "Warfarin Sodium"],
+    "CLOPIDOGREL":  ["Plavix", "Iscover", "Clopidogrel Bisulfate", "Clopidogrel Hydrogen Sulfate"],
+    "OMEPRAZOLE":   ["Prilosec", "Losec", "Omeprazole Magnesium"],
+    "SERTRALINE":   ["Zoloft", "Lustral", "Sertraline Hydrochloride", "Sertraline HCl"],
+    "CODEINE":      ["Codeine Phosphate", "Codeine Sulfate"],
+    "TAMOXIFEN":    ["Nolvadex", "Soltamox", "Tamoxifen Citrate"],
+    "ONDANSETRON":  ["Zofran", "Ondansetron Hydrochloride", "Ondansetron HCl"],
+    "SIMVASTATIN":  ["Zocor", "Flolipid"],
+    "FLUOROURACIL": ["5-FU", "5-Fluorouracil", "Adrucil", "Efudex", "Carac"],
+    "CAPECITABINE": ["Xeloda"],
+}
+
+MAX_COMPLETIONS = 10       # completions kept per trie node
+MAX_EDIT_DISTANCE = 2      # fuzzy fallback tolerance
+MIN_FUZZY_LENGTH = 4       # shorter inputs are too ambiguous to correct
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+_WORD_SPLIT = re.compile(r'[\s,;/()]+')
+# Strength tokens, matched against normalize_key()'d words ("2.5 mg" -> "25", "MG")
+_STRENGTH = re.compile(r'\d+(MG|MCG|UG|G|ML|IU)?|MG|MCG|UG|G|ML|IU')
+_STRENGTH_SUFFIX = re.compile(r'\d+(MG|MCG|UG|G|ML|IU)?$')
+
+# Words that may follow a drug name without changing the drug
+SALT_WORDS = frozenset({
+    "SODIUM", "POTASSIUM", "MAGNESIUM", "CALCIUM", "HYDROCHLORIDE", "HCL", "SULFATE", "SULPHATE",
+    "BISULFATE", "HYDROGENSULFATE", "PHOSPHATE", "CITRATE", "MALEATE", "MESYLATE", "TARTRATE",
+})
+FORM_WORDS = frozenset({
+    "TABLET", "TABLETS", "TAB", "TABS", "CAPSULE", "CAPSULES", "CAP", "CAPS", "ORAL", "SOLUTION",
+    "SUSPENSION", "INJECTION", "INFUSION", "CREAM", "FILMCOATED", "DELAYEDRELEASE", "DR", "ER", "XR",
+    "ODT",
+})
+
+
+def normalize_key(name: str) -> str:
+    """Case/punctuation-insensitive lookup key: 'Clopidogrel-Bisulfate' -> 'CLOPIDOGRELBISULFATE'."""
+    return _NON_ALNUM.sub('', name.upper())
+
+
+class _TrieNode:
+    __slots__ = ('children', 'completions')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.completions: List[Tuple[int, str, str]] = []   # (rank, term, canonical)
+
+
+class DrugLexicon:
+    def __init__(self, synonyms: Dict[str, List[str]]):
+        self.root = _TrieNode()
+        self.exact: Dict[str, str] = {}           # normalized term -> canonical
+        self.terms: List[Tuple[str, str, str]] = []  # (normalized, display, canonical)
+
+        for canonical in DRUG_GENE_MAP:
+            for rank, term in enumerate([canonical.title(), *synonyms.get(canonical, [])]):
+                key = normalize_key(term)
+                self.exact.setdefault(key, canonical)
+                self.terms.append((key, term, canonical))
+                # Index every word start so "fluoro" finds "5-Fluorouracil"
+                words = [w for w in re.split(r'[^A-Za-z0-9]+', term) if w]
+                for i in range(len(words)):
+                    self._insert(normalize_key(''.join(words[i:])), (rank + i, term, canonical))
+
+    def _insert(self, key: str, entry: Tuple[int, str, str]):
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            if entry not in node.completions:
+                node.completions.append(entry)
+                node.completions.sort(key=lambda e: (e[0], e[1]))
+                del node.completions[MAX_COMPLETIONS:]
+
+    def _prefix(self, key: str) -> List[Tuple[int, str, str]]:
+        node = self.root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.completions
+
+    def _fuzzy(self, key: str, partial: bool) -> List[Tuple[int, str, str]]:
+        """(distance, term, canonical) within MAX_EDIT_DISTANCE, closest first.
+        With `partial`, a term also matches if its same-length prefix does, so
+        a mistyped fragment still completes."""
+        scored = []
+        for term_key, term, canonical in self.terms:
+            d = _edit_distance(key, term_key, MAX_EDIT_DISTANCE)
+            if partial:
+                d = min(d, _edit_distance(key, term_key[:len(key)], MAX_EDIT_DISTANCE))
+            if d <= MAX_EDIT_DISTANCE:
+                scored.append((d, term, canonical))
+        scored.sort()
+        return scored
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Canonical drug for a free-text name: exact generic / synonym, after
+        dropping trailing strength / formulation words ("Plavix 75 mg tablets")
+        and salt words ("Omeprazole Sodium"). Never guesses; None otherwise."""
+        key = normalize_key(name or '')
+        if not key:
+            return None
+        if key in self.exact:
+            return self.exact[key]
+        words = [w for w in (normalize_key(w) for w in _WORD_SPLIT.split(name.upper())) if w]
+        while len(words) > 1 and (words[-1] in FORM_WORDS or _STRENGTH.fullmatch(words[-1])):
+            words.pop()
+        if words:
+            # Strength written without a space: "Warfarin5mg"
+            words[-1] = _STRENGTH_SUFFIX.sub('', words[-1]) or words[-1]
+        for candidate in (''.join(words), ''.join(w for i, w in enumerate(words) if i == 0 or w not in SALT_WORDS)):
+            if candidate in self.exact:
+                return self.exact[candidate]
+        return None
+
+    def did_you_mean(self, name: str, limit: int = 5) -> List[str]:
+        """Close lexicon terms for a name that did not resolve, as 'Term (Drug)'."""
+        out = []
+        for entry in self.suggest(name, limit):
+            label = entry['matched'] if normalize_key(entry['matched']) == normalize_key(entry['drug']) \
+                else f"{entry['matched']} ({entry['drug']})"
+            if label not in out:
+                out.append(label)
+        return out
+
+    def suggest(self, query: str, limit: int = MAX_COMPLETIONS) -> List[Dict]:
+        """Autocomplete: prefix matches first, typo-tolerant matches if none."""
+        key = normalize_key(query or '')
+        if not key:
+            return [self._entry(c.title(), c, 'all') for c in DRUG_GENE_MAP][:limit]
+
+        hits = self._prefix(key)
+        match = 'prefix'
+        if not hits and len(key) >= MIN_FUZZY_LENGTH - 1:
+            hits = self._fuzzy(key, partial=True)
+            match = 'fuzzy'
+
+        results, seen = [], set()
+        for _, term, canonical in hits:
+            if (term, canonical) in seen:
+                continue
+            seen.add((term, canonical))
+            results.append(self._entry(term, canonical, match))
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def _entry(term: str, canonical: str, match: str) -> Dict:
+        return {
+            "drug": canonical.title(),
+            "matched": term,
+            "gene": DRUG_GENE_MAP[canonical],
+            "match": match,
+        }
+
+
+def _edit_distance(a: str, b: str, max_dist: int) -> int:
+    """Levenshtein distance computed only inside the ±max_dist diagonal band;
+    returns max_dist + 1 as soon as the distance is known to exceed it."""
+    n, m = len(a), len(b)
+    over = max_dist + 1
+    if abs(n - m) > max_dist:
+        return over
+    prev = [j if j <= max_dist else over for j in range(m + 1)]
+    for i in range(1, n + 1):
+        cur = [over] * (m + 1)
+        lo = max(1, i - max_dist)
+        hi = min(m, i + max_dist)
+        if i <= max_dist:
+            cur[0] = i
+        best = cur[0]
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            d = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < d:
+                d = prev[j] + 1
+            if cur[j - 1] + 1 < d:
+                d = cur[j - 1] + 1
+            cur[j] = d
+            if d < best:
+                best = d
+        if best > max_dist:
+            return over
+        prev = cur
+    return min(prev[m], over)
+
+
+LEXICON = DrugLexicon(DRUG_SYNONYMS)
+
+
+@lru_cache(maxsize=4096)
+def normalize_drug(name: str) -> Optional[str]:
+    """Canonical DRUG_GENE_MAP key for a drug name, or None if it does not
+    resolve unambiguously (see `did_you_mean`)."""
+    return LEXICON.resolve(name)
+
+
+def did_you_mean(name: str) -> List[str]:
+    """Suggestions to offer when `normalize_drug` returned None."""
+    return LEXICON.did_you_mean(name)
+
+
+@lru_cache(maxsize=4096)
+def suggest_drugs(query: str, limit: int = MAX_COMPLETIONS) -> Tuple[Dict, ...]:
+    """Memoized autocomplete for the API (keystroke queries repeat a lot)."""
+    return tuple(LEXICON.suggest(query, limit))
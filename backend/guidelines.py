@@ -0,0 +1,103 @@
+"""Guideline versioning.
+
+Every result is stamped with GUIDELINE_VERSION: a human label plus a digest of
+what the rules actually output. The digest is taken over the full evaluation
+table — every (gene, drug, diplotype) the activity tables can produce run
+through `_score_to_phenotype` and `assess_drug_risk` — so any edit to
+GENE_ACTIVITY_TABLES, DRUG_GENE_MAP or the risk rules that changes an output
+yields a new version, and edits that change nothing (comments, refactors) do not.
+"""
+
+import hashlib
+import json
+from typing import Dict, Iterable, List, Tuple
+
+from backend.pgx_engine import (
+    GENE_ACTIVITY_TABLES,
+    DRUG_GENE_MAP,
+    NO_CALL_DIPLOTYPE,
+    _score_to_phenotype,
+    assess_drug_risk,
+)
+
+# Bump when adopting a new CPIC release; the digest suffix tracks rule edits.
+GUIDELINE_LABEL = "CPIC-2026.02"
+
+# (gene, drug, diplotype) — the unit that recomputation diffs on
+GuidelineKey = Tuple[str, str, str]
+
+
+def evaluate(gene: str, drug: str, diplotype: str) -> Dict:
+    """Phenotype + risk for a called diplotype under the currently loaded rules.
+
+    Mirrors the scoring in `call_diplotype` (unknown alleles score 1.0)."""
+
+    if diplotype == NO_CALL_DIPLOTYPE:
+        activity_score, phenotype = None, "Unknown"
+    else:
+        table = GENE_ACTIVITY_TABLES.get(gene, {})
+        allele1, _, allele2 = diplotype.partition('/')
+        activity_score = table.get(allele1, 1.0) + table.get(allele2, 1.0)
+        phenotype = _score_to_phenotype(gene, activity_score)
+    risk_label, severity, confidence, recommendation = assess_drug_risk(
+        drug, gene, phenotype, diplotype, activity_score
+    )
+    return {
+        'phenotype': phenotype,
+        'activity_score': activity_score,
+        'risk_label': risk_label,
+        'severity': severity,
+        'confidence': confidence,
+        'recommendation': recommendation,
+    }
+
+
+def guideline_domain() -> List[GuidelineKey]:
+    """Every (gene, drug, diplotype) the caller can emit for a mapped drug,
+    including the no-call."""
+    keys = []
+    for drug, gene in DRUG_GENE_MAP.items():
+        alleles = list(GENE_ACTIVITY_TABLES.get(gene, {"*1": 1.0}))
+        for a1 in alleles:
+            for a2 in alleles:
+                keys.append((gene, drug, f"{a1}/{a2}"))
+        keys.append((gene, drug, NO_CALL_DIPLOTYPE))
+    return keys
+
+
+def evaluation_table(extra_keys: Iterable[GuidelineKey] = ()) -> Dict[GuidelineKey, Dict]:
+    """Evaluate the base domain plus any extra (e.g. observed) keys."""
+    keys = dict.fromkeys([*guideline_domain(), *extra_keys])
+    return {key: evaluate(*key) for key in keys}
+
+
+def _fingerprint(table: Dict[GuidelineKey, Dict]) -> str:
+    canonical = json.dumps(sorted((list(k), v) for k, v in table.items()),
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+# The base domain, evaluated once at import (it also yields the version digest)
+EVALUATION_TABLE = evaluation_table()
+
+GUIDELINE_VERSION = f"{GUIDELINE_LABEL}+{_fingerprint(EVALUATION_TABLE)}"
+
+
+def risk_matrix(profiles: Dict[str, Dict], drugs: Iterable[str] = ()) -> List[Dict]:
+    """Every mapped drug (or just `drugs`, already normalized) against a patient's
+    per-gene profile in one pass: a lookup per drug into EVALUATION_TABLE, falling
+    back to `evaluate` for diplotypes outside the base domain.
+
+    One row per drug, for its DRUG_GENE_MAP gene: the rules only cover that
+    pair, so other drug x gene pairs have no guideline and get no row (the
+    grid shows them empty rather than as a made-up "Safe").
+
+    Returns [{'drug', 'gene', 'diplotype', 'phenotype', 'activity_score',
+    'risk_label', 'severity', 'confidence', 'recommendation'}] in `drugs` order."""
+    rows = []
+    for drug in (drugs or DRUG_GENE_MAP):
+        gene = DRUG_GENE_MAP[drug]
+        diplotype = profiles[gene]['diplotype'] if gene in profiles else '*1/*1'
+        out = EVALUATION_TABLE.get((gene, drug, diplotype)) or evaluate(gene, drug, diplotype)
+        rows.append({'drug': drug, 'gene': gene, 'diplotype': diplotype, **out})
+    return rows
@@ -0,0 +1,111 @@
+"""gVCF reference-block coverage at star-allele-defining sites.
+
+A gVCF is mostly `END=` reference blocks (ALT `<NON_REF>` or `<*>`) that say
+"this stretch is confidently reference". Rather than keeping the blocks —
+millions of them on a whole genome — the index is built over the handful of
+positions that matter (pgx_engine.DEFINING_SITES): each block is bisected
+against the sorted sites of its contig as it streams past and then dropped,
+so memory is one slot per defining site regardless of input size.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+from backend.pgx_engine import DEFINING_SITES, _is_alt
+
+# ALT of a pure reference block (GATK / DeepVariant+GLnexus, bcftools)
+REF_BLOCK_ALTS = frozenset(('<NON_REF>', '<*>'))
+
+
+def _contig(chrom: str) -> str:
+    return chrom[3:] if chrom[:3].lower() == 'chr' else chrom
+
+
+def _format_int(fmt: str, sample: str, key: str) -> Optional[int]:
+    keys = fmt.split(':')
+    if key not in keys:
+        return None
+    values = sample.split(':')
+    i = keys.index(key)
+    try:
+        return int(values[i]) if i < len(values) else None
+    except ValueError:
+        return None
+
+
+class SiteCoverage:
+    """Which defining sites are covered by a confident reference block or call."""
+
+    def __init__(self, min_gq: int, min_depth: int, sites: Dict[str, list] = DEFINING_SITES):
+        self.min_gq = min_gq
+        self.min_depth = min_depth
+        self.blocks = 0
+        self._sites = sites
+        self._positions: Dict[str, List[int]] = {}       # contig -> sorted site positions
+        self._genes: Dict[tuple, set] = {}                # (contig, pos) -> genes it defines
+        for gene, gene_sites in sites.items():
+            for chrom, pos, _, _ in gene_sites:
+                self._positions.setdefault(_contig(chrom), []).append(pos)
+                self._genes.setdefault((_contig(chrom), pos), set()).add(gene)
+        for positions in self._positions.values():
+            positions.sort()
+        self.covered = set()                              # (contig, pos)
+
+    def add_block(self, chrom: str, pos: str, info: str, fmt: str, sample: str):
+        """Fold one reference-block record in (nothing is kept beyond the sites)."""
+        self.blocks += 1
+        positions = self._positions.get(_contig(chrom))
+        if not positions:
+            return
+        try:
+            start = end = int(pos)
+            for token in info.split(';'):
+                if token.startswith('END='):
+                    end = int(token[4:])
+                    break
+        except ValueError:
+            return
+        lo, hi = bisect_left(positions, start), bisect_right(positions, end)
+        if lo == hi:
+            return
+        gt = sample.split(':', 1)[0]
+        if '.' in gt or not self._confident(fmt, sample):
+            return
+        contig = _contig(chrom)
+        for site_pos in positions[lo:hi]:
+            self.covered.add((contig, site_pos))
+
+    def add_call(self, chrom: str, pos: str, gene: str, star: str, genotype: str):
+        """A QC-passing record at a site covers it if the caller can read it: a
+        0/0 call, or a variant whose star allele is attributed to the site's gene.
+        Any other call there (unannotated, other gene, multi-allelic) leaves the
+        site uncovered, so the gene cannot come out wild-type."""
+        key = (_contig(chrom), int(pos)) if pos.isdigit() else None
+        genes = self._genes.get(key)
+        if not genes:
+            return
+        zygosity = _is_alt(genotype)
+        if zygosity == 'hom_ref' or (star and gene in genes and zygosity in ('het', 'hom_alt')):
+            self.covered.add(key)
+
+    def _confident(self, fmt: str, sample: str) -> bool:
+        # Blocks carry the block-minimum GQ; depth is MIN_DP (GATK) or DP
+        gq = _format_int(fmt, sample, 'GQ')
+        if gq is None or gq < self.min_gq:
+            return False
+        depth = _format_int(fmt, sample, 'MIN_DP')
+        if depth is None:
+            depth = _format_int(fmt, sample, 'DP')
+        return depth is None or depth >= self.min_depth
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for gene, gene_sites in self._sites.items():
+            uncovered = [rsid for chrom, pos, rsid, _ in gene_sites
+                         if (_contig(chrom), pos) not in self.covered]
+            out[gene] = {
+                'sites': len(gene_sites),
+                'covered': len(gene_sites) - len(uncovered),
+                'uncovered': uncovered,
+            }
+        return out
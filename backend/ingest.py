@@ -0,0 +1,504 @@
+"""Watch-folder ingestion: analyze VCFs handed off by a sequencing pipeline.
+
+    python -m backend.ingest --watch /data/incoming --out /data/pgx-results
+    python -m backend.ingest --watch /data/incoming --out /data/pgx-results \\
+        --drugs clopidogrel,warfarin --workers 4 --recursive
+    python -m backend.ingest --watch /data/incoming --out /data/pgx-results --once
+
+Every new or changed `*.vcf` / `*.vcf.gz` is run against the drug panel (all
+mapped drugs by default) and written to `<out>/<name>.<sha12>.pgx.json` in the
+POST /api/v1/pgx/matrix layout, without LLM text; a file that cannot be
+analyzed gets `<name>.<sha12>.error.json` instead. With PGX_STORE_PATH set, the
+patient is also recorded in the profile store.
+
+Change detection: watchdog (inotify / FSEvents / ReadDirectoryChangesW) when
+it is installed, polling otherwise. A full rescan runs at startup and every
+--rescan seconds either way, so files dropped while the service was down, or
+events lost on network filesystems, are still picked up.
+
+Partial files: dot-files and *.tmp / *.part / *.partial / *.filepart names are
+ignored (rename into place when done), and a file is only read once it has not
+been modified for --settle seconds. A file whose size or mtime changes while a
+worker reads it is put back to wait.
+
+Exactly once: a SQLite ledger in the output directory keyed by SHA-256 of the
+content. Workers hash a file in the same read as the analysis and the service
+claims the checksum when the result comes back: content already processed,
+under any name, is dropped there; a changed file has a new checksum and is
+processed again. The ledger also remembers each path's size/mtime, so a
+restart does not re-read unchanged files. Outputs are renamed into place
+before the ledger row is marked done, and the output name and patient id
+derive from the checksum, so a file interrupted by a crash is redone on
+restart without producing a second result. Run one ingest process per
+output directory.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from backend.drug_lexicon import did_you_mean, normalize_drug
+from backend.guidelines import GUIDELINE_VERSION, risk_matrix
+from backend.parse_pool import build_file_profile
+from backend.pgx_engine import DRUG_GENE_MAP
+from backend.profile_store import get_store
+from backend.reports import matrix_report, quality_metrics
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional; polling fallback
+    Observer = None
+
+VCF_SUFFIXES = ('.vcf', '.vcf.gz')
+PARTIAL_SUFFIXES = ('.tmp', '.part', '.partial', '.filepart', '.crdownload', '~')
+LEDGER_NAME = ".pgx-ingest-ledger.sqlite3"
+TICK_SECONDS = 1.0
+MAX_CRASHES = 2          # worker deaths (OOM kill, ...) on one file before it is marked failed
+
+FileId = Tuple[str, int, int]    # path, size, mtime_ns: one version of a file
+
+_LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested (
+    sha256    TEXT PRIMARY KEY,
+    source    TEXT NOT NULL,
+    status    TEXT NOT NULL,          -- processing | done | failed
+    output    TEXT,
+    error     TEXT,
+    started   TEXT NOT NULL,
+    finished  TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    sha256    TEXT NOT NULL
+);
+"""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _log(message: str):
+    print(f"{_now()} {message}", flush=True)
+
+
+def is_candidate(name: str) -> bool:
+    lower = name.lower()
+    return (not name.startswith('.') and lower.endswith(VCF_SUFFIXES)
+            and not lower.endswith(PARTIAL_SUFFIXES))
+
+
+def output_stem(path: str, sha256: str) -> str:
+    name = os.path.basename(path)
+    for suffix in ('.vcf.gz', '.vcf'):
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return f"{name}.{sha256[:12]}"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _worker_init():
+    # Ctrl-C reaches the whole process group; let the service decide how to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class _HashingReader(io.RawIOBase):
+    """Raw file wrapper that hashes every byte as it is read."""
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._fh.readinto(buffer)
+        self.digest.update(memoryview(buffer)[:n])
+        return n
+
+
+def analyze_file(path: str, drugs: Tuple[str, ...]) -> Dict:
+    """Worker-process side: hash, parse and evaluate the panel in one streaming
+    read (decompressed on the fly for .gz). Returns the checksum of the bytes
+    actually read, with 'compact' + 'rows' or, if the content cannot be
+    analyzed, 'error'."""
+    with open(path, 'rb', buffering=0) as fh:
+        raw = _HashingReader(fh)
+        stream = io.BufferedReader(raw, 1024 * 1024)
+        try:
+            if path.lower().endswith('.gz'):
+                stream = gzip.GzipFile(fileobj=stream)
+            compact = build_file_profile(stream, ())
+            result = {'compact': compact, 'rows': risk_matrix(compact['profiles'], drugs)}
+        except Exception as exc:
+            result = {'error': f"{type(exc).__name__}: {exc}"}
+        # Hash whatever the parse left unread (the rest of a bad file, bytes after
+        # the gzip trailer); a file that cannot be read at all raises here
+        while raw.readinto(bytearray(1024 * 1024)):
+            pass
+    result['sha256'] = raw.digest.hexdigest()
+    return result
+
+
+class Ledger:
+    def __init__(self, path: str):
+        # Only the service's main thread touches the ledger
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_LEDGER_SCHEMA)
+        self.files: Dict[str, Tuple[int, int, str]] = {
+            p: (size, mtime, sha) for p, size, mtime, sha in self.conn.execute("SELECT * FROM files")
+        }
+
+    def recover(self, retry_failed: bool = False) -> int:
+        """Release work a previous run left unfinished (and failures, if asked)."""
+        statuses = ('processing', 'failed') if retry_failed else ('processing',)
+        return self.conn.execute(
+            f"DELETE FROM ingested WHERE status IN ({','.join('?' * len(statuses))})", statuses
+        ).rowcount
+
+    def known(self, path: str, size: int, mtime_ns: int) -> bool:
+        """Unchanged since it was last hashed, and that content is settled."""
+        entry = self.files.get(path)
+        return entry is not None and entry[:2] == (size, mtime_ns) and self.status(entry[2]) is not None
+
+    def remember(self, path: str, size: int, mtime_ns: int, sha256: str):
+        self.files[path] = (size, mtime_ns, sha256)
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, size, mtime_ns, sha256))
+
+    def status(self, sha256: str) -> Optional[str]:
+        row = self.conn.execute("SELECT status FROM ingested WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def claim(self, sha256: str, source: str) -> bool:
+        return self.conn.execute(
+            "INSERT OR IGNORE INTO ingested (sha256, source, status, started) VALUES (?, ?, 'processing', ?)",
+            (sha256, source, _now()),
+        ).rowcount == 1
+
+    def release(self, sha256: str):
+        self.conn.execute("DELETE FROM ingested WHERE sha256 = ? AND status = 'processing'", (sha256,))
+
+    def finish(self, sha256: str, status: str, output: str, error: Optional[str] = None):
+        self.conn.execute(
+            "UPDATE ingested SET status = ?, output = ?, error = ?, finished = ? WHERE sha256 = ?",
+            (status, output, error, _now(), sha256),
+        )
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM ingested GROUP BY status").fetchall())
+
+
+class IngestService:
+    def __init__(self, watch_dir: str, out_dir: str, drugs: Tuple[str, ...], workers: int = 2,
+                 settle: float = 5.0, poll_interval: float = 2.0, rescan: float = 300.0,
+                 recursive: bool = False, use_watchdog: bool = True, retry_failed: bool = False):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.out_dir = os.path.abspath(out_dir)
+        self.drugs = drugs
+        self.workers = max(1, workers)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.rescan = rescan
+        self.recursive = recursive
+        self.use_watchdog = use_watchdog and Observer is not None
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.ledger = Ledger(os.path.join(self.out_dir, LEDGER_NAME))
+        recovered = self.ledger.recover(retry_failed)
+        if recovered:
+            _log(f"re-queued {recovered} unfinished file(s) from a previous run")
+        self.candidates: Set[str] = set()
+        self.events: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self.inflight: Dict[Future, FileId] = {}
+        self.crashes: Counter = Counter()                     # FileId -> worker deaths while alone
+        self.suspects: Set[FileId] = set()                    # in flight when a worker died
+        self.unreadable: Dict[str, FileId] = {}               # path -> version the worker could not read
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.processed = 0
+        self._stopping = False
+
+    # ── Discovery ──
+
+    def _walk(self) -> Iterator[str]:
+        if not self.recursive:
+            with os.scandir(self.watch_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and is_candidate(entry.name):
+                        yield entry.path
+            return
+        for root, dirs, names in os.walk(self.watch_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in names:
+                if is_candidate(name):
+                    yield os.path.join(root, name)
+
+    def scan(self):
+        self.candidates.update(self._walk())
+
+    def _start_observer(self):
+        service = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                # Creates, writes, closes and renames into place all end up here
+                path = getattr(event, 'dest_path', '') or event.src_path
+                if is_candidate(os.path.basename(path)):
+                    service.events.put(os.path.abspath(path))
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.watch_dir, recursive=self.recursive)
+        observer.start()
+        return observer
+
+    # ── Processing ──
+
+    def _ready(self, path: str) -> Optional[os.stat_result]:
+        """stat if the file exists and has been quiet for `settle` seconds."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.candidates.discard(path)
+            return None
+        if time.time() - st.st_mtime < self.settle:
+            return None
+        return st
+
+    @staticmethod
+    def _file_id(path: str) -> Optional[FileId]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return path, st.st_size, st.st_mtime_ns
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def _dispatch(self):
+        # After a crash, run serially until every file in flight at the time has run alone
+        limit = 1 if self.suspects else self.workers
+        running = {file_id[0] for file_id in self.inflight.values()}
+        for path in sorted(self.candidates):
+            if len(self.inflight) >= limit:
+                return
+            if path in running:
+                continue                           # stays queued; checked again when it is back
+            st = self._ready(path)
+            if st is None:
+                continue
+            self.candidates.discard(path)
+            file_id = (path, st.st_size, st.st_mtime_ns)
+            if self.ledger.known(*file_id) or self.unreadable.get(path) == file_id:
+                continue
+            # The worker hashes as it reads; the content is claimed when it reports back
+            self.inflight[self.pool.submit(analyze_file, path, self.drugs)] = file_id
+
+    def _collect(self, block: bool = False):
+        done = [f for f in self.inflight if block or f.done()]
+        broken = [f for f in done if isinstance(f.exception(), BrokenProcessPool)]
+        for future in done:
+            file_id = self.inflight.pop(future)
+            path = file_id[0]
+            if future in broken:
+                self._crashed(file_id, alone=len(broken) == 1)
+                continue
+            self.suspects.discard(file_id)
+            try:
+                result = future.result()
+            except Exception as exc:
+                # Not even readable; try again once the file changes
+                self.unreadable[path] = file_id
+                _log(f"cannot read {path}: {type(exc).__name__}: {exc}")
+                continue
+            if self._file_id(path) != file_id:
+                # Rewritten (or removed) while it was read: let it settle and start over
+                self.candidates.add(path)
+                continue
+            self._settle(file_id, result['sha256'], result)
+        if broken and not self._stopping:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+
+    def _settle(self, file_id: FileId, sha256: str, result: Dict):
+        """Claim the content and write its result, unless it was already done under any name."""
+        path = file_id[0]
+        self.ledger.remember(*file_id, sha256)
+        if not self.ledger.claim(sha256, path):
+            _log(f"skip {path}: content already {self.ledger.status(sha256)} ({sha256[:12]})")
+            return
+        if 'error' in result:
+            self._fail(path, sha256, result['error'])
+        else:
+            self._finish(path, sha256, result)
+
+    def _crashed(self, file_id: FileId, alone: bool):
+        """A worker died (OOM kill, signal, ...). Only a crash with nothing else in
+        flight is blamed on the file; the others re-run one at a time to find out."""
+        path = file_id[0]
+        if alone and not self._stopping:
+            self.crashes[file_id] += 1
+        if self.crashes[file_id] >= MAX_CRASHES:
+            self.suspects.discard(file_id)
+            try:
+                # The worker never reported a checksum; rare enough to hash here
+                sha256 = file_sha256(path)
+            except OSError:
+                return
+            self._settle(file_id, sha256, {'error': "worker process died while analyzing this file"})
+            return
+        if not alone:
+            self.suspects.add(file_id)
+        self.candidates.add(path)
+
+    def _fail(self, path: str, sha256: str, error: str):
+        name = f"{output_stem(path, sha256)}.error.json"
+        self._write(name, {"source": path, "sha256": sha256, "timestamp": _now(), "error": error})
+        self.ledger.finish(sha256, 'failed', name, error[:500])
+        _log(f"FAILED {path}: {error}")
+
+    def _finish(self, path: str, sha256: str, result: Dict):
+        compact, rows = result['compact'], result['rows']
+        stem = output_stem(path, sha256)
+        # Derived from the content, so a redo after a crash is the same patient
+        patient_id = f"PG-{sha256[:8].upper()}"
+        store = get_store()
+        if store is not None:
+            store.record_analysis(patient_id, compact['profiles'], rows, path)
+        self._write(f"{stem}.pgx.json", {
+            "source": path,
+            "sha256": sha256,
+            "patient_id": patient_id,
+            "timestamp": _now(),
+            "guideline_version": GUIDELINE_VERSION,
+            **matrix_report(compact, rows),
+            "quality_metrics": quality_metrics(compact),
+        })
+        self.ledger.finish(sha256, 'done', f"{stem}.pgx.json")
+        self.processed += 1
+        flagged = sum(r['risk_label'] != 'Safe' for r in rows)
+        _log(f"done {path} -> {stem}.pgx.json ({len(rows)} drugs, {flagged} flagged)")
+
+    def _write(self, name: str, payload: Dict):
+        target = os.path.join(self.out_dir, name)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(payload, fh, indent=2)
+        os.replace(tmp, target)
+
+    # ── Main loop ──
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def run(self, once: bool = False) -> int:
+        mode = "watchdog" if self.use_watchdog and not once else f"polling every {self.poll_interval:g}s"
+        _log(f"watching {self.watch_dir} ({mode}), {self.workers} worker(s), "
+             f"{len(self.drugs)} drug(s), output {self.out_dir}")
+        observer = self._start_observer() if self.use_watchdog and not once else None
+        self.pool = self._new_pool()
+        try:
+            self.scan()
+            next_scan = time.monotonic() + (self.rescan if observer else self.poll_interval)
+            while not self._stopping:
+                while True:
+                    try:
+                        self.candidates.add(self.events.get_nowait())
+                    except queue.Empty:
+                        break
+                if time.monotonic() >= next_scan:
+                    self.scan()
+                    next_scan = time.monotonic() + (self.rescan if observer else self.poll_interval)
+                self._dispatch()
+                self._collect()
+                if once and not self.inflight and not any(self._ready(p) for p in list(self.candidates)):
+                    break
+                time.sleep(TICK_SECONDS if not once else 0.05)
+            # Finish what was started; anything not yet claimed is picked up next run
+            self._collect(block=True)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        _log(f"stopped: {self.processed} processed this run; ledger {self.ledger.counts()}")
+        return 0
+
+
+def parse_drugs(value: Optional[str]) -> Tuple[str, ...]:
+    if not value:
+        return tuple(DRUG_GENE_MAP)
+    drugs = []
+    for name in value.split(','):
+        name = name.strip()
+        if name:
+            key = normalize_drug(name)
+            if key is None:
+                suggestions = did_you_mean(name)
+                hint = f" (did you mean: {', '.join(suggestions)}?)" if suggestions else ""
+                raise ValueError(f"unsupported drug {name!r}{hint}")
+            drugs.append(key)
+    return tuple(dict.fromkeys(drugs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze VCFs dropped into a directory, exactly once each.")
+    parser.add_argument("--watch", required=True, help="Directory the pipeline writes finished VCFs to")
+    parser.add_argument("--out", required=True, help="Directory for results and the ingest ledger")
+    parser.add_argument("--drugs", default=os.getenv("PGX_INGEST_DRUGS"),
+                        help="Comma-separated drug panel (default: $PGX_INGEST_DRUGS, else every mapped drug)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PGX_INGEST_WORKERS", 2)),
+                        help="Files analyzed concurrently (default: $PGX_INGEST_WORKERS or 2)")
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds without writes before a file is read")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Scan interval without watchdog")
+    parser.add_argument("--rescan", type=float, default=300.0, help="Full rescan interval with watchdog")
+    parser.add_argument("--recursive", action="store_true", help="Also watch subdirectories")
+    parser.add_argument("--poll", action="store_true", help="Poll even if watchdog is installed")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in earlier runs")
+    parser.add_argument("--once", action="store_true", help="Process what is ready now, then exit")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.watch):
+        parser.error(f"not a directory: {args.watch}")
+    try:
+        drugs = parse_drugs(args.drugs)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    service = IngestService(args.watch, args.out, drugs, args.workers, args.settle, args.poll_interval,
+                            args.rescan, args.recursive, not args.poll, args.retry_failed)
+    signal.signal(signal.SIGTERM, service.stop)
+    signal.signal(signal.SIGINT, service.stop)
+    return service.run(once=args.once)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,135 @@
 import os
-import json
 import google.generativeai as genai
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from backend.pgx_engine import DRUG_GENE_MAP, assess_drug_risk, profile_gene
+from backend.drug_lexicon import did_you_mean, normalize_drug
+from backend.cache import cache_key, get_cache
 
-# Configure Gemini API
-# genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+try:
+    from dotenv import load_dotenv
+    # Load environment variables
+    load_dotenv()
+except ImportError:  # python-dotenv is optional (not needed in Vercel production)
+    pass
 
-def generate_risk_json(patient_data, drug_name):
+RISK_COLORS = {"Toxic": "red", "Adjust Dosage": "orange", "Safe": "green"}
+
+
+def create_llm_model(model_name: str = 'gemini-2.5-flash'):
+    """Configure Gemini from GEMINI_API_KEY and return a model client."""
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY", "YOUR_API_KEY_HERE"))
+    return genai.GenerativeModel(model_name)
+
+
+def build_explanation_prompt(drug, primary_gene, diplotype, phenotype, activity_score,
+                             risk_label, severity, recommendation, gene_vars):
+    """Clinical-report prompt for the 3-sentence Gemini explanation."""
+    return f"""Act as a Pharmacogenomics AI Assistant providing a clinical report.
+
+Patient Pharmacogenomic Data:
+- Drug: {drug}
+- Primary Gene: {primary_gene}
+- Diplotype: {diplotype}
+- Phenotype: {phenotype}
+- Activity Score: {activity_score}
+- Risk Level: {risk_label} (Severity: {severity})
+- Detected Variants (genotypes from VCF):
+{chr(10).join(f"  - {v.get('rsid','.')} ({v.get('star','?')}) GT={v.get('genotype','.')} FUNC={v.get('func','?')} CLNSIG={v.get('clnsig','?')}" for v in gene_vars[:10])}
+
+Clinical Recommendation: {recommendation}
+
+Based on the above pharmacogenomic profile, provide a concise 3-sentence explanation:
+- Sentence 1: Explain what the patient's {primary_gene} {diplotype} genotype means at the molecular level, referencing the activity score of {activity_score}.
+- Sentence 2: Explain how this specific genotype affects {drug}'s metabolism, efficacy, or safety.
+- Sentence 3: State the clinical action required.
+Be precise. Reference the actual diplotype and phenotype. Do not invent data."""
+
+
+def generate_explanation(llm_model, drug, primary_gene, diplotype, phenotype, activity_score,
+                         risk_label, severity, recommendation, gene_vars):
+    """Ask Gemini for the explanation; fall back to a templated summary on any failure."""
+    prompt = build_explanation_prompt(drug, primary_gene, diplotype, phenotype, activity_score,
+                                      risk_label, severity, recommendation, gene_vars)
+    # Same prompt + model -> same explanation; shared across workers when a cache is configured
+    cache = get_cache()
+    key = cache_key("explanation", getattr(llm_model, "model_name", ""), prompt) if cache else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    try:
+        llm_response = llm_model.generate_content(prompt)
+        if not (llm_response and llm_response.text):
+            return "AI explanation unavailable."
+        text = llm_response.text.strip()
+        if cache is not None:
+            cache.set(key, text)   # only real model output; fallbacks are retried next time
+        return text
+    except Exception:
+        if activity_score is None:
+            return f"The patient's {primary_gene} genotype could not be determined. For {drug}: {recommendation}"
+        return (
+            f"The patient's {primary_gene} genotype is {diplotype}, classified as {phenotype} "
+            f"with an activity score of {activity_score}. "
+            f"For {drug}, this means: {recommendation}"
+        )
+
+
+def generate_risk_json(patient_data, drug_name, llm_model=None, profiles=None):
     """
-    Generates a pharmacogenomic risk assessment JSON using Google Gemini.
-    
+    Generates a pharmacogenomic risk assessment JSON using the core PGx engine,
+    with the explanation written by Google Gemini.
+
     Args:
-        patient_data (dict): The parsed VCF data containing gene variants.
+        patient_data (dict): The parsed VCF data (output of `parse_vcf`).
         drug_name (str): The name of the drug to analyze risk for.
-        
+        llm_model: Optional Gemini client; a new one is created if omitted.
+        profiles (dict): Optional per-gene calls already made for this VCF
+            (output of `call_gene_profiles`); the primary gene is taken from
+            here instead of being called again.
+
     Returns:
-        dict: A JSON-compatible dictionary with risk assessment details.
-    """
-    
-    # Placeholder system prompt
-    system_prompt = f"""
-    You are an expert Pharmacogenomics AI Assistant. 
-    Your task is to analyze the provided patient genetic data and the specified drug: {drug_name}.
-    
-    Based on the genetic variants, determine the risk level (High, Moderate, Low, or Normal).
-    Provide a concise reasoning and clinical recommendation.
-    
-    Return the output STRICTLY as a valid JSON object with the following structure:
-    {{
-        "drug": "{drug_name}",
-        "status": "Risk Level",
-        "color": "red/orange/green",  # red for High, orange for Moderate, green for Low/Normal
-        "reasoning": "Explanation...",
-        "recommendation": "Clinical suggestion..."
-    }}
+        dict: A JSON-compatible dictionary with risk assessment details;
+        "drug" is the resolved canonical name.
+
+    Raises:
+        ValueError: `drug_name` does not resolve but is close to a drug that does.
     """
-    
-    # TODO: Implement the call to Gemini model
-    # model = genai.GenerativeModel('gemini-pro')
-    # response = model.generate_content(...)
-    
-    # Mock response for scaffolding
-    mock_response = {
-        "drug": drug_name,
-        "status": "Pending Analysis",
-        "color": "gray",
-        "reasoning": "LLM Engine not yet connected.",
-        "recommendation": "Connect API key and implement generation logic."
+    drug_key = normalize_drug(drug_name)
+    if drug_key is None:
+        suggestions = did_you_mean(drug_name)
+        if suggestions:
+            raise ValueError(f"Unrecognized drug {drug_name!r}. Did you mean: {', '.join(suggestions)}?")
+        drug_key = drug_name.upper().strip()
+    primary_gene = DRUG_GENE_MAP.get(drug_key, "UNKNOWN")
+    if profiles and primary_gene in profiles:
+        p = profiles[primary_gene]
+        diplotype, phenotype, activity_score, gene_vars = (p['diplotype'], p['phenotype'],
+                                                           p['activity_score'], p['variants'])
+    else:
+        diplotype, phenotype, activity_score, gene_vars = profile_gene(
+            primary_gene, patient_data.get('gene_variants', {}), patient_data.get('coverage')
+        )
+    risk_label, severity, confidence, recommendation = assess_drug_risk(
+        drug_key, primary_gene, phenotype, diplotype, activity_score
+    )
+
+    if llm_model is None:
+        llm_model = create_llm_model()
+    reasoning = generate_explanation(llm_model, drug_key, primary_gene, diplotype, phenotype,
+                                     activity_score, risk_label, severity, recommendation, gene_vars)
+
+    return {
+        "drug": drug_key,
+        "status": risk_label,
+        "color": RISK_COLORS.get(risk_label, "gray"),
+        "severity": severity,
+        "confidence_score": confidence,
+        "primary_gene": primary_gene,
+        "diplotype": diplotype,
+        "phenotype": phenotype,
+        "activity_score": activity_score,
+        "detected_variants": [v.get('rsid', '.') for v in gene_vars],
+        "reasoning": reasoning,
+        "recommendation": recommendation,
     }
-    
-    return mock_response
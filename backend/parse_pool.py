@@ -0,0 +1,239 @@
+"""Size-aware dispatch of VCF parsing + diplotype calling.
+
+Small panel VCFs are parsed inline on the event loop (a process hop would cost
+more than the parse). Anything larger than PGX_INLINE_PARSE_MAX_BYTES is sent to
+a process pool so one big upload cannot stall every other request on the
+worker. Either way the caller gets the same compact profile, which only carries
+the fields the API needs so pickling the result back stays cheap. With a
+shared cache configured (backend/cache.py) the compact profile is looked up by
+upload digest first, so a re-upload parses once across all workers. The key
+also carries CALLER_VERSION, a digest of the parsing and calling code, so a
+deploy that changes how a profile is built never serves one built by the old code.
+
+Large and multi-part uploads (backend/vcf_merge.py) are never held whole in
+memory: they are copied from the anonymous upload spool to named files a pool
+worker can open, hashed on the way for the cache key, and read line by line.
+
+Config (environment):
+    PGX_PARSE_WORKERS           process pool size; 0 disables the pool (default: CPUs - 1)
+    PGX_INLINE_PARSE_MAX_BYTES  uploads up to this size are parsed inline (default: 256 KiB)
+    PGX_SPOOL_DIR               where large and multi-part uploads are spooled (default: system temp dir)
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend import gvcf, pgx_engine, vcf_merge, vcf_parser
+from backend.cache import cache_key, get_cache
+from backend.guidelines import GUIDELINE_VERSION
+from backend.vcf_parser import parse_vcf_in_memory, parse_vcf_lines, parse_vcf_stream
+from backend.vcf_merge import VcfMerger
+from backend.pgx_engine import GENE_ACTIVITY_TABLES, profile_gene
+
+PARSE_WORKERS = int(os.getenv("PGX_PARSE_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+INLINE_PARSE_MAX_BYTES = int(os.getenv("PGX_INLINE_PARSE_MAX_BYTES", 256 * 1024))
+SPOOL_DIR = os.getenv("PGX_SPOOL_DIR") or None
+
+_COPY_CHUNK = 1024 * 1024
+
+# Variant fields the response and the LLM prompt actually read
+_SLIM_VARIANT_KEYS = ('rsid', 'star', 'genotype', 'func', 'clnsig', 'qc_pass')
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _source_fingerprint(*paths: str) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+# Everything between the upload bytes and a compact profile: parser, coverage
+# index, defining sites and caller, merge, and this module's slimming
+CALLER_VERSION = _source_fingerprint(vcf_parser.__file__, gvcf.__file__, pgx_engine.__file__,
+                                     vcf_merge.__file__, __file__)
+
+
+def build_compact_profile(vcf_content: bytes, genes: Iterable[str] = ()) -> Dict:
+    """Parse a VCF and call diplotypes for every pharmacogene plus `genes`.
+
+    Returns {'total_count', 'genes_found', 'qc', 'coverage', 'parse_errors', 'profiles': {gene: {'diplotype',
+    'phenotype', 'activity_score', 'variants'}}} with slimmed variant dicts."""
+
+    genes = _called_genes(genes)
+    return _compact(parse_vcf_in_memory(vcf_content, genes), genes)
+
+
+def build_file_profile(source: BinaryIO, genes: Iterable[str] = ()) -> Dict:
+    """`build_compact_profile` streamed from a binary file object."""
+    genes = _called_genes(genes)
+    return _compact(parse_vcf_stream(source, genes), genes)
+
+
+def build_merged_profile(sources: Sequence[BinaryIO], genes: Iterable[str] = (),
+                         names: Sequence[Optional[str]] = ()) -> Dict:
+    """Compact profile of several VCF parts for one patient, stream-merged
+    straight from the (spooled) upload files; adds 'merge' stats.
+    Raises VcfMergeError if the parts are incompatible."""
+    merger = VcfMerger(sources, names)
+    genes = _called_genes(genes)
+    compact = _compact(parse_vcf_lines(merger, genes), genes)
+    for reason, count in merger.errors.items():
+        compact['parse_errors'][reason] = compact['parse_errors'].get(reason, 0) + count
+    compact['merge'] = merger.stats
+    return compact
+
+
+def profile_files(paths: Sequence[str], genes: Iterable[str] = (),
+                  names: Sequence[Optional[str]] = ()) -> Dict:
+    """Pool entry point: `build_file_profile` of one file on disk, or
+    `build_merged_profile` of several parts."""
+    if len(paths) == 1:
+        with open(paths[0], 'rb') as f:
+            return build_file_profile(f, genes)
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(open(path, 'rb')) for path in paths]
+        return build_merged_profile(files, genes, names)
+
+
+def spool_to_disk(sources: Sequence[BinaryIO]) -> Tuple[List[str], str]:
+    """Copy upload files to named temp files and hash them in the same pass.
+    Returns (paths, digest over the parts in order); the caller removes the
+    files with `remove_spooled`."""
+    paths: List[str] = []
+    digest = hashlib.sha256()
+    try:
+        for source in sources:
+            source.seek(0)
+            part = hashlib.sha256()
+            with tempfile.NamedTemporaryFile(prefix="pgx-", suffix=".vcf", dir=SPOOL_DIR, delete=False) as out:
+                paths.append(out.name)
+                for chunk in iter(lambda: source.read(_COPY_CHUNK), b''):
+                    part.update(chunk)
+                    out.write(chunk)
+            digest.update(part.digest())
+    except BaseException:
+        remove_spooled(paths)
+        raise
+    return paths, digest.hexdigest()
+
+
+def remove_spooled(paths: Iterable[str]):
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+
+def _called_genes(genes: Iterable[str]) -> List[str]:
+    """Every pharmacogene plus `genes`: the only variant records the parser keeps."""
+    return list(dict.fromkeys([*GENE_ACTIVITY_TABLES, *genes]))
+
+
+def _compact(parsed: Dict, genes: List[str]) -> Dict:
+    gene_variants = parsed['gene_variants']
+
+    profiles = {}
+    for gene in genes:
+        diplotype, phenotype, activity_score, gene_vars = profile_gene(gene, gene_variants, parsed['coverage'])
+        profiles[gene] = {
+            'diplotype': diplotype,
+            'phenotype': phenotype,
+            'activity_score': activity_score,
+            'variants': [{k: v.get(k, '') for k in _SLIM_VARIANT_KEYS} for v in gene_vars],
+        }
+
+    return {
+        'total_count': parsed['total_count'],
+        'genes_found': parsed['genes_found'],
+        'qc': parsed['qc'],
+        'coverage': parsed['coverage'],
+        'parse_errors': parsed['parse_errors'],
+        'profiles': profiles,
+    }
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: never fork a process that is running an event loop and threads
+        _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _result_shaping(genes: Iterable[str]) -> Tuple:
+    extra = sorted(set(genes) - set(GENE_ACTIVITY_TABLES))
+    settings = (vcf_parser.QC_MIN_DEPTH, vcf_parser.QC_MIN_GQ, vcf_parser.MAX_LINE_CHARS,
+                vcf_parser.MAX_INFO_KEYS, vcf_parser.MAX_FORMAT_KEYS, vcf_parser.MAX_SAMPLES,
+                vcf_parser.MAX_GENES)
+    return GUIDELINE_VERSION, CALLER_VERSION, settings, ",".join(extra)
+
+
+def profile_cache_key(vcf_content: bytes, genes: Iterable[str] = ()) -> str:
+    """Cache key of a compact profile: upload digest plus everything that shapes the
+    result (guideline tables, parsing/calling code, QC thresholds, parser limits,
+    extra genes)."""
+    return cache_key("profile", *_result_shaping(genes), vcf_content)
+
+
+def spooled_cache_key(digest: str, genes: Iterable[str] = ()) -> str:
+    """Cache key of the profile of spooled files, from the `spool_to_disk` digest."""
+    return cache_key("profile-parts", *_result_shaping(genes), digest)
+
+
+async def _parse(vcf_content: bytes, genes: tuple) -> Dict:
+    if PARSE_WORKERS <= 0 or len(vcf_content) <= INLINE_PARSE_MAX_BYTES:
+        return build_compact_profile(vcf_content, genes)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), build_compact_profile, vcf_content, genes)
+
+
+async def profile_vcf(vcf_content: bytes, genes: Iterable[str] = ()) -> Dict:
+    """Compact profile for an upload: from the shared cache, else parsed inline or
+    in the pool by size."""
+    genes = tuple(genes)
+    cache = get_cache()
+    if cache is None:
+        return await _parse(vcf_content, genes)
+    # Hashing and cache I/O block; keep them off the event loop
+    loop = asyncio.get_running_loop()
+    key = await loop.run_in_executor(None, profile_cache_key, vcf_content, genes)
+    compact = await loop.run_in_executor(None, cache.get, key)
+    if compact is None:
+        compact = await _parse(vcf_content, genes)
+        await loop.run_in_executor(None, cache.set, key, compact)
+    return compact
+
+
+async def profile_spooled(paths: Sequence[str], digest: str, genes: Iterable[str] = (),
+                          names: Sequence[Optional[str]] = ()) -> Dict:
+    """Compact profile of `spool_to_disk` files (one upload or the parts of one):
+    from the shared cache, else in the pool (a thread when the pool is disabled)."""
+    genes, paths, names = tuple(genes), tuple(paths), tuple(names)
+    cache = get_cache()
+    loop = asyncio.get_running_loop()
+    key = spooled_cache_key(digest, genes)
+    if cache is not None:
+        compact = await loop.run_in_executor(None, cache.get, key)
+        if compact is not None:
+            return compact
+    executor = _get_executor() if PARSE_WORKERS > 0 else None
+    compact = await loop.run_in_executor(executor, profile_files, paths, genes, names)
+    if cache is not None:
+        await loop.run_in_executor(None, cache.set, key, compact)
+    return compact
+
+
+def shutdown_parse_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,513 @@
+"""Core pharmacogenomic engine: CPIC activity tables, diplotype calling and
+drug risk rules. Shared by the FastAPI service (main.py) and the Streamlit app."""
+
+from typing import Dict, Optional, Tuple
+
+# ==========================================
+# 1. CPIC STAR ALLELE FUNCTION TABLES
+# ==========================================
+
+# CYP2D6 Activity Scores (CPIC guideline)
+CYP2D6_ACTIVITY = {
+    "*1":  1.0,   # Normal function
+    "*2":  1.0,   # Normal function
+    "*3":  0.0,   # No function
+    "*4":  0.0,   # No function
+    "*5":  0.0,   # No function (gene deletion)
+    "*6":  0.0,   # No function
+    "*7":  0.0,   # No function
+    "*8":  0.0,   # No function
+    "*9":  0.5,   # Decreased function
+    "*10": 0.25,  # Decreased function
+    "*14": 1.0,   # Normal function
+    "*17": 0.5,   # Decreased function
+    "*29": 0.5,   # Decreased function
+    "*41": 0.5,   # Decreased function
+}
+
+# CYP2C19 Function Scores (CPIC guideline)
+CYP2C19_ACTIVITY = {
+    "*1":  1.0,   # Normal function
+    "*2":  0.0,   # No function (splice defect)
+    "*3":  0.0,   # No function (stop gained)
+    "*4":  0.0,   # No function (start lost)
+    "*5":  0.0,   # No function
+    "*6":  0.0,   # No function (frameshift)
+    "*7":  0.0,   # No function
+    "*8":  0.0,   # No function
+    "*9":  0.5,   # Decreased function
+    "*10": 0.5,   # Decreased function
+    "*17": 1.5,   # Increased function (promoter variant)
+}
+
+# CYP2C9 Function Scores (CPIC guideline)
+CYP2C9_ACTIVITY = {
+    "*1":  1.0,   # Normal function
+    "*2":  0.5,   # Decreased function
+    "*3":  0.0,   # No function
+    "*5":  0.0,   # No function
+    "*6":  0.0,   # No function
+    "*8":  0.5,   # Decreased function
+    "*11": 0.5,   # Decreased function
+    "*12": 0.5,   # Decreased function
+}
+
+# SLCO1B1 Function (CPIC guideline)
+SLCO1B1_ACTIVITY = {
+    "*1":  1.0,   # Normal function
+    "*1B": 1.0,   # Normal function (benign)
+    "*5":  0.0,   # Decreased function (521T>C, rs4149056)
+    "*15": 0.5,   # Decreased function
+    "*17": 0.0,   # Poor function
+}
+
+# DPYD Activity Score (CPIC guideline)
+DPYD_ACTIVITY = {
+    "*1":    1.0,   # Normal DPD activity
+    "*2A":   0.0,   # No DPD activity (IVS14+1G>A)
+    "*5":    0.5,   # Decreased activity
+    "*6":    0.5,   # Decreased activity
+    "*13":   0.5,   # Decreased activity
+}
+
+# TPMT Activity (CPIC guideline)
+TPMT_ACTIVITY = {
+    "*1":   1.0,   # Normal
+    "*2":   0.0,   # No function
+    "*3A":  0.0,   # No function
+    "*3B":  0.0,   # No function
+    "*3C":  0.0,   # No function
+    "*4":   0.0,   # No function
+}
+
+# Master gene→activity table
+GENE_ACTIVITY_TABLES = {
+    "CYP2D6":  CYP2D6_ACTIVITY,
+    "CYP2C19": CYP2C19_ACTIVITY,
+    "CYP2C9":  CYP2C9_ACTIVITY,
+    "SLCO1B1": SLCO1B1_ACTIVITY,
+    "DPYD":    DPYD_ACTIVITY,
+    "TPMT":    TPMT_ACTIVITY,
+}
+
+# Core star-allele-defining SNVs (GRCh38): (chrom, pos, rsid, star allele).
+# In gVCF input a gene is only called *1/*1 when each of these is covered by a
+# confident reference block or call; structural alleles (e.g. CYP2D6 *5) are
+# not visible at SNV sites.
+DEFINING_SITES = {
+    "CYP2D6": [
+        ("chr22", 42127803, "rs28371725", "*41"),
+        ("chr22", 42128945, "rs3892097",  "*4"),
+        ("chr22", 42130692, "rs1065852",  "*10"),
+    ],
+    "CYP2C19": [
+        ("chr10", 94761900, "rs12248560", "*17"),
+        ("chr10", 94762706, "rs28399504", "*4"),
+        ("chr10", 94780653, "rs4986893",  "*3"),
+        ("chr10", 94781859, "rs4244285",  "*2"),
+    ],
+    "CYP2C9": [
+        ("chr10", 94942290, "rs1799853",  "*2"),
+        ("chr10", 94981296, "rs1057910",  "*3"),
+    ],
+    "SLCO1B1": [
+        ("chr12", 21178615, "rs4149056",  "*5"),
+    ],
+    "DPYD": [
+        ("chr1",  97450058, "rs3918290",  "*2A"),
+        ("chr1",  97515839, "rs55886062", "*13"),
+    ],
+    "TPMT": [
+        ("chr6",  18130918, "rs1142345",  "*3C"),
+        ("chr6",  18138997, "rs1800460",  "*3B"),
+        ("chr6",  18143724, "rs1800462",  "*2"),
+    ],
+}
+
+# Diplotype reported when a gene cannot be called (phenotype "Unknown")
+NO_CALL_DIPLOTYPE = "Unknown/Unknown"
+
+
+# ==========================================
+# 2. DIPLOTYPE CALLER — GENOTYPE-AWARE
+# ==========================================
+
+def _is_alt(gt: str) -> str:
+    """Classify genotype: 'hom_ref', 'het', 'hom_alt', or 'unknown'."""
+    gt_clean = gt.replace('|', '/')
+    if gt_clean in ('0/0', '0'):
+        return 'hom_ref'
+    elif gt_clean in ('0/1', '1/0'):
+        return 'het'
+    elif gt_clean in ('1/1',):
+        return 'hom_alt'
+    return 'unknown'
+
+
+def call_diplotype(gene: str, variants: list) -> Tuple[str, str, Optional[float]]:
+    """Determine the diplotype for a gene from its observed variants.
+
+    Uses the star allele annotations and genotypes from the VCF. Sites the
+    parser flagged with qc_pass=False contribute no allele; if such a site
+    carries a star allele and the call still has a *1 slot it could have
+    filled, the gene is a no-call (NO_CALL_DIPLOTYPE, "Unknown", None) rather
+    than a reference call.
+    Returns (diplotype_string, phenotype_string, activity_score).
+    """
+
+    activity_table = GENE_ACTIVITY_TABLES.get(gene, {})
+
+    # Collect non-reference star alleles
+    alt_alleles = []   # list of (star_allele, zygosity)
+    gated = False      # a star-annotated site failed QC
+    for v in variants:
+        zyg = _is_alt(v['genotype'])
+        star = v.get('star', '')
+        if not star:
+            continue
+        # QC-gated: low-confidence / non-PASS sites do not contribute alleles
+        if not v.get('qc_pass', True):
+            gated = True
+            continue
+
+        if zyg == 'het':
+            alt_alleles.append((star, 'het'))
+        elif zyg == 'hom_alt':
+            alt_alleles.append((star, 'hom'))
+
+    # ── Build diplotype ──
+    if not alt_alleles:
+        # All wild-type
+        allele1, allele2 = '*1', '*1'
+    else:
+        # Prioritize highest-impact (lowest activity) alleles
+        def allele_priority(item):
+            star, _ = item
+            return activity_table.get(star, 0.5)
+
+        alt_alleles_sorted = sorted(alt_alleles, key=allele_priority)
+
+        allele1 = '*1'
+        allele2 = '*1'
+
+        for star, zyg in alt_alleles_sorted:
+            if zyg == 'hom':
+                allele1 = star
+                allele2 = star
+                break  # Homozygous alt dominates
+            elif zyg == 'het':
+                if allele1 == '*1':
+                    allele1 = star
+                elif allele2 == '*1':
+                    allele2 = star
+                # Compound het — both already filled
+
+    # An unreadable defining site is not evidence of the reference allele
+    if gated and '*1' in (allele1, allele2):
+        return NO_CALL_DIPLOTYPE, "Unknown", None
+
+    # ── Calculate activity score ──
+    score1 = activity_table.get(allele1, 1.0)
+    score2 = activity_table.get(allele2, 1.0)
+    total_score = score1 + score2
+
+    # ── Determine phenotype from activity score ──
+    phenotype = _score_to_phenotype(gene, total_score)
+
+    diplotype_str = f"{allele1}/{allele2}"
+    return diplotype_str, phenotype, total_score
+
+
+def _score_to_phenotype(gene: str, score: float) -> str:
+    """Map total activity score to CPIC phenotype abbreviation.
+    PM=Poor Metabolizer, IM=Intermediate, NM=Normal, RM=Rapid, URM=Ultra-rapid."""
+
+    if gene == "CYP2D6":
+        if score > 2.25:
+            return "URM"
+        elif score >= 1.25:
+            return "NM"
+        elif score > 0:
+            return "IM"
+        else:
+            return "PM"
+
+    elif gene == "CYP2C19":
+        if score > 2.0:
+            return "URM"
+        elif score == 2.0:
+            return "RM"
+        elif score >= 1.0:
+            return "NM"
+        elif score > 0:
+            return "IM"
+        else:
+            return "PM"
+
+    elif gene in ("CYP2C9", "SLCO1B1", "DPYD", "TPMT"):
+        if score >= 2.0:
+            return "NM"
+        elif score > 0:
+            return "IM"
+        else:
+            return "PM"
+
+    # Fallback
+    if score >= 2.0:
+        return "NM"
+    elif score > 0:
+        return "IM"
+    return "PM"
+
+
+def profile_gene(gene: str, gene_variants: Dict[str, list],
+                 coverage: Optional[Dict[str, dict]] = None) -> Tuple[str, str, Optional[float], list]:
+    """Call one gene from a parsed VCF's `gene_variants`.
+
+    `coverage` is the parser's defining-site coverage (gVCF input only). With
+    it, a wild-type call needs every DEFINING_SITES position covered; otherwise
+    the gene is a no-call (NO_CALL_DIPLOTYPE, "Unknown", activity None).
+    Returns (diplotype, phenotype, activity_score, variants_for_gene)."""
+
+    if gene in gene_variants:
+        gene_vars = gene_variants[gene]
+        diplotype, phenotype, activity_score = call_diplotype(gene, gene_vars)
+    else:
+        # Gene not found in VCF — assume wild-type (plain VCFs cannot say more)
+        gene_vars = []
+        diplotype, phenotype, activity_score = "*1/*1", _score_to_phenotype(gene, 2.0), 2.0
+
+    if coverage is not None and diplotype == "*1/*1" and gene in DEFINING_SITES:
+        sites = coverage.get(gene)
+        if not sites or sites['uncovered']:
+            return NO_CALL_DIPLOTYPE, "Unknown", None, gene_vars
+    return diplotype, phenotype, activity_score, gene_vars
+
+
+def call_gene_profiles(gene_variants: Dict[str, list],
+                       coverage: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+    """Diplotype/phenotype for every gene in GENE_ACTIVITY_TABLES."""
+
+    profiles = {}
+    for gene in GENE_ACTIVITY_TABLES:
+        diplotype, phenotype, activity_score, gene_vars = profile_gene(gene, gene_variants, coverage)
+        profiles[gene] = {
+            'diplotype': diplotype,
+            'phenotype': phenotype,
+            'activity_score': activity_score,
+            'variants': gene_vars,
+        }
+    return profiles
+
+
+# ==========================================
+# 3. DRUG-GENE RISK ENGINE (CPIC-ALIGNED)
+# ==========================================
+
+# Maps drug → primary gene it's affected by
+DRUG_GENE_MAP = {
+    "WARFARIN":      "CYP2C9",
+    "CLOPIDOGREL":   "CYP2C19",
+    "OMEPRAZOLE":    "CYP2C19",
+    "SERTRALINE":    "CYP2C19",
+    "CODEINE":       "CYP2D6",
+    "TAMOXIFEN":     "CYP2D6",
+    "ONDANSETRON":   "CYP2D6",
+    "SIMVASTATIN":   "SLCO1B1",
+    "FLUOROURACIL":  "DPYD",
+    "CAPECITABINE":  "DPYD",
+}
+
+def assess_drug_risk(drug: str, gene: str, phenotype: str, diplotype: str, activity_score: Optional[float]):
+    """CPIC-aligned risk assessment based on drug + actual patient phenotype.
+    Phenotype codes: PM=Poor, IM=Intermediate, NM=Normal, RM=Rapid, URM=Ultra-rapid.
+    Returns (risk_label, severity, confidence, recommendation)."""
+
+    drug_upper = drug.upper().strip()
+
+    # ── NO-CALL: defining sites not covered or QC-failed; never fall through to "normal" ──
+    if phenotype == "Unknown" and drug_upper in DRUG_GENE_MAP:
+        return ("Adjust Dosage", "moderate", 0.50,
+                f"{gene} genotype could not be determined: star-allele-defining sites are missing "
+                f"or failed quality control in this VCF. Do not assume normal {gene} function for {drug}. "
+                f"Confirm with targeted {gene} genotyping before relying on standard dosing.")
+
+    # ── WARFARIN / CYP2C9 ──
+    if drug_upper == "WARFARIN":
+        if phenotype == "PM":
+            return ("Toxic", "critical", 0.98,
+                    f"Patient is CYP2C9 {diplotype} (Poor Metabolizer). S-warfarin clearance reduced ~90%. "
+                    "Initiate at ≤ 1 mg/day. Monitor INR every 48h for 2 weeks. "
+                    "Consider Apixaban or Rivaroxaban. CPIC Grade A recommendation.")
+        elif phenotype == "IM":
+            return ("Adjust Dosage", "high", 0.94,
+                    f"Patient is CYP2C9 {diplotype} (Intermediate Metabolizer). S-warfarin clearance reduced ~40%. "
+                    "Reduce initial dose by 25-50%. Intensify INR monitoring for first 2 weeks. "
+                    "Target INR may be achieved at lower maintenance doses.")
+        else:
+            return ("Safe", "none", 0.92,
+                    f"Patient is CYP2C9 {diplotype} (Normal Metabolizer). Standard warfarin metabolism expected. "
+                    "Follow standard dosing nomogram. Routine INR monitoring applies.")
+
+    # ── CLOPIDOGREL / CYP2C19 ──
+    if drug_upper == "CLOPIDOGREL":
+        if phenotype == "PM":
+            return ("Toxic", "critical", 0.97,
+                    f"Patient is CYP2C19 {diplotype} (Poor Metabolizer). Active metabolite formation < 5%. "
+                    "Drug is therapeutically useless. Switch to Prasugrel 10mg or Ticagrelor 90mg BID. "
+                    "MACE risk elevated ~3.5× on standard clopidogrel.")
+        elif phenotype == "IM":
+            return ("Adjust Dosage", "high", 0.93,
+                    f"Patient is CYP2C19 {diplotype} (Intermediate Metabolizer). Reduced clopidogrel activation. "
+                    "Consider alternative P2Y12 inhibitor (Prasugrel or Ticagrelor). "
+                    "If clopidogrel is continued, consider higher loading dose with platelet function testing.")
+        elif phenotype in ("URM", "RM"):
+            return ("Safe", "none", 0.90,
+                    f"Patient is CYP2C19 {diplotype} (Rapid/Ultra-rapid Metabolizer). Enhanced clopidogrel activation. "
+                    "Standard or potentially enhanced antiplatelet effect. Monitor for bleeding signs.")
+        else:
+            return ("Safe", "none", 0.91,
+                    f"Patient is CYP2C19 {diplotype} (Normal Metabolizer). Normal clopidogrel metabolism. "
+                    "Standard 75mg daily dosing appropriate. No pharmacogenomic adjustment needed.")
+
+    # ── OMEPRAZOLE / CYP2C19 ──
+    if drug_upper == "OMEPRAZOLE":
+        if phenotype in ("URM", "RM"):
+            return ("Adjust Dosage", "moderate", 0.91,
+                    f"Patient is CYP2C19 {diplotype} (Rapid/Ultra-rapid Metabolizer). Omeprazole cleared ~40% faster. "
+                    "Increase dose to 40mg BID or switch to rabeprazole (less CYP2C19-dependent). "
+                    "Verify H. pylori eradication with urea breath test at 4 weeks.")
+        elif phenotype == "IM":
+            return ("Safe", "none", 0.89,
+                    f"Patient is CYP2C19 {diplotype} (Intermediate Metabolizer). Mildly increased omeprazole exposure. "
+                    "Standard dosing appropriate. May see slightly enhanced acid suppression.")
+        elif phenotype == "PM":
+            return ("Adjust Dosage", "moderate", 0.93,
+                    f"Patient is CYP2C19 {diplotype} (Poor Metabolizer). Omeprazole AUC increased 3-7×. "
+                    "Consider 50% dose reduction for long-term use. Monitor for hypomagnesemia.")
+        else:
+            return ("Safe", "none", 0.88,
+                    f"Patient is CYP2C19 {diplotype} (Normal Metabolizer). Standard omeprazole metabolism. "
+                    "No dosage adjustment required.")
+
+    # ── SERTRALINE / CYP2C19 ──
+    if drug_upper == "SERTRALINE":
+        if phenotype == "PM":
+            return ("Adjust Dosage", "moderate", 0.87,
+                    f"Patient is CYP2C19 {diplotype} (Poor Metabolizer). Sertraline exposure increased ~40%. "
+                    "Consider 50% dose reduction. Monitor for serotonergic side effects. "
+                    "Escitalopram is an alternative with less CYP2C19 dependence.")
+        elif phenotype in ("URM", "RM"):
+            return ("Adjust Dosage", "low", 0.85,
+                    f"Patient is CYP2C19 {diplotype} (Rapid/Ultra-rapid Metabolizer). Faster sertraline clearance. "
+                    "May need dose increase if subtherapeutic response. Monitor at 4-6 weeks.")
+        else:
+            return ("Safe", "none", 0.92,
+                    f"Patient is CYP2C19 {diplotype} (Normal Metabolizer). Standard sertraline metabolism. "
+                    "No dosage adjustment required. Standard prescribing guidelines apply.")
+
+    # ── CODEINE / CYP2D6 ──
+    if drug_upper == "CODEINE":
+        if phenotype == "URM":
+            return ("Toxic", "critical", 0.96,
+                    f"Patient is CYP2D6 {diplotype} (Ultra-rapid Metabolizer). Ultra-rapid O-demethylation produces "
+                    "dangerously high morphine levels (50-75% above expected). Avoid codeine entirely. "
+                    "Use non-opioid analgesics. FDA Black Box Warning applies.")
+        elif phenotype == "PM":
+            return ("Adjust Dosage", "high", 0.95,
+                    f"Patient is CYP2D6 {diplotype} (Poor Metabolizer). Cannot convert codeine to morphine. "
+                    "Drug is therapeutically ineffective for analgesia. "
+                    "Use alternative analgesics (tramadol is also CYP2D6-dependent — avoid).")
+        elif phenotype == "IM":
+            return ("Adjust Dosage", "moderate", 0.90,
+                    f"Patient is CYP2D6 {diplotype} (Intermediate Metabolizer). Reduced morphine formation. "
+                    "May experience suboptimal analgesia. Consider non-opioid alternatives. "
+                    "If codeine used, monitor effectiveness closely.")
+        else:
+            return ("Safe", "none", 0.89,
+                    f"Patient is CYP2D6 {diplotype} (Normal Metabolizer). Normal codeine-to-morphine conversion. "
+                    "Standard dosing appropriate. Monitor for standard opioid side effects.")
+
+    # ── TAMOXIFEN / CYP2D6 ──
+    if drug_upper == "TAMOXIFEN":
+        if phenotype == "PM":
+            return ("Toxic", "high", 0.94,
+                    f"Patient is CYP2D6 {diplotype} (Poor Metabolizer). Cannot convert tamoxifen to endoxifen. "
+                    "Therapeutic efficacy severely compromised. Switch to aromatase inhibitor "
+                    "(anastrozole, letrozole) in postmenopausal patients.")
+        elif phenotype == "IM":
+            return ("Adjust Dosage", "moderate", 0.89,
+                    f"Patient is CYP2D6 {diplotype} (Intermediate Metabolizer). Reduced endoxifen formation (~40% of normal). "
+                    "Standard dose acceptable with therapeutic drug monitoring. "
+                    "Measure endoxifen at 3 months; if < 5.97 ng/mL, consider aromatase inhibitor switch.")
+        else:
+            return ("Safe", "none", 0.87,
+                    f"Patient is CYP2D6 {diplotype} (Normal Metabolizer). Normal tamoxifen-to-endoxifen conversion. "
+                    "Standard dosing appropriate. Routine endoxifen monitoring optional.")
+
+    # ── ONDANSETRON / CYP2D6 ──
+    if drug_upper == "ONDANSETRON":
+        if phenotype == "URM":
+            return ("Adjust Dosage", "moderate", 0.85,
+                    f"Patient is CYP2D6 {diplotype} (Ultra-rapid Metabolizer). May have reduced ondansetron efficacy. "
+                    "Consider increased dose or alternative anti-emetic (granisetron).")
+        else:
+            return ("Safe", "none", 0.85,
+                    f"Patient is CYP2D6 {diplotype} ({phenotype}). Ondansetron exposure within therapeutic window. "
+                    "Anti-emetic efficacy preserved. Standard 4-8mg dosing appropriate.")
+
+    # ── SIMVASTATIN / SLCO1B1 ──
+    if drug_upper == "SIMVASTATIN":
+        if phenotype == "PM":
+            return ("Toxic", "high", 0.95,
+                    f"Patient is SLCO1B1 {diplotype} (Poor Function). Plasma simvastatin acid AUC increased ~3-fold. "
+                    "High risk of myopathy/rhabdomyolysis. Avoid simvastatin or limit to ≤ 20 mg/day. "
+                    "Prefer Rosuvastatin or Pravastatin (OATP1B1-independent).")
+        elif phenotype == "IM":
+            return ("Adjust Dosage", "moderate", 0.94,
+                    f"Patient is SLCO1B1 {diplotype} (Intermediate Function). Reduced hepatic uptake transporter activity. "
+                    "Limit simvastatin to ≤ 20 mg/day. Monitor CK levels at 4 and 12 weeks. "
+                    "Consider alternative statins if higher doses needed.")
+        else:
+            return ("Safe", "none", 0.90,
+                    f"Patient is SLCO1B1 {diplotype} (Normal Function). Normal hepatic statin uptake. "
+                    "Standard simvastatin dosing appropriate up to 40-80 mg/day.")
+
+    # ── FLUOROURACIL / DPYD ──
+    if drug_upper == "FLUOROURACIL":
+        if phenotype == "PM":
+            return ("Toxic", "critical", 0.99,
+                    f"Patient is DPYD {diplotype} (DPD Deficient). CONTRAINDICATED. Zero DPD activity causes "
+                    "fatal 5-FU accumulation with grade 4 mucositis, neutropenia, and neurotoxicity. "
+                    "Use irinotecan-based or platinum-based alternatives. Refer to oncology PGx board.")
+        elif phenotype == "IM":
+            return ("Adjust Dosage", "high", 0.96,
+                    f"Patient is DPYD {diplotype} (Intermediate DPD Activity). Reduced DPD activity increases 5-FU toxicity risk. "
+                    "Reduce starting dose by 25-50%. Intensive monitoring for toxicity required. "
+                    "Dose escalation only if tolerated after first cycle.")
+        else:
+            return ("Safe", "none", 0.93,
+                    f"Patient is DPYD {diplotype} (Normal DPD Activity). Normal DPD-mediated 5-FU catabolism. "
+                    "Standard dosing per BSA-based nomogram. Routine toxicity monitoring applies.")
+
+    # ── CAPECITABINE / DPYD ──
+    if drug_upper == "CAPECITABINE":
+        if phenotype == "PM":
+            return ("Toxic", "critical", 0.99,
+                    f"Patient is DPYD {diplotype} (DPD Deficient). CONTRAINDICATED. Capecitabine is a 5-FU prodrug. "
+                    "Zero DPD activity produces identical lethal toxicity profile as direct 5-FU. "
+                    "Use alternative chemotherapy regimens. Discuss with oncology tumor board.")
+        elif phenotype == "IM":
+            return ("Adjust Dosage", "high", 0.96,
+                    f"Patient is DPYD {diplotype} (Intermediate DPD Activity). Reduced DPD activity. "
+                    "Reduce capecitabine starting dose by 25-50%. Monitor closely for hand-foot syndrome, "
+                    "diarrhea, and myelosuppression.")
+        else:
+            return ("Safe", "none", 0.93,
+                    f"Patient is DPYD {diplotype} (Normal DPD Activity). Normal DPD activity confirmed. "
+                    "Standard capecitabine dosing appropriate.")
+
+    # ── DEFAULT ──
+    return ("Safe", "none", 0.50,
+            f"No CPIC guideline match for {drug} / {gene}. Standard dosing recommended. "
+            "Consult clinical pharmacist if concerns exist.")
@@ -0,0 +1,148 @@
+"""Population phenotype / diplotype / risk-label counters.
+
+Counts are kept as {(kind, scope, value): n} — e.g. ('phenotype', 'CYP2C19',
+'PM'), ('risk_label', 'CLOPIDOGREL', 'Toxic'), ('total', '', 'patients') — so
+merging two shards is plain addition and the persisted form is one row per
+key. Cardinality is bounded by the guideline tables, not by the number of
+patients or by what the VCFs annotate: only pharmacogenes are counted, star
+alleles outside a gene's activity table are counted as 'other' (so
+'*1/*57' and '*1/*99' are both '*1/other'), and drugs outside DRUG_GENE_MAP
+are pooled under OTHER, which keeps reads constant-time.
+
+Workers sharing a profile store increment the same rows in SQLite (see
+ProfileStore.record_analysis); without a store each worker keeps its own
+in-memory counters. Shards can be exported and merged:
+
+    python -m backend.population_stats --export shard.json
+    python -m backend.population_stats --merge shard_a.json shard_b.json
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from backend.pgx_engine import DRUG_GENE_MAP, GENE_ACTIVITY_TABLES, NO_CALL_DIPLOTYPE
+
+CounterKey = Tuple[str, str, str]   # (kind, scope, value)
+
+OTHER_DRUG = "OTHER"
+OTHER_ALLELE = "other"
+
+
+def drug_scope(drug: str) -> str:
+    """Counter scope of a (normalized) drug name."""
+    return drug if drug in DRUG_GENE_MAP else OTHER_DRUG
+
+
+def diplotype_value(gene: str, diplotype: str) -> str:
+    """Counter value of a diplotype, with alleles outside the gene's activity table as OTHER_ALLELE."""
+    if diplotype == NO_CALL_DIPLOTYPE:
+        return diplotype
+    table = GENE_ACTIVITY_TABLES.get(gene, {})
+    return "/".join(a if a in table else OTHER_ALLELE for a in diplotype.split("/"))
+
+
+class PopulationCounters:
+    def __init__(self, counts: Dict[CounterKey, int] = None):
+        self.counts: Counter = Counter(counts or {})
+
+    def observe(self, profiles: Dict[str, dict], results: Iterable[dict]) -> 'PopulationCounters':
+        """Count one patient: their per-gene calls and per-drug results."""
+        self.counts[('total', '', 'patients')] += 1
+        for gene, p in profiles.items():
+            if gene in GENE_ACTIVITY_TABLES:
+                self.counts[('phenotype', gene, p['phenotype'])] += 1
+                self.counts[('diplotype', gene, diplotype_value(gene, p['diplotype']))] += 1
+        for r in results:
+            drug = r['drug'].upper().strip()
+            self.counts[('total', '', 'results')] += 1
+            self.counts[('risk_label', drug_scope(drug), r['risk_label'])] += 1
+        return self
+
+    def merge(self, other: 'PopulationCounters') -> 'PopulationCounters':
+        self.counts.update(other.counts)
+        return self
+
+    def rows(self):
+        return [(kind, scope, value, n) for (kind, scope, value), n in self.counts.items() if n]
+
+    @classmethod
+    def from_rows(cls, rows) -> 'PopulationCounters':
+        return cls({(kind, scope, value): n for kind, scope, value, n in rows})
+
+    def to_json(self) -> Dict:
+        """Nested view served by /api/v1/pgx/stats (and the export format)."""
+        out = {
+            'patients': self.counts.get(('total', '', 'patients'), 0),
+            'results': self.counts.get(('total', '', 'results'), 0),
+            'genes': {},
+            'drugs': {},
+        }
+        for (kind, scope, value), n in sorted(self.counts.items()):
+            if not n:
+                continue
+            if kind in ('phenotype', 'diplotype'):
+                gene = out['genes'].setdefault(scope, {'phenotypes': {}, 'diplotypes': {}})
+                gene[kind + 's'][value] = n
+            elif kind == 'risk_label':
+                out['drugs'].setdefault(scope, {'risk_labels': {}})['risk_labels'][value] = n
+        return out
+
+    @classmethod
+    def from_json(cls, data: Dict) -> 'PopulationCounters':
+        counts = {('total', '', 'patients'): data.get('patients', 0),
+                  ('total', '', 'results'): data.get('results', 0)}
+        for gene, g in data.get('genes', {}).items():
+            for value, n in g.get('phenotypes', {}).items():
+                counts[('phenotype', gene, value)] = n
+            for value, n in g.get('diplotypes', {}).items():
+                counts[('diplotype', gene, value)] = n
+        for drug, d in data.get('drugs', {}).items():
+            for value, n in d.get('risk_labels', {}).items():
+                counts[('risk_label', drug, value)] = n
+        return cls(counts)
+
+
+# This worker's counters, used when no profile store is configured
+worker_counters = PopulationCounters()
+
+
+def main(argv=None):
+    from backend.profile_store import ProfileStore, STORE_PATH
+
+    parser = argparse.ArgumentParser(description="Export or merge PGx population counters.")
+    parser.add_argument("--store", default=STORE_PATH, help="SQLite store path (default: $PGX_STORE_PATH)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--export", metavar="FILE", help="Write the store's counters as JSON ('-' for stdout)")
+    group.add_argument("--merge", metavar="FILE", nargs="+", help="Add exported shard counters into the store")
+    group.add_argument("--rebuild", action="store_true", help="Recount from the stored profiles and results")
+    args = parser.parse_args(argv)
+
+    if not args.store:
+        parser.error("no store; pass --store or set PGX_STORE_PATH")
+    store = ProfileStore(args.store)
+
+    if args.export:
+        data = json.dumps(store.population_counts().to_json(), indent=2)
+        if args.export == "-":
+            print(data)
+        else:
+            with open(args.export, "w", encoding="utf-8") as fh:
+                fh.write(data + "\n")
+    elif args.merge:
+        shards = PopulationCounters()
+        for path in args.merge:
+            with open(path, encoding="utf-8") as fh:
+                shards.merge(PopulationCounters.from_json(json.load(fh)))
+        store.merge_population_counts(shards)
+        print(f"Merged {len(args.merge)} shard(s): {shards.to_json()['patients']} patients")
+    else:
+        counters = store.rebuild_population_counts()
+        print(f"Rebuilt counters for {counters.to_json()['patients']} patients")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
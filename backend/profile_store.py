@@ -0,0 +1,346 @@
+"""Persistent store of patient genotype profiles and guideline-stamped results.
+
+SQLite (stdlib) so it works for a single host with several workers; enable it
+by pointing PGX_STORE_PATH at a writable file. Alongside patients, it keeps a
+snapshot of the guideline outputs for each version that has produced results
+so `backend.recompute` can diff two versions without re-running any VCF,
+and the population counters (backend.population_stats) incremented in the same
+transaction as each patient is recorded.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend.guidelines import GUIDELINE_VERSION, GuidelineKey, evaluate, evaluation_table
+from backend.pgx_engine import GENE_ACTIVITY_TABLES
+from backend.population_stats import PopulationCounters, diplotype_value, drug_scope
+
+STORE_PATH = os.getenv("PGX_STORE_PATH")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id   TEXT PRIMARY KEY,
+    created      TEXT NOT NULL,
+    source       TEXT
+);
+CREATE TABLE IF NOT EXISTS patient_profiles (
+    patient_id     TEXT NOT NULL,
+    gene           TEXT NOT NULL,
+    diplotype      TEXT NOT NULL,
+    phenotype      TEXT NOT NULL,
+    activity_score REAL,            -- NULL for a no-call
+    PRIMARY KEY (patient_id, gene)
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_gene_diplotype ON patient_profiles (gene, diplotype);
+CREATE TABLE IF NOT EXISTS patient_results (
+    patient_id         TEXT NOT NULL,
+    drug               TEXT NOT NULL,
+    gene               TEXT NOT NULL,
+    diplotype          TEXT NOT NULL,
+    guideline_version  TEXT NOT NULL,
+    phenotype          TEXT NOT NULL,
+    risk_label         TEXT NOT NULL,
+    severity           TEXT NOT NULL,
+    confidence         REAL NOT NULL,
+    recommendation     TEXT NOT NULL,
+    updated            TEXT NOT NULL,
+    PRIMARY KEY (patient_id, drug)
+);
+CREATE INDEX IF NOT EXISTS idx_results_key ON patient_results (gene, drug, diplotype);
+CREATE INDEX IF NOT EXISTS idx_results_version ON patient_results (guideline_version);
+CREATE TABLE IF NOT EXISTS guideline_outputs (
+    version    TEXT NOT NULL,
+    gene       TEXT NOT NULL,
+    drug       TEXT NOT NULL,
+    diplotype  TEXT NOT NULL,
+    output     TEXT NOT NULL,
+    PRIMARY KEY (version, gene, drug, diplotype)
+);
+CREATE TABLE IF NOT EXISTS population_counts (
+    kind   TEXT NOT NULL,               -- phenotype | diplotype | risk_label | total
+    scope  TEXT NOT NULL,               -- gene, drug, or '' for totals
+    value  TEXT NOT NULL,
+    n      INTEGER NOT NULL,
+    PRIMARY KEY (kind, scope, value)
+);
+"""
+
+_ADD_COUNTS_SQL = (
+    "INSERT INTO population_counts VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (kind, scope, value) DO UPDATE SET n = n + excluded.n"
+)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class ProfileStore:
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            # Stores created before the counters existed: backfill once
+            if (conn.execute("SELECT 1 FROM patients LIMIT 1").fetchone()
+                    and not conn.execute("SELECT 1 FROM population_counts LIMIT 1").fetchone()):
+                self._rebuild_counts(conn)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call: safe across threads and workers.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ── Guideline snapshots ──
+
+    def snapshot_versions(self) -> List[Tuple[str, int]]:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT version, COUNT(*) FROM guideline_outputs GROUP BY version ORDER BY MIN(rowid)"
+            ).fetchall()
+
+    def save_snapshot(self, version: str = GUIDELINE_VERSION) -> int:
+        """Persist the current rules' outputs over the base domain plus every
+        (gene, drug, diplotype) already in the store. Returns rows written."""
+        table = evaluation_table(self.observed_keys())
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO guideline_outputs VALUES (?, ?, ?, ?, ?)",
+                [(version, *key, json.dumps(out, sort_keys=True)) for key, out in table.items()],
+            )
+            return conn.total_changes - before
+
+    def load_snapshot(self, version: str) -> Dict[GuidelineKey, Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT gene, drug, diplotype, output FROM guideline_outputs WHERE version = ?", (version,)
+            ).fetchall()
+        return {(g, d, dip): json.loads(out) for g, d, dip, out in rows}
+
+    def observed_keys(self) -> List[GuidelineKey]:
+        with self._connect() as conn:
+            return [tuple(r) for r in conn.execute(
+                "SELECT DISTINCT gene, drug, diplotype FROM patient_results"
+            )]
+
+    # ── Patients ──
+
+    def record_analysis(self, patient_id: str, profiles: Dict[str, dict], results: Iterable[dict],
+                        source: Optional[str] = None, version: str = GUIDELINE_VERSION):
+        """Store a patient's per-gene profile and their per-drug results.
+
+        `profiles` is {gene: {'diplotype', 'phenotype', 'activity_score', ...}};
+        only pharmacogenes are kept (not the "UNKNOWN" placeholder of an
+        unmapped drug). Each result needs drug, gene, diplotype, phenotype,
+        risk_label, severity, confidence, recommendation."""
+        now = _now()
+        results = list(results)
+        with self._connect() as conn:
+            new_patient = conn.execute(
+                "INSERT OR IGNORE INTO patients VALUES (?, ?, ?)", (patient_id, now, source)
+            ).rowcount
+            conn.executemany(
+                "INSERT OR REPLACE INTO patient_profiles VALUES (?, ?, ?, ?, ?)",
+                [(patient_id, gene, p['diplotype'], p['phenotype'], p['activity_score'])
+                 for gene, p in profiles.items() if gene in GENE_ACTIVITY_TABLES],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO patient_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(patient_id, r['drug'].upper().strip(), r['gene'], r['diplotype'], version,
+                  r['phenotype'], r['risk_label'], r['severity'], r['confidence'],
+                  r['recommendation'], now) for r in results],
+            )
+            # Keep this version's snapshot complete for every key we have results for
+            conn.executemany(
+                "INSERT OR IGNORE INTO guideline_outputs VALUES (?, ?, ?, ?, ?)",
+                [(version, r['gene'], r['drug'].upper().strip(), r['diplotype'],
+                  json.dumps(evaluate(r['gene'], r['drug'].upper().strip(), r['diplotype']), sort_keys=True))
+                 for r in results],
+            )
+            if new_patient:
+                conn.executemany(_ADD_COUNTS_SQL, PopulationCounters().observe(profiles, results).rows())
+
+    # ── Population counters ──
+
+    def population_counts(self) -> PopulationCounters:
+        """Current counters; one row per (kind, scope, value), independent of patient count."""
+        with self._connect() as conn:
+            return PopulationCounters.from_rows(conn.execute("SELECT kind, scope, value, n FROM population_counts"))
+
+    def merge_population_counts(self, counters: PopulationCounters):
+        """Add another shard's counters (e.g. a batch job with its own store) into this one."""
+        with self._connect() as conn:
+            conn.executemany(_ADD_COUNTS_SQL, counters.rows())
+
+    def rebuild_population_counts(self) -> PopulationCounters:
+        """Recount from the stored profiles and results (drops merged-in shards)."""
+        with self._connect() as conn:
+            return self._rebuild_counts(conn)
+
+    def _rebuild_counts(self, conn: sqlite3.Connection) -> PopulationCounters:
+        counters = self._count_tables(conn)
+        conn.execute("DELETE FROM population_counts")
+        conn.executemany(_ADD_COUNTS_SQL, counters.rows())
+        return counters
+
+    @staticmethod
+    def _count_tables(conn: sqlite3.Connection) -> PopulationCounters:
+        counters = PopulationCounters()
+        counts = counters.counts
+        counts[('total', '', 'patients')] = conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+        counts[('total', '', 'results')] = conn.execute("SELECT COUNT(*) FROM patient_results").fetchone()[0]
+        for kind in ('phenotype', 'diplotype'):
+            for gene, value, n in conn.execute(
+                f"SELECT gene, {kind}, COUNT(*) FROM patient_profiles GROUP BY gene, {kind}"
+            ):
+                if gene in GENE_ACTIVITY_TABLES:
+                    counts[(kind, gene, diplotype_value(gene, value) if kind == 'diplotype' else value)] += n
+        for drug, label, n in conn.execute(
+            "SELECT drug, risk_label, COUNT(*) FROM patient_results GROUP BY drug, risk_label"
+        ):
+            counts[('risk_label', drug_scope(drug), label)] += n
+        return counters
+
+    def list_results(self, drug: Optional[str] = None, gene: Optional[str] = None,
+                     after: Optional[Tuple[str, str]] = None, limit: int = 1000) -> List[Dict]:
+        """One page of stored results in (patient_id, drug) order; `after` is
+        the last (patient_id, drug) of the previous page."""
+        where, params = [], []
+        if drug:
+            where.append("drug = ?")
+            params.append(drug)
+        if gene:
+            where.append("gene = ?")
+            params.append(gene)
+        if after:
+            where.append("(patient_id, drug) > (?, ?)")
+            params.extend(after)
+        sql = ("SELECT patient_id, drug, gene, diplotype, guideline_version, phenotype, risk_label, "
+               "severity, confidence, recommendation, updated FROM patient_results"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY patient_id, drug LIMIT ?")
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, (*params, limit))]
+
+    def count_results(self, gene: str, drug: str, diplotype: str, version: str) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM patient_results "
+                "WHERE gene = ? AND drug = ? AND diplotype = ? AND guideline_version = ?",
+                (gene, drug, diplotype, version),
+            ).fetchone()[0]
+
+    def remapped_drugs(self, drug_gene_map: Dict[str, str], version: str) -> Dict[str, str]:
+        """Drugs whose stored results (at `version`) used a different primary gene."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT drug, gene FROM patient_results WHERE guideline_version = ?", (version,)
+            ).fetchall()
+        return {drug: drug_gene_map[drug] for drug, gene in rows
+                if drug in drug_gene_map and drug_gene_map[drug] != gene}
+
+    def apply_recompute(self, changed: Dict[GuidelineKey, Dict], remapped: Dict[str, str],
+                        from_version: str, to_version: str) -> Dict[str, int]:
+        """Re-evaluate only the affected results, then restamp the untouched
+        results of `from_version` as valid under `to_version`.
+
+        `changed` maps (gene, drug, diplotype) to its new output; `remapped`
+        maps drug -> new primary gene, re-read from the stored gene profile."""
+        now = _now()
+        affected_patients = set()
+        rows_updated = 0
+        update_sql = (
+            "UPDATE patient_results SET gene = ?, diplotype = ?, guideline_version = ?, phenotype = ?, "
+            "risk_label = ?, severity = ?, confidence = ?, recommendation = ?, updated = ? "
+        )
+        # Phenotypes and risk labels that move, added to the counters as a
+        # difference (so merged-in shards are kept) without recounting the tables
+        delta = PopulationCounters()
+        counts = delta.counts
+        with self._connect() as conn:
+            for drug, gene in remapped.items():
+                rows = conn.execute(
+                    "SELECT r.patient_id, r.risk_label, COALESCE(p.diplotype, '*1/*1') FROM patient_results r "
+                    "LEFT JOIN patient_profiles p ON p.patient_id = r.patient_id AND p.gene = ? "
+                    "WHERE r.drug = ? AND r.guideline_version = ?",
+                    (gene, drug, from_version),
+                ).fetchall()
+                for patient_id, old_label, diplotype in rows:
+                    out = evaluate(gene, drug, diplotype)
+                    conn.execute(
+                        update_sql + "WHERE patient_id = ? AND drug = ?",
+                        (gene, diplotype, to_version, out['phenotype'], out['risk_label'], out['severity'],
+                         out['confidence'], out['recommendation'], now, patient_id, drug),
+                    )
+                    affected_patients.add(patient_id)
+                    counts[('risk_label', drug_scope(drug), old_label)] -= 1
+                    counts[('risk_label', drug_scope(drug), out['risk_label'])] += 1
+                rows_updated += len(rows)
+
+            for (gene, drug, diplotype), out in changed.items():
+                # SELECT then UPDATE in one transaction; UPDATE ... RETURNING needs SQLite >= 3.35
+                match = "WHERE gene = ? AND drug = ? AND diplotype = ? AND guideline_version = ?"
+                key = (gene, drug, diplotype, from_version)
+                rows = conn.execute("SELECT patient_id, risk_label FROM patient_results " + match, key).fetchall()
+                conn.execute(
+                    update_sql + match,
+                    (gene, diplotype, to_version, out['phenotype'], out['risk_label'], out['severity'],
+                     out['confidence'], out['recommendation'], now, *key),
+                )
+                for patient_id, old_label in rows:
+                    affected_patients.add(patient_id)
+                    counts[('risk_label', drug_scope(drug), old_label)] -= 1
+                    counts[('risk_label', drug_scope(drug), out['risk_label'])] += 1
+                rows_updated += len(rows)
+
+                profile_match = "WHERE gene = ? AND diplotype = ?"
+                for phenotype, n in conn.execute(
+                    "SELECT phenotype, COUNT(*) FROM patient_profiles " + profile_match + " GROUP BY phenotype",
+                    (gene, diplotype),
+                ):
+                    counts[('phenotype', gene, phenotype)] -= n
+                    counts[('phenotype', gene, out['phenotype'])] += n
+                conn.execute(
+                    "UPDATE patient_profiles SET phenotype = ?, activity_score = ? " + profile_match,
+                    (out['phenotype'], out['activity_score'], gene, diplotype),
+                )
+
+            restamped = conn.execute(
+                "UPDATE patient_results SET guideline_version = ? WHERE guideline_version = ?",
+                (to_version, from_version),
+            ).rowcount
+            conn.executemany(_ADD_COUNTS_SQL, delta.rows())
+        return {
+            'results_recomputed': rows_updated,
+            'patients_affected': len(affected_patients),
+            'results_restamped': restamped,
+        }
+
+
+_store: Optional[ProfileStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[ProfileStore]:
+    """Process-wide store from PGX_STORE_PATH, or None when persistence is off.
+    Opened at app startup (main.py); the first call does blocking SQLite work."""
+    global _store
+    if _store is None and STORE_PATH:
+        with _store_lock:
+            if _store is None:
+                store = ProfileStore(STORE_PATH)
+                store.save_snapshot(GUIDELINE_VERSION)
+                _store = store
+    return _store
@@ -0,0 +1,226 @@
+"""Opt-in sampling profiler for single API requests.
+
+When a customer's VCF is slow in production, send the request again with
+`X-PGX-Profile: <PGX_PROFILE_TOKEN>`. That request is
+sampled from the moment it hits the app (multipart upload included) until its
+response starts; the stacks are written as folded lines ("a;b;c 42"), which
+flamegraph.pl, speedscope and inferno read directly. The response carries
+`X-PGX-Profile-Id` and a `Server-Timing` header with the per-phase wall time,
+and the profile can be fetched from GET /api/v1/pgx/profiles/{id}. The token
+is only accepted as a header: query strings end up in access and proxy logs.
+
+Requests without the flag never touch the sampler: the middleware checks one
+header, and `mark_phase()` / `traced()` are a contextvar lookup.
+
+Config (environment):
+    PGX_PROFILE_TOKEN        enables profiling; requests must present this token
+    PGX_PROFILE_DIR          where profiles are written (default: <tmp>/pgx-profiles)
+    PGX_PROFILE_INTERVAL_MS  sampling interval (default: 5)
+    PGX_PROFILE_KEEP         newest profiles kept on disk (default: 200)
+"""
+
+import contextvars
+import hmac
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_TOKEN = os.getenv("PGX_PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PGX_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "pgx-profiles"))
+PROFILE_INTERVAL = float(os.getenv("PGX_PROFILE_INTERVAL_MS", 5)) / 1000.0
+PROFILE_KEEP = int(os.getenv("PGX_PROFILE_KEEP", 200))
+
+PROFILE_HEADER = b"x-pgx-profile"
+PROFILE_ID_RE = re.compile(r'^[0-9a-f]{12}$')
+MAX_STACK_DEPTH = 128
+
+_active: contextvars.ContextVar[Optional['RequestProfiler']] = contextvars.ContextVar("pgx_profiler", default=None)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfiler:
+    """Samples the threads currently working on one request.
+
+    The event-loop thread is sampled until a blocking call is handed to a
+    worker via `traced()`; while that call runs only the worker is sampled,
+    so the profile follows the request rather than whatever else the loop is
+    doing. Stacks are rooted at `root;<phase>` so phases split the flame graph."""
+
+    def __init__(self, root: str, interval: float = PROFILE_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.timings: Dict[str, float] = {}
+        self._phase = "upload"
+        self._phase_start = time.perf_counter()
+        self._threads: List[int] = [threading.get_ident()]
+        self._halt = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="pgx-profiler", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        if not self._halt.is_set():
+            self._close_phase()
+            self._halt.set()
+            self._sampler.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._halt.wait(self.interval):
+            frames = sys._current_frames()
+            prefix = (self.root, self._phase)
+            for tid in list(self._threads):
+                frame = frames.get(tid)
+                if frame is None or tid == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.samples[";".join((*prefix, *reversed(stack)))] += 1
+
+    def _close_phase(self):
+        now = time.perf_counter()
+        self.timings[self._phase] = self.timings.get(self._phase, 0.0) + (now - self._phase_start) * 1000
+        self._phase_start = now
+
+    def enter(self, phase: str):
+        self._close_phase()
+        self._phase = phase
+
+    def traced(self, fn: Callable) -> Callable:
+        def profiled_call(*args, **kwargs):
+            saved, self._threads = self._threads, [threading.get_ident()]
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._threads = saved
+        return profiled_call
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.timings.items())
+
+
+def mark_phase(name: str):
+    """Start the next phase of the current request (no-op unless it is being profiled)."""
+    prof = _active.get()
+    if prof is not None:
+        prof.enter(name)
+
+
+def traced(fn: Callable) -> Callable:
+    """Wrap a function bound for the threadpool so the profiler follows it."""
+    prof = _active.get()
+    return prof.traced(fn) if prof is not None else fn
+
+
+def is_profiling() -> bool:
+    return _active.get() is not None
+
+
+def token_ok(presented: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and presented is not None and hmac.compare_digest(presented, PROFILE_TOKEN)
+
+
+def _profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+
+
+def save_profile(profile_id: str, prof: RequestProfiler):
+    """Write one profile and prune old ones (blocking file I/O: run off the loop)."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(_profile_path(profile_id), "w", encoding="utf-8") as fh:
+        fh.write(prof.folded())
+    stored = sorted((e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".folded")),
+                    key=lambda e: e.stat().st_mtime)
+    for entry in stored[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else ():
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def load_profile(profile_id: str) -> Optional[str]:
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    try:
+        with open(_profile_path(profile_id), encoding="utf-8") as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware (no per-request wrapping unless the flag is present)."""
+
+    def __init__(self, app, paths: Iterable[str] = ()):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        presented = self._flag(scope)
+        if presented is None:
+            return await self.app(scope, receive, send)
+        if not token_ok(presented):
+            response = JSONResponse(status_code=403, content={"detail": "Invalid profiling token."})
+            return await response(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+        prof = RequestProfiler(root=scope["path"].rstrip("/").rsplit("/", 1)[-1])
+        token = _active.set(prof)
+        started = saved = False
+
+        async def persist():
+            nonlocal saved
+            if not saved:
+                saved = True
+                await run_in_threadpool(save_profile, profile_id, prof)
+
+        async def send_profiled(message):
+            nonlocal started
+            if message["type"] == "http.response.start" and not started:
+                started = True
+                prof.stop()
+                headers = list(message.get("headers", []))
+                headers.append((b"x-pgx-profile-id", profile_id.encode()))
+                headers.append((b"server-timing", prof.server_timing().encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # On disk before the client has the whole response, so a GET of
+                # the profile id it just received cannot race the write
+                await persist()
+            await send(message)
+
+        prof.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            prof.stop()
+            _active.reset(token)
+            await persist()
+
+    @staticmethod
+    def _flag(scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1")
+        return None
@@ -0,0 +1,95 @@
+"""Incremental recomputation of stored results after a guideline change.
+
+    python -m backend.recompute --list
+    python -m backend.recompute --from "CPIC-2026.02+1a2b3c4d5e6f" [--dry-run]
+
+Diffs the stored snapshot of `--from` against the rules currently loaded
+(GUIDELINE_VERSION) and re-evaluates only the (gene, drug, diplotype)
+combinations whose output changed, touching only the patients that carry them.
+Everything else is restamped to the new version without being re-evaluated.
+
+The unit of recomputation is the called diplotype; an activity-table edit that
+would change how a compound heterozygote is *called* (allele priority) needs the
+original VCF and is not picked up here.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from backend.guidelines import GUIDELINE_VERSION, evaluate
+from backend.pgx_engine import DRUG_GENE_MAP
+from backend.profile_store import ProfileStore, STORE_PATH
+
+
+def diff_against_current(old: dict) -> dict:
+    """{key: new_output} for the keys of snapshot `old` whose output the
+    currently loaded rules would change."""
+    changed = {}
+    for key, out in old.items():
+        new = evaluate(*key)
+        if new != out:
+            changed[key] = new
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute stored PGx results for a new guideline version.")
+    parser.add_argument("--store", default=STORE_PATH, help="SQLite store path (default: $PGX_STORE_PATH)")
+    parser.add_argument("--from", dest="from_version", help="Guideline version the results were produced under")
+    parser.add_argument("--list", action="store_true", help="List guideline versions with stored snapshots")
+    parser.add_argument("--dry-run", action="store_true", help="Report the diff without writing")
+    args = parser.parse_args(argv)
+
+    if not args.store or not os.path.exists(args.store):
+        parser.error("no store found; pass --store or set PGX_STORE_PATH")
+    store = ProfileStore(args.store)
+
+    if args.list:
+        for version, n in store.snapshot_versions():
+            marker = "  (current)" if version == GUIDELINE_VERSION else ""
+            print(f"{version}\t{n} outputs{marker}")
+        return 0
+
+    if not args.from_version:
+        parser.error("--from is required (see --list)")
+    if args.from_version == GUIDELINE_VERSION:
+        print(f"Results are already at {GUIDELINE_VERSION}; nothing to do.")
+        return 0
+
+    old = store.load_snapshot(args.from_version)
+    if not old:
+        print(f"No snapshot stored for {args.from_version!r}.", file=sys.stderr)
+        return 1
+
+    changed = diff_against_current(old)
+    remapped = store.remapped_drugs(DRUG_GENE_MAP, args.from_version)
+
+    report = {
+        "from_version": args.from_version,
+        "to_version": GUIDELINE_VERSION,
+        "keys_compared": len(old),
+        "keys_changed": len(changed),
+        "drugs_remapped": remapped,
+        "changed": [],
+    }
+    for (g, d, dip), out in sorted(changed.items()):
+        n = store.count_results(g, d, dip, args.from_version)
+        if n:
+            report["changed"].append({
+                "gene": g, "drug": d, "diplotype": dip, "results": n,
+                "before": {k: old[(g, d, dip)].get(k) for k in ("phenotype", "risk_label", "severity")},
+                "after": {k: out.get(k) for k in ("phenotype", "risk_label", "severity")},
+            })
+
+    if not args.dry_run:
+        store.save_snapshot(GUIDELINE_VERSION)
+        report.update(store.apply_recompute(changed, remapped, args.from_version, GUIDELINE_VERSION))
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
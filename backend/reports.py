@@ -0,0 +1,49 @@
+"""Result payloads shared by the API (main.py) and the ingestion service."""
+
+from typing import Dict, List, Optional
+
+from backend.pgx_engine import GENE_ACTIVITY_TABLES
+
+
+def quality_metrics(compact: Dict, parts: int = 1) -> Dict:
+    """QualityMetricsDto fields from a compact profile (backend/parse_pool.py)."""
+    return {
+        "vcf_parsing_success": compact['total_count'] > 0,
+        "total_variants": compact['total_count'],
+        "qc_excluded_variants": sum(q['sites'] - q['passed'] for q in compact['qc'].values()),
+        "gene_qc": compact['qc'],
+        "vcf_parts": parts,
+        "duplicate_sites_dropped": compact.get('merge', {}).get('duplicates_dropped', 0),
+        "defining_site_coverage": compact['coverage'],
+        "parse_errors": compact['parse_errors'],
+    }
+
+
+def matrix_report(compact: Dict, rows: List[Dict], explanations: Optional[List[str]] = None,
+                  drug_inputs: Optional[List[str]] = None) -> Dict:
+    """Columnar drug x gene matrix for guidelines.risk_matrix rows: `genes` and
+    `profile.*` per gene, `drugs` and `cells.*` per drug, `cells.gene[i]`
+    indexing `genes`. The profile covers every gene; each drug has one cell,
+    at its guideline gene, and the rest of its row has no guideline."""
+    genes = list(GENE_ACTIVITY_TABLES)
+    gene_index = {gene: i for i, gene in enumerate(genes)}
+    cells = {
+        "gene": [gene_index[r['gene']] for r in rows],
+        "risk_label": [r['risk_label'] for r in rows],
+        "severity": [r['severity'] for r in rows],
+        "confidence": [r['confidence'] for r in rows],
+        "recommendation": [r['recommendation'] for r in rows],
+    }
+    if explanations is not None:
+        cells["explanation"] = explanations
+    return {
+        "genes": genes,
+        "profile": {
+            "diplotype": [compact['profiles'][g]['diplotype'] for g in genes],
+            "phenotype": [compact['profiles'][g]['phenotype'] for g in genes],
+            "activity_score": [compact['profiles'][g]['activity_score'] for g in genes],
+        },
+        "drugs": [r['drug'] for r in rows],
+        "drug_inputs": drug_inputs,
+        "cells": cells,
+    }
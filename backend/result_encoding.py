@@ -0,0 +1,182 @@
+"""Content negotiation and fast encoding for bulk result responses.
+
+Bulk endpoints hand over plain dicts built from trusted internal data (the
+profile store, the guideline engine) and return a Response directly, so there
+is no per-item Pydantic validation or jsonable_encoder pass. Formats:
+
+    application/json       orjson when installed, else compact stdlib json
+    application/x-ndjson   one item per line, streamed in chunks
+    application/msgpack    when `msgpack` is installed
+
+chosen from `?format=json|ndjson|msgpack` or the Accept header, and
+compressed with zstd (when `zstandard` is installed) or gzip per
+Accept-Encoding. For NDJSON the envelope fields (count, cursor, ...) travel
+as X-PGX-* headers since the body is only items.
+
+Config (environment):
+    PGX_COMPRESS_MIN_BYTES   smallest body worth compressing (default: 1024)
+    PGX_GZIP_LEVEL / PGX_ZSTD_LEVEL                     (default: 5 / 3)
+"""
+
+import json
+import os
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json fallback
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # optional; msgpack is not offered without it
+    msgpack = None
+try:
+    import zstandard
+except ImportError:  # optional; gzip only without it
+    zstandard = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+
+FORMATS = {"json": JSON, "ndjson": NDJSON, "msgpack": MSGPACK}
+_ALIASES = {
+    "*/*": JSON,
+    "application/*": JSON,
+    "application/jsonl": NDJSON,
+    "application/jsonlines": NDJSON,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+COMPRESS_MIN_BYTES = int(os.getenv("PGX_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("PGX_GZIP_LEVEL", 5))
+ZSTD_LEVEL = int(os.getenv("PGX_ZSTD_LEVEL", 3))
+NDJSON_CHUNK_ITEMS = 500
+
+
+def available_media_types() -> List[str]:
+    return [JSON, NDJSON] + ([MSGPACK] if msgpack is not None else [])
+
+
+def available_encodings() -> List[str]:
+    # Server preference order
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+def _parse_q(header: str) -> List[Tuple[str, float]]:
+    out = []
+    for part in header.split(","):
+        name, *params = part.strip().split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            out.append((name.strip().lower(), q))
+    return out
+
+
+def negotiate_media_type(accept: Optional[str], fmt: Optional[str] = None,
+                         allowed: Iterable[str] = ()) -> Optional[str]:
+    """Media type to send, or None if nothing acceptable is available (406).
+    `allowed` narrows the choice for endpoints that return one document."""
+    available = [m for m in available_media_types() if not allowed or m in allowed]
+    if fmt:
+        media_type = FORMATS.get(fmt.lower())
+        return media_type if media_type in available else None
+    if not accept:
+        return JSON
+    best, best_q = None, 0.0
+    for name, q in _parse_q(accept):
+        name = _ALIASES.get(name, name)
+        if name in available and q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    prefs = dict(_parse_q(accept_encoding or ""))
+    for encoding in available_encodings():
+        if prefs.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+def dumps_json(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads_json(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _compressor(encoding: str):
+    # Both expose compress()/flush(), so streamed and one-shot bodies share it
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)   # wbits 31: gzip container
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    comp = _compressor(encoding)
+    return comp.compress(body) + comp.flush()
+
+
+def _compressed_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    comp = _compressor(encoding)
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def ndjson_stream(items: List[dict], encoding: Optional[str] = None) -> Iterator[bytes]:
+    """NDJSON body chunks (NDJSON_CHUNK_ITEMS lines each), compressed on the fly."""
+    chunks = (b"".join(dumps_json(item) + b"\n" for item in items[i:i + NDJSON_CHUNK_ITEMS])
+              for i in range(0, len(items), NDJSON_CHUNK_ITEMS))
+    return _compressed_stream(chunks, encoding) if encoding else chunks
+
+
+def _meta_headers(meta: Dict) -> Dict[str, str]:
+    return {"X-PGX-" + key.replace("_", "-").title(): str(value)
+            for key, value in meta.items() if value is not None and not isinstance(value, (dict, list))}
+
+
+def encode_body(payload, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return dumps_json(payload)
+
+
+def bulk_response(items: List[dict], meta: Dict, media_type: str, encoding: Optional[str],
+                  items_key: str = "results") -> Response:
+    """Encode trusted `items` (plus envelope `meta`) as `media_type`. Blocking;
+    call it from the threadpool for large payloads."""
+    if media_type == NDJSON:
+        headers = {"Vary": "Accept, Accept-Encoding", **_meta_headers(meta)}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return StreamingResponse(ndjson_stream(items, encoding), media_type=NDJSON, headers=headers)
+
+    return encoded_response({**meta, items_key: items}, media_type, encoding)
+
+
+def encoded_response(payload, media_type: str, encoding: Optional[str]) -> Response:
+    """One JSON or MessagePack document, compressed when large enough."""
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    body = encode_body(payload, media_type)
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=media_type, headers=headers)
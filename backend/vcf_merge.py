@@ -0,0 +1,146 @@
+"""Streaming k-way merge of per-chromosome VCF parts for one patient.
+
+Pipelines that split output per contig (`bcftools view -r chr1,...`) can send
+the parts as-is instead of concatenating them first. Headers are read up
+front and checked for compatibility; records are then pulled lazily from each
+part and merged with `heapq.merge` in (contig, position) order, so only one
+line per part is held at a time. Records at the same CHROM/POS/REF/ALT in
+more than one part are kept once (from the earliest part).
+
+Parts must each be sorted (as bcftools/GATK write them); contigs are ordered by
+the ##contig header lines, undeclared contigs after them in natural order.
+A record whose POS is not an integer is skipped and counted in `errors`, like
+the parser's own malformed-record counts.
+"""
+
+import heapq
+import io
+import re
+from typing import BinaryIO, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+from backend.vcf_parser import check_sample_count, iter_vcf_lines
+
+MAX_VCF_PARTS = 32
+
+_CONTIG_ID = re.compile(r'ID=([^,>]+)')
+_CONTIG_LENGTH = re.compile(r'length=(\d+)')
+
+
+class VcfMergeError(ValueError):
+    """Parts that cannot be merged into one patient's VCF."""
+
+
+def _natural_key(chrom: str) -> Tuple:
+    name = chrom[3:] if chrom.lower().startswith('chr') else chrom
+    return (0, int(name), '') if name.isdigit() else (1, 0, name.upper())
+
+
+class VcfPart:
+    """One uploaded part: its header, read eagerly, and a lazy record stream."""
+
+    def __init__(self, index: int, source: Union[bytes, BinaryIO], name: Optional[str] = None):
+        self.index = index
+        self.name = name or f"part {index + 1}"
+        self._lines = iter_vcf_lines(io.BytesIO(source) if isinstance(source, bytes) else source)
+        self.fileformat: Optional[str] = None
+        self.reference: Optional[str] = None
+        self.contigs: Dict[str, Optional[int]] = {}
+        self.samples: Tuple[str, ...] = ()
+        self._read_header()
+
+    def _read_header(self):
+        for line in self._lines:
+            if line.startswith('##fileformat='):
+                self.fileformat = line.split('=', 1)[1].strip()
+            elif line.startswith('##reference='):
+                self.reference = line.split('=', 1)[1].strip().rsplit('/', 1)[-1]
+            elif line.startswith('##contig='):
+                cid = _CONTIG_ID.search(line)
+                if cid:
+                    length = _CONTIG_LENGTH.search(line)
+                    self.contigs[cid.group(1)] = int(length.group(1)) if length else None
+            elif line.startswith('#CHROM'):
+                columns = line.split('\t')
+                if len(columns) < 10:
+                    raise VcfMergeError(f"{self.name}: no sample column in the #CHROM header")
+                check_sample_count(len(columns) - 9)
+                self.samples = tuple(columns[9:])
+                return
+            elif line and not line.startswith('#'):
+                break
+        raise VcfMergeError(f"{self.name}: missing #CHROM header line")
+
+    def records(self, contig_rank: Dict[str, Tuple], errors: Dict[str, int]) -> Iterator[Tuple[Tuple, str]]:
+        """((contig rank, pos), line) for each data line, checking sort order;
+        lines with a bad POS are counted in `errors` and skipped."""
+        previous = None
+        for lineno, line in enumerate(self._lines, 1):
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('\t', 2)
+            if len(fields) < 3:
+                continue
+            try:
+                key = (contig_rank.get(fields[0]) or (1, *_natural_key(fields[0])), int(fields[1]))
+            except ValueError:
+                errors['bad_pos'] = errors.get('bad_pos', 0) + 1
+                continue
+            if previous is not None and key < previous:
+                raise VcfMergeError(f"{self.name}: records are not sorted by contig/position "
+                                    f"(data line {lineno}, {fields[0]}:{fields[1]})")
+            previous = key
+            yield key, line
+
+
+class VcfMerger:
+    """Iterable of merged, deduplicated data lines; `stats` and `errors` are
+    filled as it runs."""
+
+    def __init__(self, sources: Sequence[Union[bytes, BinaryIO]], names: Sequence[Optional[str]] = ()):
+        if not sources:
+            raise VcfMergeError("no VCF parts given")
+        if len(sources) > MAX_VCF_PARTS:
+            raise VcfMergeError(f"at most {MAX_VCF_PARTS} VCF parts per patient")
+        names = list(names) + [None] * (len(sources) - len(names))
+        self.parts = [VcfPart(i, src, name) for i, (src, name) in enumerate(zip(sources, names))]
+        self.contig_rank = self._check_compatible()
+        self.stats = {'parts': len(self.parts), 'records': 0,
+                      'duplicates_dropped': 0, 'conflicting_duplicates': 0}
+        self.errors: Dict[str, int] = {}
+
+    def _check_compatible(self) -> Dict[str, Tuple]:
+        first = self.parts[0]
+        lengths: Dict[str, Optional[int]] = {}
+        for part in self.parts:
+            if part.samples != first.samples:
+                raise VcfMergeError(f"{part.name}: samples {list(part.samples)} do not match "
+                                    f"{first.name} {list(first.samples)}")
+            if (part.fileformat or 'VCFv4').split('.')[0] != (first.fileformat or 'VCFv4').split('.')[0]:
+                raise VcfMergeError(f"{part.name}: {part.fileformat} is incompatible with {first.fileformat}")
+            if part.reference and first.reference and part.reference != first.reference:
+                raise VcfMergeError(f"{part.name}: reference {part.reference} differs from {first.reference}")
+            for cid, length in part.contigs.items():
+                known = lengths.setdefault(cid, length)
+                if known is not None and length is not None and known != length:
+                    raise VcfMergeError(f"{part.name}: contig {cid} length {length} differs from {known} "
+                                        f"(different assemblies?)")
+        # Declared contigs in header order; undeclared ones sort after them
+        return {cid: (0, rank) for rank, cid in enumerate(lengths)}
+
+    def __iter__(self) -> Iterator[str]:
+        streams = [part.records(self.contig_rank, self.errors) for part in self.parts]
+        current, seen = None, {}
+        for key, line in heapq.merge(*streams, key=lambda rec: rec[0]):
+            if key != current:
+                current, seen = key, {}
+            fields = line.split('\t', 5)
+            site = tuple(fields[3:5])
+            if site in seen:
+                self.stats['duplicates_dropped'] += 1
+                if seen[site] != line:
+                    self.stats['conflicting_duplicates'] += 1
+                continue
+            seen[site] = line
+            self.stats['records'] += 1
+            yield line
+
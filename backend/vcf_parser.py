@@ -1,32 +1,331 @@
-import re
+import gzip
+import io
+import os
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Union
 
-def parse_vcf(file_content):
+from backend.gvcf import REF_BLOCK_ALTS, SiteCoverage
+from backend.pgx_engine import GENE_ACTIVITY_TABLES
+
+# ── QC gating thresholds (sites below these are excluded from diplotype calls) ──
+QC_MIN_DEPTH = int(os.getenv("PGX_QC_MIN_DP", 10))
+QC_MIN_GQ = int(os.getenv("PGX_QC_MIN_GQ", 20))
+PASSING_FILTERS = ("PASS", ".")
+
+# ── Input limits (hostile / malformed uploads); 0 disables a limit ──
+MAX_LINE_CHARS = int(os.getenv("PGX_VCF_MAX_LINE_CHARS", 256 * 1024))
+MAX_INFO_KEYS = int(os.getenv("PGX_VCF_MAX_INFO_KEYS", 256))
+MAX_FORMAT_KEYS = int(os.getenv("PGX_VCF_MAX_FORMAT_KEYS", 64))
+MAX_SAMPLES = int(os.getenv("PGX_VCF_MAX_SAMPLES", 64))
+MAX_GENES = int(os.getenv("PGX_VCF_MAX_GENES", 1000))
+
+# Histogram bucket lower edges for the per-gene depth / GQ distributions
+DEPTH_BINS = (0, 10, 20, 30, 50)
+GQ_BINS = (0, 10, 20, 30, 60)
+
+
+class VcfLimitError(ValueError):
+    """The file as a whole is outside the parser limits (bad records are only counted)."""
+
+
+def check_sample_count(n_samples: int):
+    if MAX_SAMPLES and n_samples > MAX_SAMPLES:
+        raise VcfLimitError(f"{n_samples} sample columns (limit {MAX_SAMPLES})")
+
+
+def _int_field(value: Optional[str], errors: Dict[str, int], name: str) -> Optional[int]:
+    """FORMAT integer, or None when absent / '.'; garbage is counted, not raised."""
+    if value is None or value == '.' or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        errors[name] = errors.get(name, 0) + 1
+        return None
+
+
+class _Distribution:
+    """Running count/min/max/mean plus a fixed-bucket histogram."""
+
+    __slots__ = ('bins', 'counts', 'n', 'total', 'lo', 'hi')
+
+    def __init__(self, bins):
+        self.bins = bins
+        self.counts = [0] * len(bins)
+        self.n = 0
+        self.total = 0
+        self.lo = None
+        self.hi = None
+
+    def add(self, value: int):
+        self.n += 1
+        self.total += value
+        self.lo = value if self.lo is None or value < self.lo else self.lo
+        self.hi = value if self.hi is None or value > self.hi else self.hi
+        i = len(self.bins) - 1
+        while i > 0 and value < self.bins[i]:
+            i -= 1
+        self.counts[i] += 1
+
+    def summary(self) -> Dict:
+        labels = [f"{lo}-{hi - 1}" for lo, hi in zip(self.bins, self.bins[1:])] + [f"{self.bins[-1]}+"]
+        return {
+            'count': self.n,
+            'min': self.lo,
+            'max': self.hi,
+            'mean': round(self.total / self.n, 2) if self.n else None,
+            'histogram': dict(zip(labels, self.counts)),
+        }
+
+
+class _GeneQc:
+    """Per-gene QC counters, updated once per record during the parse."""
+
+    __slots__ = ('sites', 'passed', 'failed_filter', 'missing_calls', 'low_quality', 'depth', 'gq')
+
+    def __init__(self):
+        self.sites = 0
+        self.passed = 0
+        self.failed_filter = 0
+        self.missing_calls = 0
+        self.low_quality = 0
+        self.depth = _Distribution(DEPTH_BINS)
+        self.gq = _Distribution(GQ_BINS)
+
+    def add(self, filt: str, genotype: str, depth: Optional[int], gq: Optional[int]) -> bool:
+        """Record one site; returns True if it passes QC gating."""
+        self.sites += 1
+        ok = True
+        if filt not in PASSING_FILTERS:
+            self.failed_filter += 1
+            ok = False
+        if '.' in genotype:
+            self.missing_calls += 1
+            ok = False
+        # DP/GQ only gate a site when the caller reported them
+        low = False
+        if depth is not None:
+            self.depth.add(depth)
+            low = depth < QC_MIN_DEPTH
+        if gq is not None:
+            self.gq.add(gq)
+            low = low or gq < QC_MIN_GQ
+        if low:
+            self.low_quality += 1
+            ok = False
+        if ok:
+            self.passed += 1
+        return ok
+
+    def summary(self) -> Dict:
+        return {
+            'sites': self.sites,
+            'passed': self.passed,
+            'failed_filter': self.failed_filter,
+            'missing_calls': self.missing_calls,
+            'low_quality': self.low_quality,
+            'depth': self.depth.summary(),
+            'genotype_quality': self.gq.summary(),
+        }
+
+
+def iter_vcf_lines(source: BinaryIO) -> Iterator[str]:
+    """Decoded lines of a binary VCF stream, one at a time (never the whole text)."""
+    for raw in source:
+        yield raw.decode('utf-8', errors='ignore').rstrip('\r\n')
+
+
+def open_vcf(path: str) -> BinaryIO:
+    """Binary stream of a `.vcf` or `.vcf.gz` file, decompressed as it is read."""
+    return gzip.open(path, 'rb') if path.lower().endswith('.gz') else open(path, 'rb')
+
+
+def parse_vcf_in_memory(vcf_content: bytes, genes: Optional[Iterable[str]] = None) -> Dict:
+    """Parse a clinical-grade VCF file completely in RAM.
+    Extracts structured variant data per gene including genotype, star allele,
+    functional consequence, CPIC level, and clinical significance.
+    Per-gene QC (DP/GQ distributions, failed filters, missing calls) is
+    aggregated in the same pass and each variant is flagged with `qc_pass`.
+    gVCF reference blocks are not kept as variants; they are folded into
+    the defining-site coverage returned under 'coverage' (None for plain VCFs).
+
+    With `genes`, variant records are kept only for those genes (the ones
+    that will be called); every record still counts towards 'total_count',
+    'genes_found', QC and coverage. A whole-genome file then costs memory
+    per gene, not per record."""
+
+    return parse_vcf_stream(io.BytesIO(vcf_content), genes)
+
+
+def parse_vcf_stream(source: BinaryIO, genes: Optional[Iterable[str]] = None) -> Dict:
+    """`parse_vcf_in_memory` over a binary file object (a spooled upload,
+    `open_vcf`), read line by line."""
+    return parse_vcf_lines(iter_vcf_lines(source), genes)
+
+
+def parse_vcf_lines(lines: Iterable[str], genes: Optional[Iterable[str]] = None) -> Dict:
+    """Record loop of `parse_vcf_in_memory` over any iterable of VCF lines
+    (e.g. a streaming merge of several parts); same return structure.
+
+    Work per line is bounded by the limits above, so parse time stays linear
+    in input size whatever the content. A record that breaks a limit or has
+    a malformed field is skipped or degraded and counted in 'parse_errors'
+    (records of genes beyond the first MAX_GENES, pharmacogenes excepted, as
+    'too_many_genes'); only a header with more than MAX_SAMPLES samples
+    rejects the file."""
+
+    keep = None if genes is None else frozenset(genes)
+    gene_variants: Dict[str, list] = {}
+    total_count = 0
+    gene_qc: Dict[str, _GeneQc] = {}
+    coverage = SiteCoverage(QC_MIN_GQ, QC_MIN_DEPTH)
+    is_gvcf = False
+    errors: Dict[str, int] = {}
+
+    def skip(reason):
+        errors[reason] = errors.get(reason, 0) + 1
+
+    for line in lines:
+        if line.startswith("#"):
+            if line.startswith('##GVCFBlock') or line.startswith('##ALT=<ID=NON_REF'):
+                is_gvcf = True
+            elif line.startswith('#CHROM'):
+                check_sample_count(line.count('\t') - 8)
+            continue
+
+        if MAX_LINE_CHARS and len(line) > MAX_LINE_CHARS:
+            skip('line_too_long')
+            continue
+
+        # Only the first sample is read; further columns are never split
+        parts = line.split('\t', 10)
+        if len(parts) < 10:
+            if line.strip():
+                skip('too_few_columns')
+            continue
+
+        chrom = parts[0]
+        pos = parts[1]
+        rsid = parts[2]
+        ref = parts[3]
+        alt = parts[4]
+        qual = parts[5]
+        filt = parts[6]
+        info_str = parts[7]
+        fmt = parts[8]
+        sample = parts[9]
+
+        # ── gVCF: reference blocks only feed the coverage index ──
+        if alt in REF_BLOCK_ALTS:
+            is_gvcf = True
+            coverage.add_block(chrom, pos, info_str, fmt, sample)
+            continue
+        if alt.endswith(',<NON_REF>') or alt.endswith(',<*>'):
+            is_gvcf = True
+            alt = alt.rsplit(',', 1)[0]
+
+        # ── Parse INFO field ──
+        info_tokens = info_str.split(';', MAX_INFO_KEYS) if MAX_INFO_KEYS else info_str.split(';')
+        if MAX_INFO_KEYS and len(info_tokens) > MAX_INFO_KEYS:
+            skip('too_many_info_keys')
+            continue
+        info = {}
+        for token in info_tokens:
+            if '=' in token:
+                k, v = token.split('=', 1)
+                info[k] = v
+            else:
+                info[token] = True
+
+        # ── Parse FORMAT + SAMPLE fields ──
+        fmt_keys = fmt.split(':', MAX_FORMAT_KEYS) if MAX_FORMAT_KEYS else fmt.split(':')
+        if MAX_FORMAT_KEYS and len(fmt_keys) > MAX_FORMAT_KEYS:
+            skip('too_many_format_keys')
+            continue
+        sample_vals = sample.split(':', len(fmt_keys))
+        gt_data = dict(zip(fmt_keys, sample_vals))
+
+        genotype = gt_data.get('GT', '.')
+        depth = _int_field(gt_data.get('DP'), errors, 'bad_dp')
+        gq = _int_field(gt_data.get('GQ'), errors, 'bad_gq')
+        read_depth = depth if depth is not None else 0
+        geno_quality = gq if gq is not None else 0
+
+        # ── Extract key annotations ──
+        gene = info.get('GENE', info.get('gene', 'UNKNOWN'))
+        star = info.get('STAR', info.get('star', ''))
+        func = info.get('FUNC', info.get('func', ''))
+        cpic = info.get('CPIC', info.get('cpic', ''))
+        af_str = info.get('AF', '0')
+        clnsig = info.get('CLNSIG', info.get('clnsig', ''))
+
+        # Normalize star allele (ensure * prefix)
+        if star and not star.startswith('*'):
+            star = f'*{star}'
+
+        # ── Single-pass QC aggregation ──
+        if gene not in gene_qc:
+            # The cap bounds the per-gene tables; the pharmacogenes are always kept
+            if MAX_GENES and len(gene_qc) >= MAX_GENES and gene not in GENE_ACTIVITY_TABLES:
+                skip('too_many_genes')
+                continue
+            gene_qc[gene] = _GeneQc()
+        # A missing or malformed DP/GQ does not gate the site
+        qc_pass = gene_qc[gene].add(filt, genotype, depth, gq)
+        if qc_pass:
+            coverage.add_call(chrom, pos, gene, star, genotype)
+
+        total_count += 1
+        if keep is not None and gene not in keep:
+            continue
+
+        variant = {
+            'chrom': chrom,
+            'pos': pos,
+            'rsid': rsid if rsid != '.' else '',
+            'ref': ref,
+            'alt': alt,
+            'qual': qual,
+            'filter': filt,
+            'gene': gene,
+            'star': star,
+            'func': func,
+            'cpic': cpic,
+            'af': af_str,
+            'clnsig': clnsig,
+            'genotype': genotype,
+            'read_depth': read_depth,
+            'geno_quality': geno_quality,
+            'qc_pass': qc_pass,
+        }
+
+        # Group by gene
+        if gene not in gene_variants:
+            gene_variants[gene] = []
+        gene_variants[gene].append(variant)
+
+    return {
+        'gene_variants': gene_variants,
+        'genes_found': list(gene_qc),
+        'total_count': total_count,
+        'qc': {gene: acc.summary() for gene, acc in gene_qc.items()},
+        'gvcf': is_gvcf,
+        'reference_blocks': coverage.blocks,
+        'coverage': coverage.summary() if is_gvcf else None,
+        'parse_errors': errors,
+    }
+
+
+def parse_vcf(file_content: Union[str, bytes]) -> Dict:
     """
     Parses the provided VCF file content to extract specific gene variants.
-    
+
     Args:
-        file_content (str): The string content of the uploaded VCF file.
-        
+        file_content (str | bytes): The content of the uploaded VCF file.
+
     Returns:
-        dict: A dictionary of extracted gene variants and metadata.
+        dict: The same structure as `parse_vcf_in_memory` (gene_variants,
+        genes_found, total_count, qc).
     """
-    # Initialize result dictionary
-    data = {
-        "genes": {}
-    }
-    
-    # TODO: Implement regex logic here to extract the following genes:
-    # - CYP2D6
-    # - CYP2C19
-    # - CYP2C9
-    # - SLCO1B1
-    # - TPMT
-    # - DPYD
-    #
-    # Example regex pattern: r"..."
-    # Iterate through lines in file_content and match patterns.
-    
-    # Placeholder implementation
-    # This should be replaced with actual parsing logic by User 2
-    
-    return data
+    if isinstance(file_content, str):
+        file_content = file_content.encode('utf-8')
+    return parse_vcf_in_memory(file_content)
@@ -6,6 +6,9 @@ import {
     ScanLine, Loader2, AlertTriangle
 } from 'lucide-react';
 
+// Backend origin; set VITE_API_BASE="" when the API is served from the same origin (/api routes)
+const API_BASE = import.meta.env.VITE_API_BASE ?? 'http://localhost:8000';
+
 /* ═══════════════════════════════════════════════════════════════
    ██  CPIC MOCK DATA                                            ██
    ═══════════════════════════════════════════════════════════════ */
@@ -378,6 +381,15 @@ export default function PharmaGuardDashboard() {
     });
     useEffect(() => { sessionStorage.setItem(SESSION_KEY, JSON.stringify(pharmaData)); }, [pharmaData]);
 
+    /* ── Supported drugs from the server lexicon (ALL_DRUGS is the offline fallback) ── */
+    const [allDrugs, setAllDrugs] = useState(ALL_DRUGS);
+    useEffect(() => {
+        fetch(`${API_BASE}/api/v1/pgx/drugs?limit=50`)
+            .then(r => r.ok ? r.json() : Promise.reject(r.status))
+            .then(data => { if (data.results?.length) setAllDrugs(data.results.map(d => d.drug)); })
+            .catch(() => { /* keep the bundled list */ });
+    }, []);
+
     /* ── App state ───────────────────────────────────────────── */
     const [status, setStatus] = useState('idle');
     const [activeModalData, setActiveModalData] = useState(null);
@@ -424,51 +436,57 @@ export default function PharmaGuardDashboard() {
 
         setStatus('scanning');
 
-        let newInteractions = {};
-
-        // Process ONE drug at a time to protect the LLM rate limits
-        for (const drugName of selectedDrugs) {
+        // One upload -> every selected drug against its guideline gene (no LLM text, so the grid is instant)
+        const matrixRequest = (explain) => {
             const formData = new FormData();
             formData.append("file", file);
-            formData.append("drug", drugName);
-
-            try {
-                const response = await fetch("http://localhost:8000/api/v1/pgx/analyze", {
-                    method: "POST",
-                    body: formData
-                    // Browser sets the multipart boundary automatically; do NOT set Content-Type header
-                });
-
-                if (response.ok) {
-                    const data = await response.json();
-                    const gene = data.pharmacogenomic_profile.primary_gene;
-                    const risk = mapRiskLevel(data.risk_assessment.risk_label);
-                    const phenotype = data.pharmacogenomic_profile.phenotype;
-
-                    // Key is Drug-Gene to match getCellData lookup
-                    newInteractions[`${drugName}-${gene}`] = {
-                        drug: drugName,
-                        gene: gene,
-                        diplotype: data.pharmacogenomic_profile.diplotype,
-                        phenotype: phenotype,
-                        risk: risk,
-                        badge: mapBadge(data.risk_assessment.risk_label, phenotype),
-                        summary: data.llm_generated_explanation.summary,
-                        suggestion: data.clinical_recommendation.recommendation,
-                        ai_confidence: data.risk_assessment.confidence_score,
-                        rawData: data // Store full verified response
-                    };
-                } else {
-                    console.error(`API error for ${drugName}:`, await response.text());
-                }
-            } catch (error) {
-                console.error(`Failed to analyze ${drugName}:`, error);
+            formData.append("drugs", selectedDrugs.join(","));
+            if (explain) {
+                formData.append("explain", "true");
+                formData.append("record", "false"); // same patient as the first request
             }
-        }
+            // Browser sets the multipart boundary automatically; do NOT set Content-Type header
+            return fetch(`${API_BASE}/api/v1/pgx/matrix`, { method: "POST", body: formData })
+                .then(async r => r.ok ? r.json() : Promise.reject(await r.text()));
+        };
+
+        // Key is Drug-Gene to match getCellData lookup; cells are columns aligned with data.drugs
+        const toInteractions = (data) => {
+            const interactions = {};
+            data.drugs.forEach((drug, i) => {
+                const drugName = data.drug_inputs?.[i] ?? drug;
+                const g = data.cells.gene[i];
+                const gene = data.genes[g];
+                const phenotype = data.profile.phenotype[g];
+                interactions[`${drugName}-${gene}`] = {
+                    drug: drugName,
+                    gene: gene,
+                    diplotype: data.profile.diplotype[g],
+                    phenotype: phenotype,
+                    risk: mapRiskLevel(data.cells.risk_label[i]),
+                    badge: mapBadge(data.cells.risk_label[i], phenotype),
+                    summary: data.cells.explanation?.[i] ?? data.cells.recommendation[i],
+                    suggestion: data.cells.recommendation[i],
+                    ai_confidence: data.cells.confidence[i],
+                    rawData: { ...data, cell: i } // Full matrix response + this cell's index
+                };
+            });
+            return interactions;
+        };
 
-        // Update state with real results
-        setPharmaData(prev => ({ ...prev, interactions: { ...prev.interactions, ...newInteractions } }));
+        try {
+            const data = await matrixRequest(false);
+            if (data.unsupported_drugs?.length) console.warn("Unsupported drugs:", data.unsupported_drugs);
+            setPharmaData(prev => ({ ...prev, interactions: { ...prev.interactions, ...toInteractions(data) } }));
+        } catch (error) {
+            console.error("Matrix analysis failed:", error);
+        }
         setStatus('done');
+
+        // AI explanations arrive later and replace the guideline text in the report modal
+        matrixRequest(true)
+            .then(data => setPharmaData(prev => ({ ...prev, interactions: { ...prev.interactions, ...toInteractions(data) } })))
+            .catch(error => console.error("AI explanations unavailable:", error));
     };
 
     const displayDrugs = selectedDrugs.length > 0 ? selectedDrugs : [];
@@ -534,7 +552,7 @@ export default function PharmaGuardDashboard() {
                                 {dropOpen && <>
                                     <div className="fixed inset-0 z-10" onClick={() => setDropOpen(false)} />
                                     <div className="absolute z-20 mt-2 w-full bg-[#0F1218] border border-[#334155] rounded-xl shadow-2xl max-h-56 overflow-y-auto">
-                                        {ALL_DRUGS.map(d => (
+                                        {allDrugs.map(d => (
                                             <button key={d} type="button" onClick={() => toggleDrug(d)}
                                                 className="w-full flex items-center justify-between px-4 py-2.5 text-sm text-[#cbd5e1] hover:bg-[#00F2AD]/10 hover:text-[#00F2AD] transition-colors text-left cursor-pointer">
                                                 {d} {selectedDrugs.includes(d) && <CheckCircle2 className="w-4 h-4 text-[#00F2AD]" />}
@@ -2,12 +2,37 @@ import os
 import uuid
 from datetime import datetime
 from typing import List, Optional, Dict, Tuple
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Query, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from pydantic import BaseModel
-import google.generativeai as genai
+
+# Sections 3-6 (CPIC tables, VCF parser, diplotype caller, risk engine) live in
+# backend/ so the Streamlit app runs on the same core engine as the API.
+from backend.pgx_engine import (
+    DRUG_GENE_MAP,
+    assess_drug_risk,
+)
+from backend.llm_engine import create_llm_model, generate_explanation
+from backend.parse_pool import (
+    INLINE_PARSE_MAX_BYTES, build_file_profile, build_merged_profile, profile_spooled, profile_vcf,
+    remove_spooled, shutdown_parse_pool, spool_to_disk,
+)
+from backend.vcf_merge import MAX_VCF_PARTS, VcfMergeError
+from backend.vcf_parser import VcfLimitError
+from backend.guidelines import GUIDELINE_VERSION, risk_matrix
+from backend.reports import matrix_report, quality_metrics
+from backend.drug_lexicon import MAX_COMPLETIONS, did_you_mean, normalize_drug, suggest_drugs
+from backend.profile_store import get_store
+from backend.population_stats import worker_counters
+from backend.result_encoding import (
+    JSON, MSGPACK, available_media_types, bulk_response, encoded_response, negotiate_encoding, negotiate_media_type,
+)
+from backend.admission import AdmissionMiddleware, admission_metrics
+from backend.cache import cache_metrics
+from backend.profiling import ProfilingMiddleware, is_profiling, load_profile, mark_phase, token_ok, traced
+from starlette.concurrency import run_in_threadpool
 
 # ==========================================
 # 0. LOAD ENVIRONMENT
@@ -26,6 +51,11 @@ app = FastAPI(title="PharmaGuard PGx API")
 async def root():
     return {"status": "PharmaGuard API is running successfully!"}
 
+@app.get("/health")
+async def health():
+    # Liveness probe: answered on the event loop, so slow responses mean a blocked loop
+    return {"status": "ok"}
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -34,8 +64,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY", "YOUR_API_KEY_HERE"))
-llm_model = genai.GenerativeModel('gemini-2.5-flash')
+# Opt-in per-request sampling profiler (see backend/profiling.py)
+app.add_middleware(ProfilingMiddleware, paths=("/api/v1/pgx/analyze", "/api/v1/pgx/matrix"))
+# Outermost: shed over-budget uploads before their body is read (see backend/admission.py)
+app.add_middleware(AdmissionMiddleware, paths=("/api/v1/pgx/analyze", "/api/v1/pgx/matrix", "/api/v1/pgx/verify"))
+
+llm_model = create_llm_model()
+
+@app.on_event("startup")
+async def _open_profile_store():
+    # Schema setup + guideline snapshot are blocking SQLite work: do them before
+    # serving, off the event loop, instead of inside the first request
+    await run_in_threadpool(get_store)
+
+@app.on_event("shutdown")
+def _shutdown_parse_pool():
+    shutdown_parse_pool()
 
 # ==========================================
 # 2. DTOs: EXACT JSON SCHEMA ENFORCEMENT
@@ -60,13 +104,42 @@ class ClinicalRecommendationDto(BaseModel):
 class LlmExplanationDto(BaseModel):
     summary: str
 
+class DistributionDto(BaseModel):
+    count: int
+    min: Optional[int] = None
+    max: Optional[int] = None
+    mean: Optional[float] = None
+    histogram: Dict[str, int]
+
+class GeneQcDto(BaseModel):
+    sites: int
+    passed: int
+    failed_filter: int
+    missing_calls: int
+    low_quality: int
+    depth: DistributionDto
+    genotype_quality: DistributionDto
+
+class SiteCoverageDto(BaseModel):
+    sites: int
+    covered: int
+    uncovered: List[str]
+
 class QualityMetricsDto(BaseModel):
     vcf_parsing_success: bool
+    total_variants: Optional[int] = None
+    qc_excluded_variants: Optional[int] = None
+    gene_qc: Optional[Dict[str, GeneQcDto]] = None
+    vcf_parts: Optional[int] = None
+    duplicate_sites_dropped: Optional[int] = None
+    defining_site_coverage: Optional[Dict[str, SiteCoverageDto]] = None
+    parse_errors: Optional[Dict[str, int]] = None
 
 class PgxAnalysisResponseDto(BaseModel):
     patient_id: str
     drug: str
     timestamp: str
+    guideline_version: str
     risk_assessment: RiskAssessmentDto
     pharmacogenomic_profile: PharmacogenomicProfileDto
     clinical_recommendation: ClinicalRecommendationDto
@@ -75,555 +148,91 @@ class PgxAnalysisResponseDto(BaseModel):
 
 
 # ==========================================
-# 3. CPIC STAR ALLELE FUNCTION TABLES
-# ==========================================
-
-# CYP2D6 Activity Scores (CPIC guideline)
-CYP2D6_ACTIVITY = {
-    "*1":  1.0,   # Normal function
-    "*2":  1.0,   # Normal function
-    "*3":  0.0,   # No function
-    "*4":  0.0,   # No function
-    "*5":  0.0,   # No function (gene deletion)
-    "*6":  0.0,   # No function
-    "*7":  0.0,   # No function
-    "*8":  0.0,   # No function
-    "*9":  0.5,   # Decreased function
-    "*10": 0.25,  # Decreased function
-    "*14": 1.0,   # Normal function
-    "*17": 0.5,   # Decreased function
-    "*29": 0.5,   # Decreased function
-    "*41": 0.5,   # Decreased function
-}
-
-# CYP2C19 Function Scores (CPIC guideline)
-CYP2C19_ACTIVITY = {
-    "*1":  1.0,   # Normal function
-    "*2":  0.0,   # No function (splice defect)
-    "*3":  0.0,   # No function (stop gained)
-    "*4":  0.0,   # No function (start lost)
-    "*5":  0.0,   # No function
-    "*6":  0.0,   # No function (frameshift)
-    "*7":  0.0,   # No function
-    "*8":  0.0,   # No function
-    "*9":  0.5,   # Decreased function
-    "*10": 0.5,   # Decreased function
-    "*17": 1.5,   # Increased function (promoter variant)
-}
-
-# CYP2C9 Function Scores (CPIC guideline)
-CYP2C9_ACTIVITY = {
-    "*1":  1.0,   # Normal function
-    "*2":  0.5,   # Decreased function
-    "*3":  0.0,   # No function
-    "*5":  0.0,   # No function
-    "*6":  0.0,   # No function
-    "*8":  0.5,   # Decreased function
-    "*11": 0.5,   # Decreased function
-    "*12": 0.5,   # Decreased function
-}
-
-# SLCO1B1 Function (CPIC guideline)
-SLCO1B1_ACTIVITY = {
-    "*1":  1.0,   # Normal function
-    "*1B": 1.0,   # Normal function (benign)
-    "*5":  0.0,   # Decreased function (521T>C, rs4149056)
-    "*15": 0.5,   # Decreased function
-    "*17": 0.0,   # Poor function
-}
-
-# DPYD Activity Score (CPIC guideline)
-DPYD_ACTIVITY = {
-    "*1":    1.0,   # Normal DPD activity
-    "*2A":   0.0,   # No DPD activity (IVS14+1G>A)
-    "*5":    0.5,   # Decreased activity
-    "*6":    0.5,   # Decreased activity
-    "*13":   0.5,   # Decreased activity
-}
-
-# TPMT Activity (CPIC guideline)
-TPMT_ACTIVITY = {
-    "*1":   1.0,   # Normal
-    "*2":   0.0,   # No function
-    "*3A":  0.0,   # No function
-    "*3B":  0.0,   # No function
-    "*3C":  0.0,   # No function
-    "*4":   0.0,   # No function
-}
-
-# Master gene→activity table
-GENE_ACTIVITY_TABLES = {
-    "CYP2D6":  CYP2D6_ACTIVITY,
-    "CYP2C19": CYP2C19_ACTIVITY,
-    "CYP2C9":  CYP2C9_ACTIVITY,
-    "SLCO1B1": SLCO1B1_ACTIVITY,
-    "DPYD":    DPYD_ACTIVITY,
-    "TPMT":    TPMT_ACTIVITY,
-}
-
-
-# ==========================================
-# 4. VCF PARSER — FULL CLINICAL EXTRACTION
-# ==========================================
-
-def parse_vcf_in_memory(vcf_content: bytes) -> Dict:
-    """Parse a clinical-grade VCF file completely in RAM.
-    Extracts structured variant data per gene including genotype, star allele,
-    functional consequence, CPIC level, and clinical significance."""
-
-    vcf_text = vcf_content.decode('utf-8', errors='ignore')
-    gene_variants: Dict[str, list] = {}
-    all_variants: List[dict] = []
-
-    for line in vcf_text.splitlines():
-        if line.startswith("#"):
-            continue
-
-        parts = line.split('\t')
-        if len(parts) < 10:
-            continue
-
-        chrom = parts[0]
-        pos = parts[1]
-        rsid = parts[2]
-        ref = parts[3]
-        alt = parts[4]
-        qual = parts[5]
-        filt = parts[6]
-        info_str = parts[7]
-        fmt = parts[8]
-        sample = parts[9]
-
-        # ── Parse INFO field ──
-        info = {}
-        for token in info_str.split(';'):
-            if '=' in token:
-                k, v = token.split('=', 1)
-                info[k] = v
-            else:
-                info[token] = True
-
-        # ── Parse FORMAT + SAMPLE fields ──
-        fmt_keys = fmt.split(':')
-        sample_vals = sample.split(':')
-        gt_data = dict(zip(fmt_keys, sample_vals))
-
-        genotype = gt_data.get('GT', '.')
-        read_depth = int(gt_data.get('DP', '0'))
-        geno_quality = int(gt_data.get('GQ', '0'))
-
-        # ── Extract key annotations ──
-        gene = info.get('GENE', info.get('gene', 'UNKNOWN'))
-        star = info.get('STAR', info.get('star', ''))
-        func = info.get('FUNC', info.get('func', ''))
-        cpic = info.get('CPIC', info.get('cpic', ''))
-        af_str = info.get('AF', '0')
-        clnsig = info.get('CLNSIG', info.get('clnsig', ''))
-
-        # Normalize star allele (ensure * prefix)
-        if star and not star.startswith('*'):
-            star = f'*{star}'
-
-        variant = {
-            'chrom': chrom,
-            'pos': pos,
-            'rsid': rsid if rsid != '.' else '',
-            'ref': ref,
-            'alt': alt,
-            'qual': qual,
-            'filter': filt,
-            'gene': gene,
-            'star': star,
-            'func': func,
-            'cpic': cpic,
-            'af': af_str,
-            'clnsig': clnsig,
-            'genotype': genotype,
-            'read_depth': read_depth,
-            'geno_quality': geno_quality,
-        }
-
-        # Group by gene
-        if gene not in gene_variants:
-            gene_variants[gene] = []
-        gene_variants[gene].append(variant)
-        all_variants.append(variant)
-
-    return {
-        'gene_variants': gene_variants,
-        'all_variants': all_variants,
-        'genes_found': list(gene_variants.keys()),
-        'total_count': len(all_variants),
-    }
-
-
-# ==========================================
-# 5. DIPLOTYPE CALLER — GENOTYPE-AWARE
-# ==========================================
-
-def _is_alt(gt: str) -> str:
-    """Classify genotype: 'hom_ref', 'het', 'hom_alt', or 'unknown'."""
-    gt_clean = gt.replace('|', '/')
-    if gt_clean in ('0/0', '0'):
-        return 'hom_ref'
-    elif gt_clean in ('0/1', '1/0'):
-        return 'het'
-    elif gt_clean in ('1/1',):
-        return 'hom_alt'
-    return 'unknown'
-
-
-def call_diplotype(gene: str, variants: list) -> Tuple[str, str, float]:
-    """Determine the diplotype for a gene from its observed variants.
-
-    Uses the star allele annotations and genotypes from the VCF.
-    Returns (diplotype_string, phenotype_string, activity_score).
-    """
-
-    activity_table = GENE_ACTIVITY_TABLES.get(gene, {})
-
-    # Collect non-reference star alleles
-    alt_alleles = []   # list of (star_allele, zygosity)
-    for v in variants:
-        zyg = _is_alt(v['genotype'])
-        star = v.get('star', '')
-        if not star:
-            continue
-
-        if zyg == 'het':
-            alt_alleles.append((star, 'het'))
-        elif zyg == 'hom_alt':
-            alt_alleles.append((star, 'hom'))
-
-    # ── Build diplotype ──
-    if not alt_alleles:
-        # All wild-type
-        allele1, allele2 = '*1', '*1'
-    else:
-        # Prioritize highest-impact (lowest activity) alleles
-        def allele_priority(item):
-            star, _ = item
-            return activity_table.get(star, 0.5)
-
-        alt_alleles_sorted = sorted(alt_alleles, key=allele_priority)
-
-        allele1 = '*1'
-        allele2 = '*1'
-
-        for star, zyg in alt_alleles_sorted:
-            if zyg == 'hom':
-                allele1 = star
-                allele2 = star
-                break  # Homozygous alt dominates
-            elif zyg == 'het':
-                if allele1 == '*1':
-                    allele1 = star
-                elif allele2 == '*1':
-                    allele2 = star
-                # Compound het — both already filled
-
-    # ── Calculate activity score ──
-    score1 = activity_table.get(allele1, 1.0)
-    score2 = activity_table.get(allele2, 1.0)
-    total_score = score1 + score2
-
-    # ── Determine phenotype from activity score ──
-    phenotype = _score_to_phenotype(gene, total_score)
-
-    diplotype_str = f"{allele1}/{allele2}"
-    return diplotype_str, phenotype, total_score
-
-
-def _score_to_phenotype(gene: str, score: float) -> str:
-    """Map total activity score to CPIC phenotype abbreviation.
-    PM=Poor Metabolizer, IM=Intermediate, NM=Normal, RM=Rapid, URM=Ultra-rapid."""
-
-    if gene == "CYP2D6":
-        if score > 2.25:
-            return "URM"
-        elif score >= 1.25:
-            return "NM"
-        elif score > 0:
-            return "IM"
-        else:
-            return "PM"
-
-    elif gene == "CYP2C19":
-        if score > 2.0:
-            return "URM"
-        elif score == 2.0:
-            return "RM"
-        elif score >= 1.0:
-            return "NM"
-        elif score > 0:
-            return "IM"
-        else:
-            return "PM"
-
-    elif gene in ("CYP2C9", "SLCO1B1", "DPYD", "TPMT"):
-        if score >= 2.0:
-            return "NM"
-        elif score > 0:
-            return "IM"
-        else:
-            return "PM"
-
-    # Fallback
-    if score >= 2.0:
-        return "NM"
-    elif score > 0:
-        return "IM"
-    return "PM"
-
-
-# ==========================================
-# 6. DRUG-GENE RISK ENGINE (CPIC-ALIGNED)
+# 7. CONTROLLER: API ENTRY POINT
 # ==========================================
 
-# Maps drug → primary gene it's affected by
-DRUG_GENE_MAP = {
-    "WARFARIN":      "CYP2C9",
-    "CLOPIDOGREL":   "CYP2C19",
-    "OMEPRAZOLE":    "CYP2C19",
-    "SERTRALINE":    "CYP2C19",
-    "CODEINE":       "CYP2D6",
-    "TAMOXIFEN":     "CYP2D6",
-    "ONDANSETRON":   "CYP2D6",
-    "SIMVASTATIN":   "SLCO1B1",
-    "FLUOROURACIL":  "DPYD",
-    "CAPECITABINE":  "DPYD",
-}
-
-def assess_drug_risk(drug: str, gene: str, phenotype: str, diplotype: str, activity_score: float):
-    """CPIC-aligned risk assessment based on drug + actual patient phenotype.
-    Phenotype codes: PM=Poor, IM=Intermediate, NM=Normal, RM=Rapid, URM=Ultra-rapid.
-    Returns (risk_label, severity, confidence, recommendation)."""
-
-    drug_upper = drug.upper().strip()
-
-    # ── WARFARIN / CYP2C9 ──
-    if drug_upper == "WARFARIN":
-        if phenotype == "PM":
-            return ("Toxic", "critical", 0.98,
-                    f"Patient is CYP2C9 {diplotype} (Poor Metabolizer). S-warfarin clearance reduced ~90%. "
-                    "Initiate at ≤ 1 mg/day. Monitor INR every 48h for 2 weeks. "
-                    "Consider Apixaban or Rivaroxaban. CPIC Grade A recommendation.")
-        elif phenotype == "IM":
-            return ("Adjust Dosage", "high", 0.94,
-                    f"Patient is CYP2C9 {diplotype} (Intermediate Metabolizer). S-warfarin clearance reduced ~40%. "
-                    "Reduce initial dose by 25-50%. Intensify INR monitoring for first 2 weeks. "
-                    "Target INR may be achieved at lower maintenance doses.")
-        else:
-            return ("Safe", "none", 0.92,
-                    f"Patient is CYP2C9 {diplotype} (Normal Metabolizer). Standard warfarin metabolism expected. "
-                    "Follow standard dosing nomogram. Routine INR monitoring applies.")
-
-    # ── CLOPIDOGREL / CYP2C19 ──
-    if drug_upper == "CLOPIDOGREL":
-        if phenotype == "PM":
-            return ("Toxic", "critical", 0.97,
-                    f"Patient is CYP2C19 {diplotype} (Poor Metabolizer). Active metabolite formation < 5%. "
-                    "Drug is therapeutically useless. Switch to Prasugrel 10mg or Ticagrelor 90mg BID. "
-                    "MACE risk elevated ~3.5× on standard clopidogrel.")
-        elif phenotype == "IM":
-            return ("Adjust Dosage", "high", 0.93,
-                    f"Patient is CYP2C19 {diplotype} (Intermediate Metabolizer). Reduced clopidogrel activation. "
-                    "Consider alternative P2Y12 inhibitor (Prasugrel or Ticagrelor). "
-                    "If clopidogrel is continued, consider higher loading dose with platelet function testing.")
-        elif phenotype in ("URM", "RM"):
-            return ("Safe", "none", 0.90,
-                    f"Patient is CYP2C19 {diplotype} (Rapid/Ultra-rapid Metabolizer). Enhanced clopidogrel activation. "
-                    "Standard or potentially enhanced antiplatelet effect. Monitor for bleeding signs.")
-        else:
-            return ("Safe", "none", 0.91,
-                    f"Patient is CYP2C19 {diplotype} (Normal Metabolizer). Normal clopidogrel metabolism. "
-                    "Standard 75mg daily dosing appropriate. No pharmacogenomic adjustment needed.")
-
-    # ── OMEPRAZOLE / CYP2C19 ──
-    if drug_upper == "OMEPRAZOLE":
-        if phenotype in ("URM", "RM"):
-            return ("Adjust Dosage", "moderate", 0.91,
-                    f"Patient is CYP2C19 {diplotype} (Rapid/Ultra-rapid Metabolizer). Omeprazole cleared ~40% faster. "
-                    "Increase dose to 40mg BID or switch to rabeprazole (less CYP2C19-dependent). "
-                    "Verify H. pylori eradication with urea breath test at 4 weeks.")
-        elif phenotype == "IM":
-            return ("Safe", "none", 0.89,
-                    f"Patient is CYP2C19 {diplotype} (Intermediate Metabolizer). Mildly increased omeprazole exposure. "
-                    "Standard dosing appropriate. May see slightly enhanced acid suppression.")
-        elif phenotype == "PM":
-            return ("Adjust Dosage", "moderate", 0.93,
-                    f"Patient is CYP2C19 {diplotype} (Poor Metabolizer). Omeprazole AUC increased 3-7×. "
-                    "Consider 50% dose reduction for long-term use. Monitor for hypomagnesemia.")
-        else:
-            return ("Safe", "none", 0.88,
-                    f"Patient is CYP2C19 {diplotype} (Normal Metabolizer). Standard omeprazole metabolism. "
-                    "No dosage adjustment required.")
-
-    # ── SERTRALINE / CYP2C19 ──
-    if drug_upper == "SERTRALINE":
-        if phenotype == "PM":
-            return ("Adjust Dosage", "moderate", 0.87,
-                    f"Patient is CYP2C19 {diplotype} (Poor Metabolizer). Sertraline exposure increased ~40%. "
-                    "Consider 50% dose reduction. Monitor for serotonergic side effects. "
-                    "Escitalopram is an alternative with less CYP2C19 dependence.")
-        elif phenotype in ("URM", "RM"):
-            return ("Adjust Dosage", "low", 0.85,
-                    f"Patient is CYP2C19 {diplotype} (Rapid/Ultra-rapid Metabolizer). Faster sertraline clearance. "
-                    "May need dose increase if subtherapeutic response. Monitor at 4-6 weeks.")
-        else:
-            return ("Safe", "none", 0.92,
-                    f"Patient is CYP2C19 {diplotype} (Normal Metabolizer). Standard sertraline metabolism. "
-                    "No dosage adjustment required. Standard prescribing guidelines apply.")
-
-    # ── CODEINE / CYP2D6 ──
-    if drug_upper == "CODEINE":
-        if phenotype == "URM":
-            return ("Toxic", "critical", 0.96,
-                    f"Patient is CYP2D6 {diplotype} (Ultra-rapid Metabolizer). Ultra-rapid O-demethylation produces "
-                    "dangerously high morphine levels (50-75% above expected). Avoid codeine entirely. "
-                    "Use non-opioid analgesics. FDA Black Box Warning applies.")
-        elif phenotype == "PM":
-            return ("Adjust Dosage", "high", 0.95,
-                    f"Patient is CYP2D6 {diplotype} (Poor Metabolizer). Cannot convert codeine to morphine. "
-                    "Drug is therapeutically ineffective for analgesia. "
-                    "Use alternative analgesics (tramadol is also CYP2D6-dependent — avoid).")
-        elif phenotype == "IM":
-            return ("Adjust Dosage", "moderate", 0.90,
-                    f"Patient is CYP2D6 {diplotype} (Intermediate Metabolizer). Reduced morphine formation. "
-                    "May experience suboptimal analgesia. Consider non-opioid alternatives. "
-                    "If codeine used, monitor effectiveness closely.")
-        else:
-            return ("Safe", "none", 0.89,
-                    f"Patient is CYP2D6 {diplotype} (Normal Metabolizer). Normal codeine-to-morphine conversion. "
-                    "Standard dosing appropriate. Monitor for standard opioid side effects.")
-
-    # ── TAMOXIFEN / CYP2D6 ──
-    if drug_upper == "TAMOXIFEN":
-        if phenotype == "PM":
-            return ("Toxic", "high", 0.94,
-                    f"Patient is CYP2D6 {diplotype} (Poor Metabolizer). Cannot convert tamoxifen to endoxifen. "
-                    "Therapeutic efficacy severely compromised. Switch to aromatase inhibitor "
-                    "(anastrozole, letrozole) in postmenopausal patients.")
-        elif phenotype == "IM":
-            return ("Adjust Dosage", "moderate", 0.89,
-                    f"Patient is CYP2D6 {diplotype} (Intermediate Metabolizer). Reduced endoxifen formation (~40% of normal). "
-                    "Standard dose acceptable with therapeutic drug monitoring. "
-                    "Measure endoxifen at 3 months; if < 5.97 ng/mL, consider aromatase inhibitor switch.")
-        else:
-            return ("Safe", "none", 0.87,
-                    f"Patient is CYP2D6 {diplotype} (Normal Metabolizer). Normal tamoxifen-to-endoxifen conversion. "
-                    "Standard dosing appropriate. Routine endoxifen monitoring optional.")
-
-    # ── ONDANSETRON / CYP2D6 ──
-    if drug_upper == "ONDANSETRON":
-        if phenotype == "URM":
-            return ("Adjust Dosage", "moderate", 0.85,
-                    f"Patient is CYP2D6 {diplotype} (Ultra-rapid Metabolizer). May have reduced ondansetron efficacy. "
-                    "Consider increased dose or alternative anti-emetic (granisetron).")
-        else:
-            return ("Safe", "none", 0.85,
-                    f"Patient is CYP2D6 {diplotype} ({phenotype}). Ondansetron exposure within therapeutic window. "
-                    "Anti-emetic efficacy preserved. Standard 4-8mg dosing appropriate.")
-
-    # ── SIMVASTATIN / SLCO1B1 ──
-    if drug_upper == "SIMVASTATIN":
-        if phenotype == "PM":
-            return ("Toxic", "high", 0.95,
-                    f"Patient is SLCO1B1 {diplotype} (Poor Function). Plasma simvastatin acid AUC increased ~3-fold. "
-                    "High risk of myopathy/rhabdomyolysis. Avoid simvastatin or limit to ≤ 20 mg/day. "
-                    "Prefer Rosuvastatin or Pravastatin (OATP1B1-independent).")
-        elif phenotype == "IM":
-            return ("Adjust Dosage", "moderate", 0.94,
-                    f"Patient is SLCO1B1 {diplotype} (Intermediate Function). Reduced hepatic uptake transporter activity. "
-                    "Limit simvastatin to ≤ 20 mg/day. Monitor CK levels at 4 and 12 weeks. "
-                    "Consider alternative statins if higher doses needed.")
-        else:
-            return ("Safe", "none", 0.90,
-                    f"Patient is SLCO1B1 {diplotype} (Normal Function). Normal hepatic statin uptake. "
-                    "Standard simvastatin dosing appropriate up to 40-80 mg/day.")
-
-    # ── FLUOROURACIL / DPYD ──
-    if drug_upper == "FLUOROURACIL":
-        if phenotype == "PM":
-            return ("Toxic", "critical", 0.99,
-                    f"Patient is DPYD {diplotype} (DPD Deficient). CONTRAINDICATED. Zero DPD activity causes "
-                    "fatal 5-FU accumulation with grade 4 mucositis, neutropenia, and neurotoxicity. "
-                    "Use irinotecan-based or platinum-based alternatives. Refer to oncology PGx board.")
-        elif phenotype == "IM":
-            return ("Adjust Dosage", "high", 0.96,
-                    f"Patient is DPYD {diplotype} (Intermediate DPD Activity). Reduced DPD activity increases 5-FU toxicity risk. "
-                    "Reduce starting dose by 25-50%. Intensive monitoring for toxicity required. "
-                    "Dose escalation only if tolerated after first cycle.")
-        else:
-            return ("Safe", "none", 0.93,
-                    f"Patient is DPYD {diplotype} (Normal DPD Activity). Normal DPD-mediated 5-FU catabolism. "
-                    "Standard dosing per BSA-based nomogram. Routine toxicity monitoring applies.")
-
-    # ── CAPECITABINE / DPYD ──
-    if drug_upper == "CAPECITABINE":
-        if phenotype == "PM":
-            return ("Toxic", "critical", 0.99,
-                    f"Patient is DPYD {diplotype} (DPD Deficient). CONTRAINDICATED. Capecitabine is a 5-FU prodrug. "
-                    "Zero DPD activity produces identical lethal toxicity profile as direct 5-FU. "
-                    "Use alternative chemotherapy regimens. Discuss with oncology tumor board.")
-        elif phenotype == "IM":
-            return ("Adjust Dosage", "high", 0.96,
-                    f"Patient is DPYD {diplotype} (Intermediate DPD Activity). Reduced DPD activity. "
-                    "Reduce capecitabine starting dose by 25-50%. Monitor closely for hand-foot syndrome, "
-                    "diarrhea, and myelosuppression.")
-        else:
-            return ("Safe", "none", 0.93,
-                    f"Patient is DPYD {diplotype} (Normal DPD Activity). Normal DPD activity confirmed. "
-                    "Standard capecitabine dosing appropriate.")
+async def _compact_profile(uploads: List[UploadFile], genes: Tuple[str, ...]) -> Dict:
+    """Compact profile (backend/parse_pool.py) of one upload, or of several parts
+    of the same patient stream-merged."""
+    files = [u.file for u in uploads]
+    names = [u.filename for u in uploads]
+    if is_profiling():
+        # Keep the parse in-process so the sampler can see it; read straight from the upload spool
+        mark_phase("parse")
+        if len(uploads) > 1:
+            return await run_in_threadpool(traced(build_merged_profile), files, genes, names)
+        return await run_in_threadpool(traced(build_file_profile), files[0], genes)
+    size = uploads[0].size
+    if len(uploads) == 1 and size is not None and size <= INLINE_PARSE_MAX_BYTES:
+        file_content = await uploads[0].read()
+        mark_phase("parse")
+        return await profile_vcf(file_content, genes)
+    # Large or multi-part: the pool reads named copies line by line, never the whole upload
+    paths, digest = await run_in_threadpool(spool_to_disk, files)
+    try:
+        mark_phase("parse")
+        return await profile_spooled(paths, digest, genes, names)
+    finally:
+        await run_in_threadpool(remove_spooled, paths)
 
-    # ── DEFAULT ──
-    return ("Safe", "none", 0.50,
-            f"No CPIC guideline match for {drug} / {gene}. Standard dosing recommended. "
-            "Consult clinical pharmacist if concerns exist.")
 
+def _unresolved_drug(name: str) -> Optional[JSONResponse]:
+    """400 with suggestions for a drug name that does not resolve but is close
+    to one that does; None if nothing is close (an unsupported drug)."""
+    suggestions = did_you_mean(name)
+    if not suggestions:
+        return None
+    return JSONResponse(status_code=400, content={
+        "detail": f"Unrecognized drug {name.strip()!r}. Did you mean: {', '.join(suggestions)}?",
+        "suggestions": suggestions,
+    })
 
-# ==========================================
-# 7. CONTROLLER: API ENTRY POINT
-# ==========================================
 
 @app.post("/api/v1/pgx/analyze", response_model=PgxAnalysisResponseDto)
 async def analyze_patient_data(
     file: Optional[UploadFile] = File(None),
-    drug: Optional[str] = Form(None)
+    drug: Optional[str] = Form(None),
+    files: Optional[List[UploadFile]] = File(None)
 ):
+    # `files` (repeatable) carries further VCF parts of the same patient, e.g.
+    # per-chromosome outputs; they are stream-merged instead of concatenated.
+    uploads = ([file] if file else []) + list(files or [])
+
     # ── Input validation ──
-    if not file and not drug:
+    if not uploads and not drug:
         return JSONResponse(status_code=400, content={"detail": "Both VCF file and drug name are required."})
-    if not file:
+    if not uploads:
         return JSONResponse(status_code=400, content={"detail": "Upload genome file."})
     if not drug:
         return JSONResponse(status_code=400, content={"detail": "Input drug name."})
+    if len(uploads) > MAX_VCF_PARTS:
+        return JSONResponse(status_code=400, content={"detail": f"At most {MAX_VCF_PARTS} VCF parts per patient."})
+
+    # ── 1. Identify the primary gene for this drug ──
+    # Brand names, salts, strengths and abbreviations resolve to the generic;
+    # near misses are never guessed ("Esomeprazole" is not omeprazole)
+    drug_upper = normalize_drug(drug)
+    if drug_upper is None:
+        unresolved = _unresolved_drug(drug)
+        if unresolved is not None:
+            return unresolved
+        drug_upper = drug.upper().strip()
 
     try:
-        # ── 1. Parse VCF in memory ──
-        file_content = await file.read()
-        parsed = parse_vcf_in_memory(file_content)
-        gene_variants = parsed['gene_variants']
-        all_variants = parsed['all_variants']
-
-        # ── 2. Identify the primary gene for this drug ──
-        drug_upper = drug.upper().strip()
         primary_gene = DRUG_GENE_MAP.get(drug_upper, "UNKNOWN")
 
-        # ── 3. Call diplotype from patient's actual genotype data ──
-        if primary_gene in gene_variants:
-            gene_vars = gene_variants[primary_gene]
-            diplotype, phenotype, activity_score = call_diplotype(primary_gene, gene_vars)
-        else:
-            # Gene not found in VCF — assume wild-type
-            diplotype = "*1/*1"
-            phenotype = _score_to_phenotype(primary_gene, 2.0)
-            activity_score = 2.0
-            gene_vars = []
+        # ── 2-3. Parse VCF + call diplotypes (large uploads off the event loop) ──
+        compact = await _compact_profile(uploads, (primary_gene,))
+        gene_profile = compact['profiles'][primary_gene]
+        diplotype = gene_profile['diplotype']
+        phenotype = gene_profile['phenotype']
+        activity_score = gene_profile['activity_score']
+        gene_vars = gene_profile['variants']
 
         # ── 4. Assess drug risk based on actual phenotype ──
+        mark_phase("assess")
         risk_label, severity, confidence, recommendation = assess_drug_risk(
-            drug, primary_gene, phenotype, diplotype, activity_score
+            drug_upper, primary_gene, phenotype, diplotype, activity_score
         )
 
         # ── 5. Build detected variants list (for the primary gene) ──
@@ -634,43 +243,35 @@ async def analyze_patient_data(
             ))
 
         # ── 6. Generate AI explanation using Gemini ──
-        prompt = f"""Act as a Pharmacogenomics AI Assistant providing a clinical report.
-
-Patient Pharmacogenomic Data:
-- Drug: {drug}
-- Primary Gene: {primary_gene}
-- Diplotype: {diplotype}
-- Phenotype: {phenotype}
-- Activity Score: {activity_score}
-- Risk Level: {risk_label} (Severity: {severity})
-- Detected Variants (genotypes from VCF):
-{chr(10).join(f"  - {v.get('rsid','.')} ({v.get('star','?')}) GT={v.get('genotype','.')} FUNC={v.get('func','?')} CLNSIG={v.get('clnsig','?')}" for v in gene_vars[:10])}
-
-Clinical Recommendation: {recommendation}
-
-Based on the above pharmacogenomic profile, provide a concise 3-sentence explanation:
-- Sentence 1: Explain what the patient's {primary_gene} {diplotype} genotype means at the molecular level, referencing the activity score of {activity_score}.
-- Sentence 2: Explain how this specific genotype affects {drug}'s metabolism, efficacy, or safety.
-- Sentence 3: State the clinical action required.
-Be precise. Reference the actual diplotype and phenotype. Do not invent data."""
-
-        try:
-            llm_response = llm_model.generate_content(prompt)
-            llm_text = llm_response.text.strip() if llm_response and llm_response.text else "AI explanation unavailable."
-        except Exception:
-            llm_text = (
-                f"The patient's {primary_gene} genotype is {diplotype}, classified as {phenotype} "
-                f"with an activity score of {activity_score}. "
-                f"For {drug}, this means: {recommendation}"
-            )
+        mark_phase("llm_wait")
+        llm_text = await run_in_threadpool(
+            traced(generate_explanation), llm_model, drug_upper, primary_gene, diplotype, phenotype, activity_score,
+            risk_label, severity, recommendation, gene_vars
+        )
 
         # ── 7. Return structured response ──
         patient_id = f"PG-{uuid.uuid4().hex[:8].upper()}"
 
+        results = [{'drug': drug_upper, 'gene': primary_gene, 'diplotype': diplotype, 'phenotype': phenotype,
+                    'risk_label': risk_label, 'severity': severity, 'confidence': confidence,
+                    'recommendation': recommendation}]
+        store = get_store()
+        if store is not None:
+            # Also increments the shared population counters
+            mark_phase("store")
+            await run_in_threadpool(
+                traced(store.record_analysis), patient_id, compact['profiles'], results,
+                ", ".join(u.filename or "upload.vcf" for u in uploads),
+            )
+        else:
+            worker_counters.observe(compact['profiles'], results)
+
+        mark_phase("respond")
         return PgxAnalysisResponseDto(
             patient_id=patient_id,
-            drug=drug.strip(),
+            drug=drug_upper,
             timestamp=datetime.utcnow().isoformat() + "Z",
+            guideline_version=GUIDELINE_VERSION,
             risk_assessment=RiskAssessmentDto(
                 risk_label=risk_label,
                 confidence_score=confidence,
@@ -688,15 +289,206 @@ Be precise. Reference the actual diplotype and phenotype. Do not invent data."""
             llm_generated_explanation=LlmExplanationDto(
                 summary=llm_text
             ),
-            quality_metrics=QualityMetricsDto(
-                vcf_parsing_success=len(all_variants) > 0
-            )
+            quality_metrics=QualityMetricsDto(**quality_metrics(compact, len(uploads)))
         )
 
+    except VcfMergeError as e:
+        return JSONResponse(status_code=400, content={"detail": f"Incompatible VCF parts: {e}"})
+    except VcfLimitError as e:
+        return JSONResponse(status_code=400, content={"detail": f"VCF exceeds parser limits: {e}"})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": str(e)})
+
+
+@app.post("/api/v1/pgx/matrix")
+async def analyze_risk_matrix(
+    file: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+    drugs: Optional[str] = Form(None),
+    explain: bool = Form(False),
+    record: bool = Form(True),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+) -> Response:
+    """Every supported drug (or the comma-separated `drugs`) against the patient's
+    pharmacogene profile from one upload, as a columnar drug x gene matrix: the
+    profile of every gene, and one cell per drug at its guideline gene (no other
+    pairs have a rule). `cells.*[i]` belongs to `drugs[i]`, `cells.gene[i]`
+    indexes `genes`. No LLM
+    text unless `explain` is set; `record=false` skips storing/counting the patient
+    (for a follow-up request on the same upload). JSON or MessagePack by Accept."""
+    uploads = ([file] if file else []) + list(files or [])
+    if not uploads:
+        return JSONResponse(status_code=400, content={"detail": "Upload genome file."})
+    if len(uploads) > MAX_VCF_PARTS:
+        return JSONResponse(status_code=400, content={"detail": f"At most {MAX_VCF_PARTS} VCF parts per patient."})
+    media_type = negotiate_media_type(accept, allowed=(JSON, MSGPACK))
+    if media_type is None:
+        return JSONResponse(status_code=406, content={"detail": "Supported formats: application/json, "
+                                                                "application/msgpack."})
+
+    # Requested drugs, resolved like /analyze; unsupported ones are reported, not evaluated
+    requested: Dict[str, str] = {}
+    unsupported = []
+    for name in (drugs or "").split(","):
+        name = name.strip()
+        if name:
+            key = normalize_drug(name)
+            if key is not None:
+                requested.setdefault(key, name)
+                continue
+            unresolved = _unresolved_drug(name)
+            if unresolved is not None:
+                return unresolved
+            unsupported.append(name)
+    if drugs and not requested:
+        return JSONResponse(status_code=400, content={"detail": "None of the requested drugs are supported."})
+
+    try:
+        compact = await _compact_profile(uploads, ())
+
+        mark_phase("assess")
+        rows = risk_matrix(compact['profiles'], list(requested))
+
+        explanations = None
+        if explain:
+            # One at a time, like the dashboard used to, to respect LLM rate limits
+            mark_phase("llm_wait")
+            explanations = []
+            for r in rows:
+                explanations.append(await run_in_threadpool(
+                    traced(generate_explanation), llm_model, r['drug'], r['gene'],
+                    r['diplotype'], r['phenotype'], r['activity_score'], r['risk_label'], r['severity'],
+                    r['recommendation'], compact['profiles'][r['gene']]['variants'],
+                ))
+
+        patient_id = f"PG-{uuid.uuid4().hex[:8].upper()}"
+        store = get_store() if record else None
+        if store is not None:
+            mark_phase("store")
+            await run_in_threadpool(
+                traced(store.record_analysis), patient_id, compact['profiles'], rows,
+                ", ".join(u.filename or "upload.vcf" for u in uploads),
+            )
+        elif record:
+            worker_counters.observe(compact['profiles'], rows)
+
+        mark_phase("respond")
+        payload = {
+            "patient_id": patient_id,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "guideline_version": GUIDELINE_VERSION,
+            **matrix_report(compact, rows, explanations,
+                            [requested[r['drug']] for r in rows] if requested else None),
+            "unsupported_drugs": unsupported,
+            "quality_metrics": quality_metrics(compact, len(uploads)),
+        }
+        return encoded_response(payload, media_type, negotiate_encoding(accept_encoding))
+
+    except VcfMergeError as e:
+        return JSONResponse(status_code=400, content={"detail": f"Incompatible VCF parts: {e}"})
+    except VcfLimitError as e:
+        return JSONResponse(status_code=400, content={"detail": f"VCF exceeds parser limits: {e}"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": str(e)})
 
 
+@app.get("/api/v1/pgx/drugs")
+async def autocomplete_drugs(
+    q: str = Query("", max_length=100),
+    limit: int = Query(MAX_COMPLETIONS, ge=1, le=50)
+):
+    """Drug autocomplete over generics, brand names, salts and abbreviations.
+    An empty query lists every supported drug."""
+    return {"query": q, "results": list(suggest_drugs(q, limit))}
+
+
+@app.get("/api/v1/pgx/metrics")
+async def get_metrics():
+    """Per-worker operational counters (admission budgets and usage, cache hit/miss)."""
+    return {"pid": os.getpid(), "admission": admission_metrics(), "cache": await run_in_threadpool(cache_metrics)}
+
+
+@app.get("/api/v1/pgx/stats")
+async def get_population_stats():
+    """Phenotype / diplotype frequencies per gene and risk-label counts per drug
+    over every analyzed patient, read from incrementally maintained counters."""
+    store = get_store()
+    if store is not None:
+        counters, scope = await run_in_threadpool(store.population_counts), "store"
+    else:
+        counters, scope = worker_counters, f"worker:{os.getpid()}"
+    return {"scope": scope, "guideline_version": GUIDELINE_VERSION, **counters.to_json()}
+
+
+MAX_RESULTS_PAGE = int(os.getenv("PGX_RESULTS_MAX_PAGE", 10000))
+
+
+def _stored_result_item(row: Dict) -> Dict:
+    # PgxAnalysisResponseDto nesting for the fields the store keeps (no detected_variants,
+    # llm_generated_explanation or quality_metrics); built from trusted rows without re-validation
+    return {
+        "patient_id": row["patient_id"],
+        "drug": row["drug"],
+        "timestamp": row["updated"],
+        "guideline_version": row["guideline_version"],
+        "risk_assessment": {
+            "risk_label": row["risk_label"],
+            "confidence_score": row["confidence"],
+            "severity": row["severity"],
+        },
+        "pharmacogenomic_profile": {
+            "primary_gene": row["gene"],
+            "diplotype": row["diplotype"],
+            "phenotype": row["phenotype"],
+        },
+        "clinical_recommendation": {"recommendation": row["recommendation"]},
+    }
+
+
+@app.get("/api/v1/pgx/results")
+async def list_stored_results(
+    drug: Optional[str] = Query(None, max_length=100),
+    gene: Optional[str] = Query(None, max_length=20),
+    after: Optional[str] = Query(None, max_length=200),
+    limit: int = Query(1000, ge=1, le=MAX_RESULTS_PAGE),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(json|ndjson|msgpack)$"),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+) -> Response:
+    """Page through stored results (cohort export). JSON, NDJSON or MessagePack
+    by Accept / ?format=, gzip or zstd by Accept-Encoding; pass `next_after`
+    back as `after` for the next page."""
+    store = get_store()
+    if store is None:
+        return JSONResponse(status_code=404, content={"detail": "Result store is not enabled."})
+    media_type = negotiate_media_type(accept, fmt)
+    if media_type is None:
+        return JSONResponse(status_code=406, content={
+            "detail": f"Supported formats: {', '.join(available_media_types())}."})
+    cursor = tuple(after.split("|", 1)) if after and "|" in after else None
+    drug_upper = (normalize_drug(drug) or drug.upper().strip()) if drug else None
+
+    rows = await run_in_threadpool(store.list_results, drug_upper, gene and gene.upper(), cursor, limit)
+    meta = {
+        "count": len(rows),
+        "next_after": f"{rows[-1]['patient_id']}|{rows[-1]['drug']}" if len(rows) == limit else None,
+    }
+    items = [_stored_result_item(r) for r in rows]
+    return await run_in_threadpool(bulk_response, items, meta, media_type, negotiate_encoding(accept_encoding))
+
+
+@app.get("/api/v1/pgx/profiles/{profile_id}")
+async def get_request_profile(profile_id: str, x_pgx_profile: Optional[str] = Header(None)):
+    """Folded-stack profile of a request sent with the profiling flag."""
+    if not token_ok(x_pgx_profile):
+        return JSONResponse(status_code=403, content={"detail": "Invalid profiling token."})
+    folded = load_profile(profile_id)
+    if folded is None:
+        return JSONResponse(status_code=404, content={"detail": "Profile not found."})
+    return PlainTextResponse(folded)
+
+
 # ==========================================
 # 8. SCHEMA VERIFICATION PANEL
 # ==========================================
@@ -705,6 +497,7 @@ EXPECTED_SCHEMA = {
     "patient_id": "PG-XXXXXXXX",
     "drug": "DRUG_NAME",
     "timestamp": "ISO8601_timestamp",
+    "guideline_version": "CPIC-YYYY.MM+digest",
     "risk_assessment": {
         "risk_label": "Safe|Adjust Dosage|Toxic",
         "confidence_score": 0.0,
@@ -723,7 +516,20 @@ EXPECTED_SCHEMA = {
         "summary": "..."
     },
     "quality_metrics": {
-        "vcf_parsing_success": True
+        "vcf_parsing_success": True,
+        "total_variants": 0,
+        "qc_excluded_variants": 0,
+        "gene_qc": {
+            "GENE_SYMBOL": {
+                "sites": 0, "passed": 0, "failed_filter": 0, "missing_calls": 0, "low_quality": 0,
+                "depth": {"count": 0, "min": 0, "max": 0, "mean": 0.0, "histogram": {"0-9": 0}},
+                "genotype_quality": {"count": 0, "min": 0, "max": 0, "mean": 0.0, "histogram": {"0-9": 0}}
+            }
+        },
+        "vcf_parts": 1,
+        "duplicate_sites_dropped": 0,
+        "defining_site_coverage": {"GENE_SYMBOL": {"sites": 0, "covered": 0, "uncovered": ["rsXXXX"]}},
+        "parse_errors": {"bad_dp": 0}
     }
 }
 
@@ -741,7 +547,8 @@ async def get_expected_schema():
 @app.post("/api/v1/pgx/verify")
 async def verify_json_format(
     file: Optional[UploadFile] = File(None),
-    drug: Optional[str] = Form(None)
+    drug: Optional[str] = Form(None),
+    files: Optional[List[UploadFile]] = File(None)
 ):
     """Run analysis and then verify the JSON output matches the expected schema.
     Returns the analysis result plus a verification report."""
@@ -760,13 +567,16 @@ async def verify_json_format(
     temp_file = StarletteUpload(
         filename=file.filename or "upload.vcf",
         file=BytesIO(file_content),
+        size=len(file_content),
         headers=Headers({"content-type": "application/octet-stream"})
     )
 
     # Call the analyze endpoint logic
-    result = await analyze_patient_data(file=temp_file, drug=drug)
+    result = await analyze_patient_data(file=temp_file, drug=drug, files=files)
 
-    # Convert Pydantic model to dict
+    # Convert Pydantic model to dict; errors (e.g. an unrecognized drug) pass through
+    if isinstance(result, Response):
+        return result
     if hasattr(result, 'model_dump'):
         result_dict = result.model_dump()
     elif hasattr(result, 'dict'):
@@ -786,7 +596,7 @@ async def verify_json_format(
         })
 
     # Top-level keys
-    required_keys = ["patient_id", "drug", "timestamp", "risk_assessment",
+    required_keys = ["patient_id", "drug", "timestamp", "guideline_version", "risk_assessment",
                      "pharmacogenomic_profile", "clinical_recommendation",
                      "llm_generated_explanation", "quality_metrics"]
     for key in required_keys:
@@ -846,10 +656,13 @@ async def verify_json_format(
     check("quality.vcf_parsing_success", isinstance(qm.get("vcf_parsing_success"), bool),
           "boolean", type(qm.get("vcf_parsing_success")).__name__)
 
+    check("quality.gene_qc", isinstance(qm.get("gene_qc"), dict),
+          "per-gene QC object", type(qm.get("gene_qc")).__name__)
+
     # No extra keys in quality_metrics
-    qm_extra = [k for k in qm.keys() if k != "vcf_parsing_success"]
+    qm_extra = [k for k in qm.keys() if k not in EXPECTED_SCHEMA["quality_metrics"]]
     check("quality.no_extra_fields", len(qm_extra) == 0,
-          "only vcf_parsing_success", f"extra: {qm_extra}" if qm_extra else "only vcf_parsing_success")
+          "only documented QC fields", f"extra: {qm_extra}" if qm_extra else "only documented QC fields")
 
     # Summary
     total = len(checks)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Benchmark encoding of a large results payload.
+
+Builds N synthetic results shaped like PgxAnalysisResponseDto and times:
+
+    validated   per-item DTO validation + jsonable_encoder + json.dumps
+                (what a `response_model=List[PgxAnalysisResponseDto]` endpoint does)
+    trusted     the same dicts through backend.result_encoding, for each available
+                format (json / ndjson / msgpack) and compression (none / gzip / zstd)
+
+    python scripts/bench_results.py                 # 10k results, best of 5
+    python scripts/bench_results.py --results 50000 --repeats 3
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from backend import result_encoding as enc  # noqa: E402
+from main import PgxAnalysisResponseDto  # noqa: E402
+
+GENES = {"CYP2C19": "CLOPIDOGREL", "CYP2C9": "WARFARIN", "CYP2D6": "CODEINE",
+         "TPMT": "AZATHIOPRINE", "DPYD": "FLUOROURACIL", "SLCO1B1": "SIMVASTATIN"}
+
+
+def make_results(n: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        gene = rng.choice(list(GENES))
+        out.append({
+            "patient_id": f"PG-{i:08X}",
+            "drug": GENES[gene],
+            "timestamp": "2026-10-19T12:00:00Z",
+            "guideline_version": "CPIC-2026.02+35c516356c03",
+            "risk_assessment": {"risk_label": rng.choice(["Safe", "Adjust Dosage", "Toxic"]),
+                                "confidence_score": 0.95, "severity": rng.choice(["none", "moderate", "high"])},
+            "pharmacogenomic_profile": {
+                "primary_gene": gene, "diplotype": rng.choice(["*1/*1", "*1/*2", "*2/*2", "*4/*1"]),
+                "phenotype": rng.choice(["NM", "IM", "PM"]),
+                "detected_variants": [{"rsid": f"rs{rng.randrange(10**6, 10**8)}"} for _ in range(rng.randrange(4))],
+            },
+            "clinical_recommendation": {"recommendation": "Use standard dosing per CPIC guidelines. " * 2},
+            "llm_generated_explanation": {"summary": "The patient's diplotype predicts normal enzyme activity. " * 4},
+            "quality_metrics": {"vcf_parsing_success": True, "total_variants": rng.randrange(10, 5000),
+                                "qc_excluded_variants": rng.randrange(5)},
+        })
+    return out
+
+
+def best_of(repeats: int, fn: Callable[[], bytes]):
+    best, size = float("inf"), 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - t0)
+    return best, size
+
+
+def validated(items: List[Dict]) -> bytes:
+    models = [PgxAnalysisResponseDto.model_validate(item) for item in items]
+    return json.dumps(jsonable_encoder(models)).encode("utf-8")
+
+
+def trusted(items: List[Dict], media_type: str, encoding) -> Callable[[], bytes]:
+    def run() -> bytes:
+        if media_type == enc.NDJSON:
+            return b"".join(enc.ndjson_stream(items, encoding))
+        return enc.bulk_response(items, {"count": len(items)}, media_type, encoding).body
+    return run
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark bulk result encoding.")
+    parser.add_argument("--results", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    items = make_results(args.results, args.seed)
+    print(f"{args.results} results; orjson={'yes' if enc.orjson else 'no'} "
+          f"msgpack={'yes' if enc.msgpack else 'no'} zstd={'yes' if enc.zstandard else 'no'}")
+
+    base, base_size = best_of(args.repeats, lambda: validated(items))
+    print(f"{'validated json':<24} {base * 1000:8.1f} ms  {base_size / 1024:9.0f} KiB   1.0x")
+    for media_type in enc.available_media_types():
+        for encoding in [None, *enc.available_encodings()]:
+            t, size = best_of(args.repeats, trusted(items, media_type, encoding))
+            label = f"{media_type.split('/')[-1]}+{encoding or 'identity'}"
+            print(f"{label:<24} {t * 1000:8.1f} ms  {size / 1024:9.0f} KiB  {base / t:5.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
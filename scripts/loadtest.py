@@ -0,0 +1,494 @@
+"""PharmaGuard load generator.
+
+Drives the PGx API with a mix of real (sample_data/) and synthetic VCF uploads
+at a fixed concurrency and an optional target request rate, then writes a JSON
+report (throughput, latency percentiles, error rate, server RSS over time) that
+can be diffed between commits.
+
+Usage:
+    python scripts/loadtest.py --start-server --duration 60 --concurrency 16
+    python scripts/loadtest.py --base-url http://localhost:8000 --rate 20 \\
+        --synthetic 5000,50000 --out loadtest_results.json
+
+Only the standard library is used so the harness runs in any environment that
+can run the API itself.
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_DRUGS = [
+    "Warfarin", "Clopidogrel", "Omeprazole", "Sertraline", "Codeine",
+    "Tamoxifen", "Ondansetron", "Simvastatin", "Fluorouracil", "Capecitabine",
+]
+
+# Star-allele-defining sites used to seed synthetic VCFs (GRCh38, from sample_data/)
+SYNTHETIC_SITES = [
+    ("chr1", 97450058, "rs3918290", "C", "T", "DPYD", "*2A"),
+    ("chr1", 97515865, "rs1801265", "T", "C", "DPYD", "*5"),
+    ("chr6", 18130918, "rs1800584", "G", "A", "TPMT", "*3C"),
+    ("chr6", 18133885, "rs1800460", "G", "A", "TPMT", "*3A"),
+    ("chr10", 94781859, "rs4244285", "G", "A", "CYP2C19", "*2"),
+    ("chr10", 94842866, "rs12769205", "A", "G", "CYP2C19", "*17"),
+    ("chr10", 96702047, "rs1057910", "A", "C", "CYP2C9", "*3"),
+    ("chr10", 96709039, "rs1799853", "C", "T", "CYP2C9", "*2"),
+    ("chr12", 21176804, "rs4149056", "T", "C", "SLCO1B1", "*5"),
+    ("chr22", 42522613, "rs3892097", "C", "T", "CYP2D6", "*4"),
+    ("chr22", 42524175, "rs28371706", "G", "A", "CYP2D6", "*10"),
+]
+
+SYNTHETIC_CONTIGS = [("chr1", 248956422), ("chr6", 170805979), ("chr10", 133797422),
+                     ("chr12", 133275309), ("chr22", 50818468)]
+
+
+# ==========================================
+# 1. WORKLOAD
+# ==========================================
+
+def synthesize_vcf(n_records: int, seed: int = 0, sample_id: str = "SYNTH_001") -> bytes:
+    """Build a position-sorted single-sample VCF with `n_records` data lines.
+
+    Real star-allele sites are mixed in with off-target filler records so the
+    parser sees a realistic ratio of annotated to unannotated variants."""
+
+    rng = random.Random(seed)
+    lines = [
+        "##fileformat=VCFv4.2",
+        "##source=PharmaGuard_loadtest",
+        "##reference=GRCh38.p13",
+    ]
+    for contig, length in SYNTHETIC_CONTIGS:
+        lines.append(f"##contig=<ID={contig},length={length},assembly=GRCh38.p13>")
+    lines.append("##FORMAT=<ID=GT,Number=1,Type=String,Description=\"Genotype\">")
+    lines.append("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t" + sample_id)
+
+    records = []
+    for chrom, pos, rsid, ref, alt, gene, star in SYNTHETIC_SITES:
+        gt = rng.choice(("0/0", "0/0", "0/1", "1/1"))
+        dp = rng.randint(20, 90)
+        records.append((chrom, pos, f"{chrom}\t{pos}\t{rsid}\t{ref}\t{alt}\t99\tPASS\t"
+                        f"RS={rsid};GENE={gene};STAR={star};FUNC=missense;CPIC=1A\t"
+                        f"GT:DP:GQ\t{gt}:{dp}:99"))
+    bases = "ACGT"
+    for _ in range(max(0, n_records - len(records))):
+        chrom, length = rng.choice(SYNTHETIC_CONTIGS)
+        pos = rng.randint(1, length)
+        ref = rng.choice(bases)
+        alt = rng.choice([b for b in bases if b != ref])
+        gt = rng.choice(("0/1", "1/1", "0/0"))
+        records.append((chrom, pos, f"{chrom}\t{pos}\t.\t{ref}\t{alt}\t{rng.randint(10, 99)}\tPASS\t"
+                        f"AF={rng.random():.4f}\tGT:DP:GQ\t{gt}:{rng.randint(5, 90)}:{rng.randint(5, 99)}"))
+
+    contig_order = {c: i for i, (c, _) in enumerate(SYNTHETIC_CONTIGS)}
+    records.sort(key=lambda r: (contig_order[r[0]], r[1]))
+    lines.extend(r[2] for r in records)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def load_workload(sample_glob: str, synthetic_sizes: List[int]) -> List[Tuple[str, bytes]]:
+    """Return (label, content) pairs for every VCF in the run mix."""
+    workload = []
+    for path in sorted(glob.glob(sample_glob)):
+        with open(path, "rb") as fh:
+            workload.append((os.path.basename(path), fh.read()))
+    for i, n in enumerate(synthetic_sizes):
+        workload.append((f"synthetic_{n}", synthesize_vcf(n, seed=i)))
+    if not workload:
+        raise SystemExit(f"No VCF files matched {sample_glob!r} and no --synthetic sizes given.")
+    return workload
+
+
+def encode_multipart(fields: Dict[str, str], files: List[Tuple[str, str, bytes]]) -> Tuple[bytes, str]:
+    """Encode form fields + file parts as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for name, value in fields.items():
+        chunks.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode())
+    for name, filename, content in files:
+        chunks.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+                      "Content-Type: application/octet-stream\r\n\r\n".encode())
+        chunks.append(content)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return b"".join(chunks), f"multipart/form-data; boundary={boundary}"
+
+
+# ==========================================
+# 2. SERVER MANAGEMENT & RSS SAMPLING
+# ==========================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    """Launch `uvicorn main:app` from the repo root and wait until it answers."""
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=ROOT)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"Server exited early with code {proc.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return proc
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("Server did not become ready within 30s")
+
+
+def _process_tree(pid: int) -> List[int]:
+    """The given pid plus all of its descendants (uvicorn workers)."""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as fh:
+            for child in fh.read().split():
+                pids.extend(_process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Total resident set size of a process tree, or None if not measurable."""
+    total = 0
+    found = False
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as fh:
+                for line in fh:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        found = True
+                        break
+        except OSError:
+            continue
+    return total if found else None
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid: int, interval: float, started: float):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.started = started
+        self.samples: List[Tuple[float, int]] = []
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            rss = rss_bytes(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.perf_counter() - self.started, 3), rss))
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class HealthProbe(threading.Thread):
+    """Polls `/` while the load runs to show whether the event loop stays responsive."""
+
+    def __init__(self, base_url: str, interval: float):
+        super().__init__(daemon=True)
+        self.url = base_url.rstrip("/") + "/"
+        self.interval = interval
+        self.latencies: List[float] = []
+        self.failures = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            t0 = time.perf_counter()
+            try:
+                urllib.request.urlopen(self.url, timeout=10).read()
+                self.latencies.append(time.perf_counter() - t0)
+            except Exception:
+                self.failures += 1
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+# ==========================================
+# 3. LOAD LOOP
+# ==========================================
+
+def send_request(base_url: str, endpoint: str, label: str, content: bytes, drug: str, timeout: float,
+                 scheduled: Optional[float] = None) -> dict:
+    """One upload. Latency runs from `scheduled` (a perf_counter time) when given,
+    so time spent waiting for a free client thread counts against the server."""
+    body, content_type = encode_multipart({"drug": drug}, [("file", f"{label}.vcf", content)])
+    req = urllib.request.Request(base_url.rstrip("/") + endpoint, data=body, method="POST",
+                                 headers={"Content-Type": content_type})
+    t0 = time.perf_counter() if scheduled is None else scheduled
+    status = 0
+    error = None
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+        error = f"HTTP {e.code}"
+    except Exception as e:
+        error = type(e).__name__
+    return {
+        "endpoint": endpoint,
+        "file": label,
+        "bytes": len(content),
+        "status": status,
+        "ok": error is None and 200 <= status < 300,
+        "error": error,
+        "latency": time.perf_counter() - t0,
+    }
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    ms = [l * 1000 for l in latencies]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else None,
+        "p50_ms": round(percentile(ms, 50), 2) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 2) if ms else None,
+        "max_ms": round(max(ms), 2) if ms else None,
+    }
+
+
+def run_load(args, base_url: str, workload: List[Tuple[str, bytes]]) -> Tuple[List[dict], float]:
+    """Issue requests until the duration / request budget is exhausted.
+
+    With --rate, requests are scheduled open-loop at fixed intervals and latency
+    is measured from each request's scheduled send time, so a slow server
+    accumulates queueing delay (as real clients would) instead of hiding it
+    behind busy client threads; otherwise each of the --concurrency workers
+    sends back-to-back. Request i draws its file/endpoint/drug from its own
+    seed, so a given --seed replays the same request mix."""
+
+    results: List[dict] = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else None
+    issued = 0
+
+    def budget_left() -> bool:
+        if args.requests and issued >= args.requests:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    def one(i: int, scheduled: Optional[float] = None):
+        rng = random.Random(args.seed * 1_000_003 + i)
+        label, content = rng.choice(workload)
+        res = send_request(base_url, rng.choice(args.endpoint), label, content,
+                           rng.choice(args.drugs), args.timeout, scheduled)
+        with lock:
+            results.append(res)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        if args.rate:
+            interval = 1.0 / args.rate
+            next_at = started
+            pending = []
+            while budget_left():
+                now = time.perf_counter()
+                if now < next_at:
+                    time.sleep(next_at - now)
+                pending.append(pool.submit(one, issued, next_at))
+                issued += 1
+                next_at += interval
+            for f in pending:
+                f.result()
+        else:
+            def worker():
+                nonlocal issued
+                while True:
+                    with lock:
+                        if not budget_left():
+                            return
+                        i = issued
+                        issued += 1
+                    one(i)
+            for f in [pool.submit(worker) for _ in range(args.concurrency)]:
+                f.result()
+
+    return results, time.perf_counter() - started
+
+
+def build_report(args, results: List[dict], elapsed: float, rss: Optional[RssSampler],
+                 health: Optional[HealthProbe]) -> dict:
+    ok = [r for r in results if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            key = r["error"] or f"HTTP {r['status']}"
+            errors[key] = errors.get(key, 0) + 1
+
+    per_file: Dict[str, dict] = {}
+    for label in sorted({r["file"] for r in results}):
+        subset = [r for r in results if r["file"] == label]
+        per_file[label] = {
+            "bytes": subset[0]["bytes"],
+            "error_rate": round(1 - sum(r["ok"] for r in subset) / len(subset), 4),
+            **latency_summary([r["latency"] for r in subset if r["ok"]]),
+        }
+
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = None
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "commit": commit,
+            "config": {
+                "endpoints": args.endpoint,
+                "concurrency": args.concurrency,
+                "rate": args.rate,
+                "duration": args.duration,
+                "requests": args.requests,
+                "synthetic": args.synthetic,
+                "server_workers": args.server_workers if args.start_server else None,
+            },
+        },
+        "summary": {
+            "requests": len(results),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+            "error_rate": round(1 - len(ok) / len(results), 4) if results else None,
+            "errors": errors,
+            "latency": latency_summary([r["latency"] for r in ok]),
+        },
+        "per_file": per_file,
+    }
+    if rss is not None:
+        values = [s[1] for s in rss.samples]
+        report["server_rss"] = {
+            "peak_bytes": max(values) if values else None,
+            "final_bytes": values[-1] if values else None,
+            "samples": rss.samples,
+        }
+    if health is not None:
+        report["health_probe"] = {
+            "failures": health.failures,
+            **latency_summary(health.latencies),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the PharmaGuard PGx API.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start-server", action="store_true",
+                        help="Launch `uvicorn main:app` on a free port for the run")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--server-pid", type=int, help="PID to sample RSS from for an external server")
+    parser.add_argument("--endpoint", action="append",
+                        help="Endpoint path to hit (repeatable). Default: /api/v1/pgx/analyze")
+    parser.add_argument("--samples", default=os.path.join(ROOT, "sample_data", "*.vcf"),
+                        help="Glob of real VCFs to include in the mix")
+    parser.add_argument("--synthetic", default="",
+                        help="Comma-separated record counts of synthetic VCFs, e.g. 5000,50000")
+    parser.add_argument("--drugs", default=",".join(DEFAULT_DRUGS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="Target requests/second (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (0 = until --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--health-interval", type=float, default=0.25,
+                        help="Seconds between health probes (0 disables)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="loadtest_results.json")
+    args = parser.parse_args(argv)
+
+    args.endpoint = args.endpoint or ["/api/v1/pgx/analyze"]
+    args.drugs = [d.strip() for d in args.drugs.split(",") if d.strip()]
+    args.synthetic = [int(n) for n in args.synthetic.split(",") if n.strip()]
+    if not args.duration and not args.requests:
+        parser.error("one of --duration or --requests must be non-zero")
+
+    workload = load_workload(args.samples, args.synthetic)
+    print(f"Workload: {len(workload)} files, "
+          f"{sum(len(c) for _, c in workload) / 1e6:.2f} MB total")
+
+    server = None
+    base_url = args.base_url
+    pid = args.server_pid
+    if args.start_server:
+        port = _free_port()
+        server = start_server(port, args.server_workers)
+        base_url = f"http://127.0.0.1:{port}"
+        pid = server.pid
+
+    started = time.perf_counter()
+    rss = RssSampler(pid, args.rss_interval, started) if pid else None
+    health = HealthProbe(base_url, args.health_interval) if args.health_interval else None
+    for t in (rss, health):
+        if t:
+            t.start()
+
+    try:
+        results, elapsed = run_load(args, base_url, workload)
+    finally:
+        for t in (rss, health):
+            if t:
+                t.stop()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = build_report(args, results, elapsed, rss, health)
+    with open(args.out, "w") as fh:
+        json.dump(report, fh, indent=2)
+
+    s = report["summary"]
+    lat = s["latency"]
+    print(f"{s['requests']} requests in {s['elapsed_s']}s — {s['throughput_rps']} req/s, "
+          f"error rate {s['error_rate']}")
+    print(f"latency p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms p99={lat['p99_ms']}ms")
+    if "server_rss" in report and report["server_rss"]["peak_bytes"]:
+        print(f"server RSS peak {report['server_rss']['peak_bytes'] / 1e6:.1f} MB")
+    if "health_probe" in report:
+        print(f"health probe p99={report['health_probe']['p99_ms']}ms "
+              f"failures={report['health_probe']['failures']}")
+    print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
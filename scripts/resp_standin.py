@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Local stand-in for a Redis server, for exercising the redis:// cache backend.
+
+Speaks enough RESP2 for backend/cache.py (PING, AUTH, SELECT, GET, SET with
+EX/PX, DEL, EXISTS, DBSIZE, FLUSHDB, INFO, QUIT) on one in-memory keyspace, with
+expiry and an optional key cap evicted least recently used (like Redis's
+allkeys-lru). Not for production.
+
+    python scripts/resp_standin.py --port 6390 --max-keys 10000
+    PGX_CACHE_URL=redis://127.0.0.1:6390/0 uvicorn main:app --workers 4
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class Keyspace:
+    def __init__(self, max_keys: int = 0):
+        self.max_keys = max_keys
+        self.data: "OrderedDict[bytes, tuple]" = OrderedDict()   # key -> (value, expires or None)
+        self.hits = self.misses = self.evicted = self.expired = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: bytes, value: bytes, ttl: Optional[float]):
+        self.data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self.data.move_to_end(key)
+        while self.max_keys and len(self.data) > self.max_keys:
+            self.data.popitem(last=False)
+            self.evicted += 1
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def execute(ks: Keyspace, args: List[bytes]) -> bytes:
+    cmd = args[0].upper()
+    if cmd == b"PING":
+        return b"+PONG\r\n"
+    if cmd in (b"AUTH", b"SELECT", b"QUIT"):
+        return b"+OK\r\n"
+    if cmd == b"GET" and len(args) == 2:
+        return _bulk(ks.get(args[1]))
+    if cmd == b"SET" and len(args) >= 3:
+        ttl, opts = None, [a.upper() for a in args[3:]]
+        if len(opts) >= 2 and opts[0] in (b"EX", b"PX"):
+            ttl = int(opts[1]) / (1 if opts[0] == b"EX" else 1000)
+        ks.set(args[1], args[2], ttl)
+        return b"+OK\r\n"
+    if cmd in (b"DEL", b"EXISTS"):
+        n = sum(1 for k in args[1:] if ks.get(k) is not None)
+        if cmd == b"DEL":
+            for k in args[1:]:
+                ks.data.pop(k, None)
+        return b":%d\r\n" % n
+    if cmd == b"DBSIZE":
+        return b":%d\r\n" % len(ks.data)
+    if cmd == b"FLUSHDB":
+        ks.data.clear()
+        return b"+OK\r\n"
+    if cmd == b"INFO":
+        info = (f"keys:{len(ks.data)}\r\nkeyspace_hits:{ks.hits}\r\nkeyspace_misses:{ks.misses}\r\n"
+                f"evicted_keys:{ks.evicted}\r\nexpired_keys:{ks.expired}\r\n").encode()
+        return _bulk(info)
+    return b"-ERR unknown or malformed command '%s'\r\n" % cmd
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()   # inline command (e.g. typed via telnet)
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="In-memory RESP server for local cache testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--max-keys", type=int, default=0, help="LRU key cap (0 = unbounded)")
+    args = parser.parse_args(argv)
+    ks = Keyspace(args.max_keys)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                command = await _read_command(reader)
+                if not command:
+                    break
+                writer.write(execute(ks, command))
+                await writer.drain()
+                if command[0].upper() == b"QUIT":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, args.host, args.port)
+        print(f"RESP stand-in listening on {args.host}:{args.port}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Rejected uploads are not read to the end (user-033)."""
+
+import socket
+import time
+from urllib.parse import urlparse
+
+from backend import admission
+
+
+def _upload_while_full(base_url: str, declared: int, chunk: bytes, max_send: int):
+    """Start an upload of `declared` bytes and keep sending until the server
+    answers or stops reading. Returns (response head, bytes sent, seconds)."""
+    url = urlparse(base_url)
+    sock = socket.create_connection((url.hostname, url.port), timeout=10)
+    sock.sendall(f"POST /api/v1/pgx/matrix HTTP/1.1\r\nHost: x\r\nContent-Type: multipart/form-data; boundary=b\r\n"
+                 f"Content-Length: {declared}\r\n\r\n".encode())
+    sent, t0 = 0, time.perf_counter()
+    sock.setblocking(False)
+    response = b""
+    while sent < max_send:
+        try:
+            response += sock.recv(65536)
+            if b"\r\n\r\n" in response:
+                break
+        except BlockingIOError:
+            pass
+        try:
+            sent += sock.send(chunk)
+        except BlockingIOError:
+            time.sleep(0.001)
+        except OSError:
+            break   # connection closed under us
+    sock.setblocking(True)
+    try:
+        while b"\r\n\r\n" not in response:
+            data = sock.recv(65536)
+            if not data:
+                break
+            response += data
+    except OSError:
+        pass
+    sock.close()
+    return response.split(b"\r\n\r\n", 1)[0].decode("latin-1"), sent, time.perf_counter() - t0
+
+
+def test_rejected_upload_is_cut_off(live_server, monkeypatch):
+    monkeypatch.setattr(admission.LARGE, "max_inflight", 0)
+    declared = 64 * 1024 * 1024
+    head, sent, _ = _upload_while_full(live_server, declared, b"x" * 65536, declared)
+    assert head.startswith("HTTP/1.1 503")
+    assert "connection: close" in head.lower()
+    # Answered after the capped drain, long before the declared body was sent
+    assert sent < declared // 4
+
+
+def test_inline_parse_expansion_is_charged():
+    budget = admission.Budget("small", max_inflight=10, max_bytes=100, retry_after=1, expansion=8)
+    assert budget.try_acquire(12)            # 96 of 100 bytes
+    assert not budget.try_acquire(1)         # 8 more does not fit
+    assert not budget.try_grow(1)
+    budget.release(12)
+    assert budget.snapshot()["bytes_in_flight"] == 0
+    assert budget.try_acquire(12)
@@ -0,0 +1,67 @@
+"""The redis:// cache backend against scripts/resp_standin.py, and profile
+caching through it."""
+
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backend import parse_pool
+from backend.cache import Cache, backend_from_url
+from backend.parse_pool import build_compact_profile, profile_cache_key, profile_vcf
+
+from conftest import ROOT, free_port
+
+SAMPLE = os.path.join(ROOT, "sample_data", "test_patient.vcf")
+
+
+@pytest.fixture
+def resp_url():
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "scripts", "resp_standin.py"), "--port", str(port)],
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        assert "listening" in proc.stdout.readline()
+        yield f"redis://127.0.0.1:{port}/0"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def test_round_trip(resp_url):
+    cache = Cache(backend_from_url(resp_url))
+    assert cache.get("pgx:v1:profile:missing") is None
+    cache.set("pgx:v1:profile:k", {"profiles": {"CYP2C19": {"diplotype": "*2/*2"}}, "n": [1, 2]})
+    assert cache.get("pgx:v1:profile:k") == {"profiles": {"CYP2C19": {"diplotype": "*2/*2"}}, "n": [1, 2]}
+    kinds = cache.metrics()["kinds"]["profile"]
+    assert (kinds["hits"], kinds["misses"], kinds["sets"], kinds["errors"]) == (1, 1, 1, 0)
+
+
+def test_profile_is_parsed_once(resp_url, monkeypatch):
+    cache = Cache(backend_from_url(resp_url))
+    monkeypatch.setattr(parse_pool, "get_cache", lambda: cache)
+    parses = []
+    monkeypatch.setattr(parse_pool, "build_compact_profile",
+                        lambda content, genes=(): parses.append(1) or build_compact_profile(content, genes))
+    with open(SAMPLE, "rb") as f:
+        content = f.read()
+
+    first = asyncio.run(profile_vcf(content))
+    second = asyncio.run(profile_vcf(content))
+    assert len(parses) == 1
+    assert second == first
+
+
+def test_backend_outage_is_a_miss():
+    cache = Cache(backend_from_url(f"redis://127.0.0.1:{free_port()}/0"))
+    assert cache.get("pgx:v1:profile:k") is None
+    cache.set("pgx:v1:profile:k", {"x": 1})
+    assert cache.metrics()["kinds"]["profile"]["errors"] == 1
+
+
+def test_key_tracks_the_calling_code(monkeypatch):
+    before = profile_cache_key(b"vcf")
+    monkeypatch.setattr(parse_pool, "CALLER_VERSION", "changed")
+    assert profile_cache_key(b"vcf") != before
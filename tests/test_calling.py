@@ -0,0 +1,58 @@
+"""Diplotype calling must never turn missing evidence into a wild-type call."""
+
+from backend.pgx_engine import NO_CALL_DIPLOTYPE, assess_drug_risk, call_diplotype
+
+
+def _site(star, genotype, qc_pass=True):
+    return {'star': star, 'genotype': genotype, 'qc_pass': qc_pass}
+
+
+def test_qc_failed_defining_site_is_a_no_call():
+    assert call_diplotype('CYP2C19', [_site('*2', '1/1', qc_pass=False)]) == (NO_CALL_DIPLOTYPE, 'Unknown', None)
+
+
+def test_qc_failed_site_with_an_open_slot_is_a_no_call():
+    calls = [_site('*2', '0/1'), _site('*17', '0/1', qc_pass=False)]
+    assert call_diplotype('CYP2C19', calls)[0] == NO_CALL_DIPLOTYPE
+
+
+def test_qc_failed_site_cannot_change_a_full_call():
+    calls = [_site('*2', '1/1'), _site('*17', '0/1', qc_pass=False)]
+    assert call_diplotype('CYP2C19', calls)[:2] == ('*2/*2', 'PM')
+
+
+def test_no_call_is_not_reported_safe():
+    risk_label, _, confidence, _ = assess_drug_risk('CLOPIDOGREL', 'CYP2C19', 'Unknown', NO_CALL_DIPLOTYPE, None)
+    assert risk_label != 'Safe' and confidence < 0.9
+
+
+_GVCF_HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##ALT=<ID=NON_REF,Description=\"Any other allele\">\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\n"
+)
+# Reference blocks over every CYP2C19 defining site except rs4244285 (chr10:94781859)
+_CYP2C19_BLOCKS = (
+    "chr10\t94761000\t.\tA\t<NON_REF>\t.\t.\tEND=94781000\tGT:DP:GQ:MIN_DP\t0/0:30:60:30\n"
+)
+
+
+def _gvcf_profile(record: str):
+    from backend.parse_pool import build_compact_profile
+    return build_compact_profile((_GVCF_HEADER + _CYP2C19_BLOCKS + record).encode())['profiles']['CYP2C19']
+
+
+def test_unattributed_variant_at_defining_site_is_not_coverage():
+    record = "chr10\t94781859\trs4244285\tG\tA,<NON_REF>\t99\tPASS\tGENE=CYP2C19\tGT:DP:GQ\t0/1:40:99\n"
+    profile = _gvcf_profile(record)
+    assert (profile['diplotype'], profile['phenotype']) == (NO_CALL_DIPLOTYPE, 'Unknown')
+
+
+def test_hom_ref_call_at_defining_site_is_coverage():
+    record = "chr10\t94781859\trs4244285\tG\tA,<NON_REF>\t99\tPASS\tGENE=CYP2C19\tGT:DP:GQ\t0/0:40:99\n"
+    assert _gvcf_profile(record)['diplotype'] == '*1/*1'
+
+
+def test_attributed_variant_at_defining_site_is_called():
+    record = "chr10\t94781859\trs4244285\tG\tA,<NON_REF>\t99\tPASS\tGENE=CYP2C19;STAR=*2\tGT:DP:GQ\t0/1:40:99\n"
+    assert _gvcf_profile(record)['diplotype'] == '*2/*1'
@@ -0,0 +1,36 @@
+"""Drug-name resolution never swaps one drug for another (user-031)."""
+
+import pytest
+
+from backend.drug_lexicon import did_you_mean, normalize_drug, suggest_drugs
+
+
+@pytest.mark.parametrize("name, canonical", [
+    ("Plavix", "CLOPIDOGREL"),
+    ("clopidogrel bisulfate", "CLOPIDOGREL"),
+    ("Clopidogrel 75 mg tablet", "CLOPIDOGREL"),
+    ("5-FU", "FLUOROURACIL"),
+    ("Warfarin5mg", "WARFARIN"),
+    ("Warfarin Sodium 5 mg", "WARFARIN"),
+    ("Omeprazole Sodium", "OMEPRAZOLE"),
+    ("Coumadin 2.5mg", "WARFARIN"),
+])
+def test_exact_synonym_salt_and_strength_resolve(name, canonical):
+    assert normalize_drug(name) == canonical
+
+
+@pytest.mark.parametrize("name", [
+    "Carace", "Cardec", "Caraco", "Efudix", "Esomeprazole", "Lasec", "Zocord", "Zyloft", "Clopidogrelz",
+])
+def test_near_misses_do_not_resolve_but_are_suggested(name):
+    assert normalize_drug(name) is None
+    assert did_you_mean(name)
+
+
+def test_unknown_drug_has_no_suggestions():
+    assert normalize_drug("aspirin") is None
+    assert did_you_mean("aspirin") == []
+
+
+def test_autocomplete_still_tolerates_typos():
+    assert any(r["drug"] == "Clopidogrel" for r in suggest_drugs("clopidogrle"))
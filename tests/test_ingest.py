@@ -0,0 +1,114 @@
+"""Watch-folder ingestion (backend/ingest.py) in --once mode on a temp directory."""
+
+import glob
+import hashlib
+import os
+import shutil
+
+import pytest
+
+from backend import ingest
+from backend.ingest import LEDGER_NAME, IngestService, Ledger
+
+from conftest import ROOT
+
+SAMPLE = os.path.join(ROOT, "sample_data", "test_patient.vcf")
+OTHER = os.path.join(ROOT, "sample_data", "test_patient - Copy.vcf")
+DRUGS = "clopidogrel,warfarin"
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "get_store", lambda: None)
+    watch, out = tmp_path / "incoming", tmp_path / "results"
+    watch.mkdir()
+    return str(watch), str(out)
+
+
+def _once(watch, out, *extra):
+    return ingest.main(["--watch", watch, "--out", out, "--drugs", DRUGS, "--workers", "1",
+                        "--settle", "0", "--poll", "--once", *extra])
+
+
+def _sha(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _results(out):
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(out, "*.pgx.json")))
+
+
+def test_duplicate_content_under_another_name_is_processed_once(dirs):
+    watch, out = dirs
+    shutil.copy(SAMPLE, os.path.join(watch, "a.vcf"))
+    shutil.copy(SAMPLE, os.path.join(watch, "b.vcf"))
+    assert _once(watch, out) == 0
+    assert len(_results(out)) == 1
+    ledger = Ledger(os.path.join(out, LEDGER_NAME))
+    assert ledger.counts() == {"done": 1}
+    assert len(ledger.files) == 2
+
+    # Nothing changed: a second run reads nothing and writes nothing
+    assert _once(watch, out) == 0
+    assert len(_results(out)) == 1
+
+
+def test_file_that_changes_while_read_is_requeued(dirs):
+    watch, out = dirs
+    path = os.path.join(watch, "p.vcf")
+    shutil.copy(SAMPLE, path)
+    service = IngestService(watch, out, ingest.parse_drugs(DRUGS), workers=1, settle=0, use_watchdog=False)
+    service.pool = service._new_pool()
+    try:
+        service.scan()
+        service._dispatch()
+        assert len(service.inflight) == 1
+        shutil.copy(OTHER, path)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - 1_000_000_000))
+        service._collect(block=True)
+    finally:
+        service.pool.shutdown(wait=True)
+    assert _results(out) == []
+    assert path in service.candidates
+
+    assert service.run(once=True) == 0
+    assert _results(out) == [f"p.{_sha(OTHER)[:12]}.pgx.json"]
+
+
+def test_file_inside_the_settle_window_is_not_read(dirs):
+    watch, out = dirs
+    shutil.copy(SAMPLE, os.path.join(watch, "fresh.vcf"))
+    assert _once(watch, out, "--settle", "3600") == 0
+    assert _results(out) == []
+    assert Ledger(os.path.join(out, LEDGER_NAME)).counts() == {}
+
+
+def test_restart_redoes_a_processing_row(dirs):
+    watch, out = dirs
+    path = os.path.join(watch, "p.vcf")
+    shutil.copy(SAMPLE, path)
+    sha256 = _sha(path)
+    # A previous run claimed the content and died before writing the result
+    os.makedirs(out)
+    ledger = Ledger(os.path.join(out, LEDGER_NAME))
+    st = os.stat(path)
+    ledger.remember(path, st.st_size, st.st_mtime_ns, sha256)
+    assert ledger.claim(sha256, path)
+    ledger.conn.close()
+
+    assert _once(watch, out) == 0
+    assert _results(out) == [f"p.{sha256[:12]}.pgx.json"]
+    assert Ledger(os.path.join(out, LEDGER_NAME)).status(sha256) == "done"
+
+
+def test_corrupt_gzip_gets_an_error_result(dirs):
+    watch, out = dirs
+    path = os.path.join(watch, "bad.vcf.gz")
+    with open(path, "wb") as f:
+        f.write(b"\x1f\x8b\x08\x00not really gzip")
+    assert _once(watch, out) == 0
+    sha256 = _sha(path)
+    assert os.path.exists(os.path.join(out, f"bad.{sha256[:12]}.error.json"))
+    assert Ledger(os.path.join(out, LEDGER_NAME)).status(sha256) == "failed"
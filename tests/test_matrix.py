@@ -0,0 +1,78 @@
+"""POST /api/v1/pgx/matrix (user-040): column layout, drug resolution, and every
+cell equal to what /analyze returns for that drug alone."""
+
+import glob
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.pgx_engine import DRUG_GENE_MAP, GENE_ACTIVITY_TABLES
+
+from conftest import ROOT
+
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, "sample_data", "*.vcf")))
+MATRIX = "/api/v1/pgx/matrix"
+
+
+class _OfflineModel:
+    model_name = "offline"
+
+    def generate_content(self, prompt):
+        raise RuntimeError("no LLM in tests")
+
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "llm_model", _OfflineModel())
+        mp.setattr(main, "get_store", lambda: None)
+        with TestClient(main.app) as c:
+            yield c
+
+
+def _post(client, path, url=MATRIX, **data):
+    with open(path, "rb") as f:
+        return client.post(url, files={"file": (os.path.basename(path), f)}, data={"record": "false", **data})
+
+
+@pytest.mark.parametrize("path", SAMPLES, ids=os.path.basename)
+def test_cells_match_analyze(client, path):
+    m = _post(client, path).json()
+    assert m["genes"] == list(GENE_ACTIVITY_TABLES)
+    assert sorted(m["drugs"]) == sorted(DRUG_GENE_MAP)
+    assert all(len(column) == len(m["genes"]) for column in m["profile"].values())
+    assert all(len(column) == len(m["drugs"]) for column in m["cells"].values())
+    assert m["drug_inputs"] is None and m["unsupported_drugs"] == []
+
+    for i, drug in enumerate(m["drugs"]):
+        g = m["cells"]["gene"][i]
+        a = _post(client, path, "/api/v1/pgx/analyze", drug=drug).json()
+        assert m["genes"][g] == DRUG_GENE_MAP[drug] == a["pharmacogenomic_profile"]["primary_gene"]
+        assert m["profile"]["diplotype"][g] == a["pharmacogenomic_profile"]["diplotype"]
+        assert m["profile"]["phenotype"][g] == a["pharmacogenomic_profile"]["phenotype"]
+        assert (m["cells"]["risk_label"][i], m["cells"]["severity"][i], m["cells"]["confidence"][i]) == (
+            a["risk_assessment"]["risk_label"], a["risk_assessment"]["severity"],
+            a["risk_assessment"]["confidence_score"])
+        assert m["cells"]["recommendation"][i] == a["clinical_recommendation"]["recommendation"]
+
+
+def test_requested_drugs_keep_their_input_names(client):
+    m = _post(client, SAMPLES[0], drugs="Plavix, warfarin sodium 5 mg,aspirin,Plavix").json()
+    assert m["drugs"] == ["CLOPIDOGREL", "WARFARIN"]
+    assert m["drug_inputs"] == ["Plavix", "warfarin sodium 5 mg"]
+    assert m["unsupported_drugs"] == ["aspirin"]
+    assert "explanation" not in m["cells"]
+
+
+def test_unknown_drugs_only_is_400(client):
+    resp = _post(client, SAMPLES[0], drugs="aspirin")
+    assert resp.status_code == 400
+
+
+def test_typo_is_not_guessed(client):
+    resp = _post(client, SAMPLES[0], drugs="Plavix,Clopidogrelz")
+    assert resp.status_code == 400
+    assert "CLOPIDOGREL" in [s.upper() for s in resp.json()["suggestions"]]
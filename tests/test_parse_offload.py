@@ -0,0 +1,57 @@
+"""Large parses run in the process pool, so the event loop keeps answering
+health checks while they are in flight (user-028)."""
+
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.admission import LARGE
+from backend.parse_pool import INLINE_PARSE_MAX_BYTES, PARSE_WORKERS, build_compact_profile
+from scripts.loadtest import encode_multipart, synthesize_vcf
+
+# As many large uploads as admission lets in at once
+UPLOADS = LARGE.max_inflight
+
+
+def _post_matrix(base_url: str, content: bytes) -> int:
+    body, content_type = encode_multipart({"drugs": "clopidogrel"}, [("file", "big.vcf", content)])
+    req = urllib.request.Request(f"{base_url}/api/v1/pgx/matrix", data=body, method="POST",
+                                 headers={"Content-Type": content_type})
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        resp.read()
+        return resp.status
+
+
+def test_health_stays_responsive_during_large_parses(live_server):
+    assert PARSE_WORKERS > 0
+    content = synthesize_vcf(150_000)
+    assert len(content) > INLINE_PARSE_MAX_BYTES
+
+    t0 = time.perf_counter()
+    build_compact_profile(content)
+    parse_seconds = time.perf_counter() - t0
+
+    latencies = []
+    done = threading.Event()
+
+    def probe():
+        while not done.is_set():
+            t = time.perf_counter()
+            with urllib.request.urlopen(f"{live_server}/health", timeout=30) as resp:
+                assert resp.status == 200
+            latencies.append(time.perf_counter() - t)
+            time.sleep(0.02)
+
+    prober = threading.Thread(target=probe)
+    with ThreadPoolExecutor(UPLOADS) as pool:
+        futures = [pool.submit(_post_matrix, live_server, content) for _ in range(UPLOADS)]
+        prober.start()
+        statuses = [f.result() for f in futures]
+    done.set()
+    prober.join()
+
+    assert statuses == [200] * UPLOADS
+    # Parsing inline would stall every probe for whole parses at a time
+    assert len(latencies) >= 10
+    assert max(latencies) < max(0.5, parse_seconds / 2), (max(latencies), parse_seconds)
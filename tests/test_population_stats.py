@@ -0,0 +1,68 @@
+"""Population counters (backend/population_stats.py) and their upkeep in the
+profile store (user-037)."""
+
+import pytest
+
+from backend.guidelines import evaluate
+from backend.population_stats import OTHER_DRUG, PopulationCounters
+from backend.profile_store import ProfileStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProfileStore(str(tmp_path / "store.sqlite3"))
+
+
+def _profiles(**diplotypes):
+    out = {}
+    for gene, diplotype in diplotypes.items():
+        call = evaluate(gene, "CLOPIDOGREL" if gene == "CYP2C19" else "WARFARIN", diplotype)
+        out[gene] = {"diplotype": diplotype, "phenotype": call["phenotype"], "activity_score": call["activity_score"]}
+    return out
+
+
+def _result(drug, gene, diplotype):
+    return {"drug": drug, "gene": gene, "diplotype": diplotype, **evaluate(gene, drug, diplotype)}
+
+
+def test_observe_and_merge():
+    a = PopulationCounters().observe(_profiles(CYP2C19="*2/*2"), [_result("CLOPIDOGREL", "CYP2C19", "*2/*2")])
+    b = PopulationCounters().observe(
+        {**_profiles(CYP2C19="*1/*57"), "UNKNOWN": {"diplotype": "*1/*1", "phenotype": "NM"}},
+        [_result("ASPIRIN", "UNKNOWN", "*1/*1")],
+    )
+    merged = PopulationCounters().merge(a).merge(b).to_json()
+    assert merged["patients"] == 2 and merged["results"] == 2
+    # Stars outside the activity table share one bucket; unmapped genes and drugs are not scopes
+    assert merged["genes"]["CYP2C19"]["diplotypes"] == {"*2/*2": 1, "*1/other": 1}
+    assert set(merged["genes"]) == {"CYP2C19"}
+    assert set(merged["drugs"]) == {"CLOPIDOGREL", OTHER_DRUG}
+    assert PopulationCounters.from_json(merged).to_json() == merged
+
+
+def test_repeat_record_does_not_double_count(store):
+    profiles, results = _profiles(CYP2C19="*2/*2"), [_result("CLOPIDOGREL", "CYP2C19", "*2/*2")]
+    store.record_analysis("PG-1", profiles, results)
+    store.record_analysis("PG-1", profiles, results)
+    counts = store.population_counts().to_json()
+    assert counts["patients"] == 1 and counts["results"] == 1
+    assert counts["genes"]["CYP2C19"]["diplotypes"] == {"*2/*2": 1}
+
+
+def test_counters_after_recompute_match_a_recount(store):
+    for i, (c19, c9) in enumerate([("*2/*2", "*1/*3"), ("*1/*1", "*1/*1"), ("*1/*2", "*3/*3"), ("*2/*2", "*1/*1")]):
+        store.record_analysis(
+            f"PG-{i}", _profiles(CYP2C19=c19, CYP2C9=c9),
+            [_result("CLOPIDOGREL", "CYP2C19", c19), _result("WARFARIN", "CYP2C9", c9)], version="old",
+        )
+    revised = dict(evaluate("CYP2C19", "CLOPIDOGREL", "*1/*1"), phenotype="IM")
+    stats = store.apply_recompute(
+        changed={("CYP2C19", "CLOPIDOGREL", "*2/*2"): revised},
+        remapped={"WARFARIN": "CYP2C19"},
+        from_version="old", to_version="new",
+    )
+    assert stats["results_recomputed"] == 6
+
+    incremental = store.population_counts().to_json()
+    assert incremental == store.rebuild_population_counts().to_json()
+    assert incremental["genes"]["CYP2C19"]["phenotypes"]["IM"] == 2
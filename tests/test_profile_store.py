@@ -0,0 +1,40 @@
+"""Profile store bookkeeping (user-030)."""
+
+import pytest
+
+from backend.guidelines import evaluate
+from backend.profile_store import ProfileStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProfileStore(str(tmp_path / "store.sqlite3"))
+
+
+def _profiles(diplotype="*2/*2"):
+    out = evaluate("CYP2C19", "CLOPIDOGREL", diplotype)
+    return {"CYP2C19": {"diplotype": diplotype, "phenotype": out["phenotype"],
+                        "activity_score": out["activity_score"]}}
+
+
+def _result(drug, gene, diplotype):
+    return {"drug": drug, "gene": gene, "diplotype": diplotype, **evaluate(gene, drug, diplotype)}
+
+
+def test_unmapped_drug_does_not_store_a_pseudo_gene(store):
+    profiles = {**_profiles(), "UNKNOWN": {"diplotype": "*1/*1", "phenotype": "NM", "activity_score": 2.0}}
+    store.record_analysis("PG-1", profiles, [_result("ASPIRIN", "UNKNOWN", "*1/*1")])
+    with store._connect() as conn:
+        genes = [g for (g,) in conn.execute("SELECT gene FROM patient_profiles")]
+    assert genes == ["CYP2C19"]
+
+
+def test_apply_recompute_updates_only_changed_keys(store):
+    store.record_analysis("PG-1", _profiles("*2/*2"), [_result("CLOPIDOGREL", "CYP2C19", "*2/*2")], version="old")
+    store.record_analysis("PG-2", _profiles("*1/*1"), [_result("CLOPIDOGREL", "CYP2C19", "*1/*1")], version="old")
+    new = dict(evaluate("CYP2C19", "CLOPIDOGREL", "*2/*2"), recommendation="revised")
+    stats = store.apply_recompute({("CYP2C19", "CLOPIDOGREL", "*2/*2"): new}, {}, "old", "new")
+    assert stats == {"results_recomputed": 1, "patients_affected": 1, "results_restamped": 1}
+    rows = {r["patient_id"]: r for r in store.list_results()}
+    assert rows["PG-1"]["recommendation"] == "revised"
+    assert {r["guideline_version"] for r in rows.values()} == {"new"}
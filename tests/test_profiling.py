@@ -0,0 +1,92 @@
+"""Opt-in request profiling (backend/profiling.py): token checks, no sampler
+without the flag, and the profile is on disk before the response completes."""
+
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import profiling
+from backend.profiling import ProfilingMiddleware
+
+from conftest import ROOT
+
+SAMPLE = os.path.join(ROOT, "sample_data", "test_patient.vcf")
+TOKEN = "s3cret-token"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture
+def sampler_starts(monkeypatch):
+    started = []
+    start = profiling.RequestProfiler.start
+    monkeypatch.setattr(profiling.RequestProfiler, "start", lambda self: started.append(self) or start(self))
+    return started
+
+
+def _matrix(client, headers=None, params=None):
+    with open(SAMPLE, "rb") as f:
+        return client.post("/api/v1/pgx/matrix", files={"file": ("p.vcf", f)},
+                           data={"drugs": "warfarin", "record": "false"}, headers=headers or {}, params=params)
+
+
+def test_wrong_token_is_rejected(client, sampler_starts):
+    resp = _matrix(client, headers={"X-PGX-Profile": "wrong"})
+    assert resp.status_code == 403
+    assert sampler_starts == []
+    assert client.get("/api/v1/pgx/profiles/0123456789ab", headers={"X-PGX-Profile": "wrong"}).status_code == 403
+
+
+def test_no_header_starts_no_sampler(client, sampler_starts):
+    resp = _matrix(client)
+    assert resp.status_code == 200
+    assert "x-pgx-profile-id" not in resp.headers
+    assert sampler_starts == []
+
+
+def test_token_is_only_accepted_as_a_header(client, sampler_starts):
+    resp = _matrix(client, params={"x-pgx-profile": TOKEN, "x_pgx_profile": TOKEN})
+    assert resp.status_code == 200
+    assert "x-pgx-profile-id" not in resp.headers
+    assert sampler_starts == []
+
+    resp = _matrix(client, headers={"X-PGX-Profile": TOKEN})
+    profile_id = resp.headers["x-pgx-profile-id"]
+    assert len(sampler_starts) == 1
+    assert client.get(f"/api/v1/pgx/profiles/{profile_id}", params={"x_pgx_profile": TOKEN}).status_code == 403
+    assert client.get(f"/api/v1/pgx/profiles/{profile_id}", headers={"X-PGX-Profile": TOKEN}).status_code == 200
+
+
+def test_profile_is_saved_before_the_last_body_message(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"a", "more_body": True})
+        await send({"type": "http.response.body", "body": b"b"})
+
+    seen = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            seen.append(dict(message["headers"])[b"x-pgx-profile-id"].decode())
+        elif not message.get("more_body", False):
+            seen.append(profiling.load_profile(seen[0]) is not None)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "path": "/p", "headers": [(b"x-pgx-profile", TOKEN.encode())]}
+    asyncio.run(ProfilingMiddleware(app, paths=("/p",))(scope, receive, send))
+    assert seen[1] is True
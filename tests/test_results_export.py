@@ -0,0 +1,96 @@
+"""Bulk export of stored results (GET /api/v1/pgx/results, backend/result_encoding.py):
+format negotiation, compression, the page cap and keyset paging (user-038)."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.guidelines import evaluate
+from backend.profile_store import ProfileStore
+
+URL = "/api/v1/pgx/results"
+DIPLOTYPES = ["*1/*1", "*1/*2", "*2/*2", "*1/*17"]
+PATIENTS = 40
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    import main
+
+    store = ProfileStore(str(tmp_path_factory.mktemp("results") / "store.sqlite3"))
+    for i in range(PATIENTS):
+        diplotype = DIPLOTYPES[i % len(DIPLOTYPES)]
+        results = [{"drug": drug, "gene": gene, "diplotype": diplotype, **evaluate(gene, drug, diplotype)}
+                   for drug, gene in (("CLOPIDOGREL", "CYP2C19"), ("WARFARIN", "CYP2C9"))]
+        store.record_analysis(f"PG-{i:04d}", {}, results)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "get_store", lambda: store)
+        with TestClient(main.app) as c:
+            yield c
+
+
+def _keys(items):
+    return [(r["patient_id"], r["drug"]) for r in items]
+
+
+def test_json_by_default(client):
+    resp = client.get(URL)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/json")
+    body = resp.json()
+    assert body["count"] == len(body["results"]) == 2 * PATIENTS
+    assert body["next_after"] is None
+    assert body["results"][0]["pharmacogenomic_profile"]["primary_gene"] == "CYP2C19"
+
+
+@pytest.mark.parametrize("query, accept", [({"format": "ndjson"}, None), ({}, "application/x-ndjson")])
+def test_ndjson(client, query, accept):
+    resp = client.get(URL, params={"drug": "warfarin", **query}, headers={"Accept": accept} if accept else {})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(lines) == int(resp.headers["x-pgx-count"]) == PATIENTS
+    assert {r["drug"] for r in lines} == {"WARFARIN"}
+
+
+def test_msgpack(client):
+    msgpack = pytest.importorskip("msgpack")
+    resp = client.get(URL, headers={"Accept": "application/msgpack"})
+    assert resp.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(resp.content) == client.get(URL).json()
+
+
+def test_unsupported_accept_is_406(client):
+    resp = client.get(URL, headers={"Accept": "text/csv"})
+    assert resp.status_code == 406
+    assert "application/json" in resp.json()["detail"]
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compressed_with_vary(client, encoding):
+    if encoding == "zstd":
+        pytest.importorskip("zstandard")
+    for fmt in ("json", "ndjson"):
+        resp = client.get(URL, params={"format": fmt}, headers={"Accept-Encoding": encoding})
+        assert resp.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in resp.headers["vary"]
+        assert resp.content == client.get(URL, params={"format": fmt}, headers={"Accept-Encoding": "identity"}).content
+
+
+def test_page_cap(client):
+    import main
+
+    assert client.get(URL, params={"limit": main.MAX_RESULTS_PAGE + 1}).status_code == 422
+    assert client.get(URL, params={"limit": 0}).status_code == 422
+
+
+def test_cursor_pages_have_no_duplicates_or_gaps(client):
+    everything = _keys(client.get(URL).json()["results"])
+    seen, after = [], None
+    while True:
+        body = client.get(URL, params={"limit": 7, **({"after": after} if after else {})}).json()
+        seen.extend(_keys(body["results"]))
+        after = body["next_after"]
+        if after is None:
+            break
+    assert seen == everything == sorted(set(everything))
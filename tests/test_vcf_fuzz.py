@@ -0,0 +1,160 @@
+"""Adversarial VCFs (giant lines, INFO/FORMAT bombs, garbage DP/GQ, huge
+sample rows, a gene per record, random bytes, gVCF block floods, ...) through
+the full parse + diplotype path used by the API: nothing may raise except
+VcfLimitError, and parse time must stay linear in input size."""
+
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import pytest
+
+from backend import vcf_parser
+from backend.parse_pool import build_compact_profile
+from backend.pgx_engine import GENE_ACTIVITY_TABLES
+from backend.vcf_parser import VcfLimitError
+
+HEADER = ("##fileformat=VCFv4.2\n"
+          "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tFUZZ\n")
+GOOD_INFO = "GENE=CYP2C19;STAR=*2;FUNC=splice;CPIC=1A;AF=0.15;CLNSIG=drug_response"
+
+
+def _fill(size: int, make_line: Callable[[int], str], header: str = HEADER) -> bytes:
+    out, total, i = [header], len(header), 0
+    while total < size:
+        line = make_line(i)
+        out.append(line)
+        total += len(line)
+        i += 1
+    return "".join(out).encode("utf-8", errors="surrogatepass")
+
+
+def case_one_giant_line(size: int, rng: random.Random) -> bytes:
+    return (HEADER + "chr1\t1\t.\tA\tG\t.\tPASS\t" + "X" * size).encode()
+
+
+def case_long_lines(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr1\t{i}\t.\tA\tG\t.\tPASS\tGENE=TPMT;PAD={'Y' * 300_000}\tGT\t0/1\n")
+
+
+def case_info_bomb(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr10\t{i}\t.\tA\tG\t.\tPASS\t{'a;' * 5000}GENE=CYP2C19\tGT:DP\t0/1:30\n")
+
+
+def case_info_equals(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr10\t{i}\t.\tA\tG\t.\tPASS\tGENE={'=' * 20000}\tGT\t0/1\n")
+
+
+def case_format_bomb(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr10\t{i}\t.\tA\tG\t.\tPASS\t{GOOD_INFO}\t{'K:' * 4000}GT\t{'1:' * 40000}0/1\n")
+
+
+def case_garbage_numbers(size: int, rng: random.Random) -> bytes:
+    junk = ["abc", "-", "1e9", "", "NaN", "99999999999999999999999", "3.5", "\x00", "٣"]
+    return _fill(size, lambda i: f"chr10\t{i}\t.\tA\tG\t.\tPASS\t{GOOD_INFO}\tGT:DP:GQ\t"
+                                 f"0/1:{rng.choice(junk)}:{rng.choice(junk)}\n")
+
+
+def case_wide_rows(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr10\t{i}\t.\tA\tG\t.\tPASS\t{GOOD_INFO}\tGT" + "\t0/1" * 20000 + "\n")
+
+
+def case_many_samples_header(size: int, rng: random.Random) -> bytes:
+    header = "##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT" + \
+             "".join(f"\tS{i}" for i in range(size // 8)) + "\n"
+    return _fill(size, lambda i: f"chr10\t{i}\t.\tA\tG\t.\tPASS\t{GOOD_INFO}\tGT\t0/1\n", header)
+
+
+def case_gene_per_record(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr1\t{i}\t.\tA\tG\t.\tPASS\tGENE=G{i};STAR=*{i}\tGT:DP:GQ\t0/1:30:50\n")
+
+
+def case_random_bytes(size: int, rng: random.Random) -> bytes:
+    alphabet = b"\t\n;:=,./*01ACGT<>#\r\x00\xff"
+    return HEADER.encode() + bytes(rng.choice(alphabet) for _ in range(size))
+
+
+def case_tabs_only(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: "\t" * 200 + "\n")
+
+
+def case_gvcf_block_flood(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr10\t{94700000 + i}\t.\tA\t<NON_REF>\t.\t.\tEND={94700000 + i * 1000}"
+                                 f"\tGT:GQ:MIN_DP\t0/0:{rng.choice(['50', 'x', '.'])}:30\n")
+
+
+def case_bad_positions(size: int, rng: random.Random) -> bytes:
+    return _fill(size, lambda i: f"chr22\t{rng.choice(['-1', 'x', '', '1' * 40])}\t.\tA\t<*>\t.\t.\t"
+                                 f"END={rng.choice(['y', '5', ''])}\tGT:GQ\t0/0:99\n")
+
+
+CASES: Dict[str, Callable[[int, random.Random], bytes]] = {
+    name[len("case_"):]: fn for name, fn in globals().items() if name.startswith("case_")
+}
+
+
+def _parse(content: bytes):
+    try:
+        return build_compact_profile(content)
+    except VcfLimitError:
+        return None
+
+
+def _best_time(content: bytes, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        _parse(content)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_hostile_input_does_not_crash(name):
+    _parse(CASES[name](64 * 1024, random.Random(1)))
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_parse_time_is_linear(name):
+    small = CASES[name](64 * 1024, random.Random(1))
+    large = CASES[name](512 * 1024, random.Random(1))
+    t_small, t_large = _best_time(small), _best_time(large)
+    # Per-byte cost at 8x the size relative to the base (1.0 = perfectly linear);
+    # a 1 ms floor keeps timer noise on trivially fast cases from counting.
+    growth = (max(t_large, 1e-3) / len(large)) / (max(t_small, 1e-3) / len(small))
+    assert growth <= 2.0, f"{name}: {t_small * 1000:.1f} ms -> {t_large * 1000:.1f} ms"
+
+
+def test_gene_cap_keeps_pharmacogenes(monkeypatch):
+    monkeypatch.setattr(vcf_parser, "MAX_GENES", 50)
+    filler = "".join(f"chr1\t{i}\t.\tA\tG\t.\tPASS\tGENE=G{i}\tGT:DP:GQ\t0/1:30:50\n" for i in range(1, 101))
+    cyp2c19 = "chr10\t94781859\trs4244285\tG\tA\t.\tPASS\tGENE=CYP2C19;STAR=*2\tGT:DP:GQ\t1/1:30:50\n"
+    compact = build_compact_profile((HEADER + filler + cyp2c19).encode())
+    assert compact['parse_errors']['too_many_genes'] == 50
+    assert compact['profiles']['CYP2C19']['diplotype'] == '*2/*2'
+
+
+def _non_pharmacogene_records(n: int):
+    """A whole-genome-like stream: `n` variant records, none in a pharmacogene."""
+    yield from HEADER.splitlines()
+    for i in range(n):
+        gene = f"\tGENE=G{i % 500}" if i % 3 else "\t."
+        yield f"chr1\t{i + 1}\t.\tA\tG\t50\tPASS{gene};AF=0.5\tGT:DP:GQ\t0/1:30:50"
+
+
+def _peak_bytes(n: int, genes=GENE_ACTIVITY_TABLES) -> int:
+    tracemalloc.start()
+    try:
+        parsed = vcf_parser.parse_vcf_lines(_non_pharmacogene_records(n), genes)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert parsed['total_count'] == n
+    return peak
+
+
+def test_memory_does_not_grow_with_non_pharmacogene_records():
+    small, large = _peak_bytes(2_000), _peak_bytes(20_000)
+    # ~745 B per record if they were kept: 18k more records would be ~13 MB
+    assert large - small < 1_000_000, f"{small} -> {large} bytes"
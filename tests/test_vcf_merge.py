@@ -0,0 +1,71 @@
+"""Multi-part uploads: merged in the parse pool from spooled files, same profile
+as the single file, and one malformed record does not fail the request."""
+
+import asyncio
+import io
+import os
+
+import pytest
+
+from backend import parse_pool
+from backend.parse_pool import (
+    build_compact_profile, build_merged_profile, profile_spooled, remove_spooled, spool_to_disk,
+)
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "sample_data", "test_patient.vcf")
+
+
+def _split_by_contig(content: bytes):
+    """The sample VCF as one part per contig, each with the full header."""
+    lines = content.splitlines(keepends=True)
+    header = [line for line in lines if line.startswith(b'#')]
+    parts = {}
+    for line in lines:
+        if not line.startswith(b'#') and line.strip():
+            parts.setdefault(line.split(b'\t', 1)[0], []).append(line)
+    return [b''.join(header + records) for records in parts.values()]
+
+
+@pytest.fixture(scope="module")
+def sample():
+    with open(SAMPLE, 'rb') as f:
+        return f.read()
+
+
+def test_bad_pos_is_counted_and_skipped(sample):
+    parts = _split_by_contig(sample)
+    header, _, records = parts[0].partition(b'#CHROM')
+    first_line_end = records.index(b'\n') + 1
+    bad = b'chr1\tnot-a-number\t.\tA\tG\t99\tPASS\tGENE=DPYD\tGT\t0/1\n'
+    parts[0] = header + b'#CHROM' + records[:first_line_end] + bad + records[first_line_end:]
+
+    merged = build_merged_profile([io.BytesIO(p) for p in parts])
+    assert merged['parse_errors'] == {'bad_pos': 1}
+    assert merged['profiles'] == build_compact_profile(sample)['profiles']
+
+
+def test_spooled_parts_merge_in_the_pool(sample, monkeypatch):
+    parts = _split_by_contig(sample)
+    paths, digest = spool_to_disk([io.BytesIO(p) for p in parts])
+    try:
+        assert all(os.path.exists(p) for p in paths)
+        monkeypatch.setattr(parse_pool, "PARSE_WORKERS", 1)
+        try:
+            merged = asyncio.run(profile_spooled(paths, digest, names=[f"part{i}" for i in range(len(parts))]))
+        finally:
+            parse_pool.shutdown_parse_pool()
+    finally:
+        remove_spooled(paths)
+    assert not any(os.path.exists(p) for p in paths)
+    assert merged['merge']['parts'] == len(parts)
+    assert merged['profiles'] == build_compact_profile(sample)['profiles']
+
+
+def test_digest_covers_part_order(sample):
+    parts = _split_by_contig(sample)
+    paths, forward = spool_to_disk([io.BytesIO(p) for p in parts])
+    remove_spooled(paths)
+    paths, backward = spool_to_disk([io.BytesIO(p) for p in reversed(parts)])
+    remove_spooled(paths)
+    assert forward != backward